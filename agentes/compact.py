@@ -0,0 +1,270 @@
+"""
+Compactação do índice FAISS: remove entradas inúteis e reconstrói índice e docstore.
+
+Remove:
+- o documento inicial criado com a coleção vazia ("Documento inicial...")
+- os textos de test_vector_store_operations gravados na coleção real
+- entradas órfãs (vetores sem documento no docstore)
+- duplicatas exatas (mesmo texto na mesma categoria) e quase-duplicatas
+  (cosseno >= --threshold na mesma categoria), mantendo a cópia mais recente
+
+O índice é reconstruído sem os vetores removidos (sem chamar a API de
+embeddings), o docstore perde as linhas que nenhum snapshot referencia e o
+relatório compara tamanho e latência de busca antes e depois.
+
+Os snapshots anteriores (FAISS_SNAPSHOT_RETAIN) ainda referenciam os chunks
+removidos para permitir o rollback, então essas linhas continuam no docstore
+e o relatório informa quantas. Com --drop-history os snapshots anteriores são
+descartados e o docstore encolhe de fato.
+
+Uso:
+    python -m agentes.compact --dry-run
+    python -m agentes.compact --threshold 0.97 --output compact.json
+    python -m agentes.compact --drop-history
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import statistics
+import time
+from typing import Any, Dict, List, Optional
+
+import faiss
+import numpy as np
+
+# Importação robusta que funciona tanto em execução direta quanto como módulo
+try:
+    from .vectordb_config import INITIAL_DOCUMENT, TEST_DOCUMENTS, VectorDBConfig
+    from .docstore import SQLiteDocstore
+    from .rag_service import RAGService
+    from .ingestion import KnowledgeIngester
+except ImportError:
+    from vectordb_config import INITIAL_DOCUMENT, TEST_DOCUMENTS, VectorDBConfig
+    from docstore import SQLiteDocstore
+    from rag_service import RAGService
+    from ingestion import KnowledgeIngester
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Remove duplicatas, órfãos e entradas de teste do índice FAISS")
+    parser.add_argument("--threshold", type=float, default=0.98,
+                        help="Similaridade de cosseno a partir da qual dois chunks da mesma categoria são quase-duplicatas")
+    parser.add_argument("--neighbors", type=int, default=16,
+                        help="Vizinhos examinados por chunk na busca de quase-duplicatas")
+    parser.add_argument("--no-near", action="store_true", help="Remove apenas duplicatas exatas")
+    parser.add_argument("--queries", type=int, default=200, help="Consultas usadas na medição de latência")
+    parser.add_argument("--dry-run", action="store_true", help="Apenas relata o que seria removido")
+    parser.add_argument("--drop-history", action="store_true",
+                        help="Descarta os snapshots anteriores ao atual (sem rollback) para remover do docstore as linhas que só eles referenciam")
+    parser.add_argument("--output", default=None, help="Grava o relatório em JSON")
+    return parser.parse_args()
+
+
+def _content_key(category: str, text: str) -> str:
+    normalized = " ".join(text.split()).lower()
+    return f"{category}:{hashlib.sha256(normalized.encode('utf-8')).hexdigest()}"
+
+
+def plan_compaction(config: VectorDBConfig, vector_store, vectors: np.ndarray, threshold: float = 0.98,
+                    neighbors: int = 16, near: bool = True) -> Dict[str, List[str]]:
+    """
+    Decide quais chunks remover, por motivo.
+
+    Nas duplicatas, a cópia mantida é a mais recente (maior posição no índice).
+
+    Args:
+        config: Configuração da coleção
+        vector_store: Handle a analisar
+        vectors: Vetores do índice, na ordem das posições
+        threshold: Cosseno mínimo das quase-duplicatas
+        neighbors: Vizinhos examinados por chunk
+        near: Procura quase-duplicatas (além das exatas)
+
+    Returns:
+        Dict[str, List[str]]: IDs a remover por motivo (inicial, teste, orfao, duplicata, quase_duplicata)
+    """
+    documents = dict(config.iter_documents(vector_store))
+    tests = {(text, json.dumps(metadata, sort_keys=True)) for text, metadata in TEST_DOCUMENTS}
+
+    plan: Dict[str, List[str]] = {"inicial": [], "teste": [], "orfao": [], "duplicata": [], "quase_duplicata": []}
+    by_category: Dict[str, List[int]] = {}
+    seen_content: Dict[str, str] = {}
+
+    # Do mais recente para o mais antigo: a primeira cópia vista é a mantida
+    for position in sorted(vector_store.index_to_docstore_id, reverse=True):
+        doc_id = vector_store.index_to_docstore_id[position]
+        doc = documents.get(doc_id)
+        if doc is None:
+            plan["orfao"].append(doc_id)
+        elif doc.page_content == INITIAL_DOCUMENT.page_content and doc.metadata.get("categoria") == "inicial":
+            plan["inicial"].append(doc_id)
+        elif (doc.page_content, json.dumps(doc.metadata, sort_keys=True)) in tests:
+            plan["teste"].append(doc_id)
+        else:
+            category = config.category_of(doc)
+            key = _content_key(category, doc.page_content)
+            if key in seen_content:
+                plan["duplicata"].append(doc_id)
+            else:
+                seen_content[key] = doc_id
+                by_category.setdefault(category, []).append(position)
+
+    if near and len(vectors):
+        normalized = np.ascontiguousarray(vectors, dtype="float32").copy()
+        faiss.normalize_L2(normalized)
+        for category_positions in by_category.values():
+            plan["quase_duplicata"].extend(
+                vector_store.index_to_docstore_id[position]
+                for position in _near_duplicates(normalized, category_positions, threshold, neighbors)
+            )
+
+    return plan
+
+
+def _near_duplicates(normalized: np.ndarray, positions: List[int], threshold: float, neighbors: int) -> List[int]:
+    """Posições cobertas por um chunk mais recente já mantido (cosseno >= threshold)."""
+    if len(positions) < 2:
+        return []
+    index = faiss.IndexFlatIP(normalized.shape[1])
+    index.add(normalized[positions])
+    similarities, found = index.search(normalized[positions], min(neighbors + 1, len(positions)))
+
+    kept = set()
+    dropped = []
+    # positions já vem do mais recente para o mais antigo
+    for row, position in enumerate(positions):
+        duplicate_of_kept = any(
+            neighbor >= 0 and neighbor != row and similarity >= threshold and positions[neighbor] in kept
+            for similarity, neighbor in zip(similarities[row], found[row])
+        )
+        if duplicate_of_kept:
+            dropped.append(position)
+        else:
+            kept.add(position)
+    return dropped
+
+
+def measure_search(index, queries: np.ndarray, k: int = 5) -> Dict[str, float]:
+    """Latência p50/p95 de uma consulta por vez (ms)."""
+    if index.ntotal == 0 or not len(queries):
+        return {"p50_ms": 0.0, "p95_ms": 0.0}
+    index.search(queries[:1], k)
+    timings = []
+    for row in range(len(queries)):
+        start = time.perf_counter()
+        index.search(queries[row:row + 1], k)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        "p50_ms": round(statistics.median(timings), 4),
+        "p95_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 4)
+    }
+
+
+def describe(config: VectorDBConfig, vector_store, queries: np.ndarray) -> Dict[str, Any]:
+    """Tamanho e latência do índice para o relatório."""
+    docstore = vector_store.docstore
+    docstore_path = docstore.path if isinstance(docstore, SQLiteDocstore) else config.docstore_file
+    return {
+        "vectors": int(vector_store.index.ntotal),
+        "index_bytes": len(faiss.serialize_index(vector_store.index)),
+        "docstore_rows": len(docstore.ids()) if isinstance(docstore, SQLiteDocstore) else None,
+        # Em modo WAL, parte das páginas ainda está no arquivo -wal
+        "docstore_bytes": sum(os.path.getsize(path) for path in (docstore_path, f"{docstore_path}-wal") if os.path.exists(path)),
+        "search": measure_search(vector_store.index, queries)
+    }
+
+
+def main() -> bool:
+    args = parse_args()
+    config = VectorDBConfig()
+
+    # Nenhum outro processo publica durante a compactação
+    with config.publish_lock():
+        vector_store = config.get_writable_vector_store()
+        config._merge_published(vector_store)
+        vectors = VectorDBConfig._reconstruct_vectors(vector_store.index)
+
+        plan = plan_compaction(config, vector_store, vectors, args.threshold, args.neighbors, near=not args.no_near)
+        removed = [doc_id for ids in plan.values() for doc_id in ids]
+        print("🧹 A remover: " + ", ".join(f"{reason}: {len(ids)}" for reason, ids in plan.items()))
+
+        # Mesmas consultas antes e depois: vetores de chunks mantidos
+        removed_set = set(removed)
+        kept_positions = [position for position, doc_id in sorted(vector_store.index_to_docstore_id.items())
+                          if doc_id not in removed_set]
+        rng = np.random.default_rng(0)
+        sample = rng.choice(kept_positions, min(args.queries, len(kept_positions)), replace=False) if kept_positions else []
+        queries = np.ascontiguousarray(vectors[sample], dtype="float32") if len(sample) else np.zeros((0, vectors.shape[1]), dtype="float32")
+        if VectorDBConfig._metric_of(vector_store) == "ip" and len(queries):
+            faiss.normalize_L2(queries)
+
+        report: Dict[str, Any] = {
+            "threshold": args.threshold,
+            "removed": {reason: len(ids) for reason, ids in plan.items()},
+            "before": describe(config, vector_store, queries)
+        }
+
+        if not args.dry_run and removed:
+            # Órfãos já não têm documento; os demais saem do docstore com o índice novo
+            orphans = set(plan["orfao"])
+            vector_store.docstore.delete([doc_id for doc_id in removed if doc_id not in orphans])
+            if not config.rebuild_index(vector_store, factory=getattr(vector_store, "index_factory", "Flat"),
+                                        metric=VectorDBConfig._metric_of(vector_store),
+                                        keep_positions=kept_positions, save=True):
+                return False
+
+        if not args.dry_run:
+            if args.drop_history:
+                report["snapshots_dropped"] = config.drop_snapshot_history()
+            
+            # Linhas que nenhum snapshot mantido referencia (inclui restos de versões antigas)
+            docstore = vector_store.docstore
+            referenced = config.referenced_ids()
+            if isinstance(docstore, SQLiteDocstore):
+                pruned = docstore.prune(referenced, candidates=docstore.ids())
+                docstore.vacuum()
+                report["docstore_rows_pruned"] = pruned
+            # Removidos do índice, mas mantidos no docstore para o rollback
+            report["docstore_rows_retained_by_history"] = len((removed_set - set(plan["orfao"])) & referenced)
+            report["after"] = describe(config, vector_store, queries)
+
+    if not args.dry_run and removed:
+        # A ingestão incremental não deve reprocessar arquivos por causa dos chunks removidos
+        report["manifest_chunks_forgotten"] = KnowledgeIngester(RAGService()).forget_chunks(removed)
+
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"💾 Relatório salvo em {args.output}")
+    return True
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    before = report["before"]
+    after: Optional[Dict[str, Any]] = report.get("after")
+    print(f"📦 Antes:  {before['vectors']} vetores, índice {before['index_bytes'] / 1e6:.2f} MB, "
+          f"docstore {before['docstore_bytes'] / 1e6:.2f} MB, busca p50 {before['search']['p50_ms']:.3f} ms "
+          f"/ p95 {before['search']['p95_ms']:.3f} ms")
+    if after is None:
+        print("🔍 Simulação (--dry-run): nada foi alterado")
+        return
+    print(f"✅ Depois: {after['vectors']} vetores, índice {after['index_bytes'] / 1e6:.2f} MB, "
+          f"docstore {after['docstore_bytes'] / 1e6:.2f} MB, busca p50 {after['search']['p50_ms']:.3f} ms "
+          f"/ p95 {after['search']['p95_ms']:.3f} ms")
+    if report.get("snapshots_dropped"):
+        print(f"🗑️ {report['snapshots_dropped']} snapshots anteriores descartados (rollback indisponível)")
+    if report.get("docstore_rows_pruned"):
+        print(f"🗑️ {report['docstore_rows_pruned']} linhas sem referência removidas do docstore")
+    retained = report.get("docstore_rows_retained_by_history")
+    if retained:
+        print(f"⚠️ {retained} chunks removidos do índice continuam no docstore: snapshots anteriores ainda os "
+              f"referenciam (rollback). O docstore só encolhe quando esses snapshots saem da retenção "
+              f"ou com --drop-history")
+
+
+if __name__ == "__main__":
+    raise SystemExit(0 if main() else 1)
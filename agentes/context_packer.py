@@ -0,0 +1,274 @@
+"""
+Empacotamento do contexto do RAG em um orçamento de tokens.
+
+O contexto era montado com os 10 primeiros resultados até 2000 caracteres: os
+chunks vizinhos repetem até 200 caracteres (chunk_overlap), trechos quase
+idênticos ocupavam espaço duas vezes e o limite ignorava a contagem real de
+tokens. O ContextPacker conta tokens com o tiktoken, remove a sobreposição
+entre chunks vizinhos do mesmo arquivo, descarta quase-duplicatas e escolhe os
+trechos por relevância marginal máxima (MMR) até preencher o orçamento. O
+trecho que não cabe inteiro no que resta do orçamento é truncado.
+"""
+
+import math
+import os
+import threading
+from typing import Any, Dict, List, Optional, Set
+
+# Importação robusta que funciona tanto em execução direta quanto como módulo
+try:
+    from .lexical_index import analyze
+except ImportError:
+    from lexical_index import analyze
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+def get_encoding(model: Optional[str] = None):
+    """
+    Codificação do tiktoken do modelo do LLM, carregada uma vez por processo.
+
+    O tiktoken baixa o arquivo da codificação no primeiro uso (depois fica no
+    cache em disco). Sem ele, a contagem cai para a estimativa de 4 caracteres
+    por token.
+
+    Returns:
+        tiktoken.Encoding ou None se indisponível
+    """
+    global _encoding
+    if _encoding is None:
+        with _encoding_lock:
+            if _encoding is None:
+                try:
+                    import tiktoken
+                    model = model or os.getenv("OPENAI_MODEL", "gpt-4.1-mini")
+                    try:
+                        _encoding = tiktoken.encoding_for_model(model)
+                    except KeyError:
+                        _encoding = tiktoken.get_encoding("o200k_base")
+                except Exception as e:
+                    print(f"⚠️ tiktoken indisponível ({e}); estimando 4 caracteres por token")
+                    _encoding = False
+    return _encoding or None
+
+
+def count_tokens(text: str) -> int:
+    """Número de tokens do texto no modelo do LLM."""
+    encoding = get_encoding()
+    if encoding is None:
+        return math.ceil(len(text) / 4)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """Prefixo do texto com no máximo `max_tokens` tokens, cortado no fim de uma palavra."""
+    if max_tokens <= 0:
+        return ""
+    encoding = get_encoding()
+    if encoding is None:
+        prefix = text[:max_tokens * 4]
+    else:
+        prefix = encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens])
+    if len(prefix) < len(text) and " " in prefix:
+        prefix = prefix.rsplit(" ", 1)[0]
+    return prefix.strip()
+
+
+def _min_max(values: Dict[int, float], higher_is_better: bool = True) -> Dict[int, float]:
+    """Normaliza um sinal para 0-1 entre os candidatos (todos iguais = 1)."""
+    if not values:
+        return {}
+    low, high = min(values.values()), max(values.values())
+    if high == low:
+        return {key: 1.0 for key in values}
+    return {
+        key: (value - low) / (high - low) if higher_is_better else (high - value) / (high - low)
+        for key, value in values.items()
+    }
+
+
+def _shingles(terms: List[str], size: int = 3) -> Set[tuple]:
+    if len(terms) < size:
+        return {tuple(terms)} if terms else set()
+    return {tuple(terms[i:i + size]) for i in range(len(terms) - size + 1)}
+
+
+def _jaccard(a: Set, b: Set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class ContextPacker:
+    """Seleciona e formata trechos do contexto dentro de um orçamento de tokens."""
+
+    def __init__(self, token_budget: int = 500, mmr_lambda: float = 0.7,
+                 duplicate_threshold: float = 0.8, max_overlap_chars: int = 400,
+                 min_truncated_tokens: int = 30):
+        """
+        Inicializa o empacotador.
+
+        Args:
+            token_budget: Máximo de tokens do contexto formatado (cabeçalho incluído)
+            mmr_lambda: Peso da relevância no MMR (1.0 = só relevância, 0.0 = só diversidade)
+            duplicate_threshold: Similaridade (Jaccard de trigramas) a partir da qual um trecho é quase-duplicata
+            max_overlap_chars: Maior sobreposição procurada entre chunks vizinhos
+            min_truncated_tokens: Menor trecho truncado que ainda vale incluir
+        """
+        self.token_budget = token_budget
+        self.mmr_lambda = mmr_lambda
+        self.duplicate_threshold = duplicate_threshold
+        self.max_overlap_chars = max_overlap_chars
+        self.min_truncated_tokens = min_truncated_tokens
+
+    @staticmethod
+    def _position(ctx: Dict[str, Any]):
+        metadata = ctx.get("metadata") or {}
+        return metadata.get("file_path") or metadata.get("source"), metadata.get("chunk_id")
+
+    def _trim_overlap(self, text: str, ctx: Dict[str, Any], selected: List[Dict[str, Any]]) -> str:
+        """Remove o trecho que o chunk repete de um vizinho já selecionado (chunk_id ± 1)."""
+        source, chunk_id = self._position(ctx)
+        if source is None or not isinstance(chunk_id, int):
+            return text
+
+        for other in selected:
+            other_source, other_id = self._position(other["context"])
+            if other_source != source or not isinstance(other_id, int):
+                continue
+            if other_id == chunk_id - 1:
+                text = text[self._overlap(other["context"]["content"], text):]
+            elif other_id == chunk_id + 1:
+                overlap = self._overlap(text, other["context"]["content"])
+                text = text[:len(text) - overlap]
+        return text.strip()
+
+    def _overlap(self, before: str, after: str) -> int:
+        """Tamanho do maior sufixo de `before` que é prefixo de `after`."""
+        for size in range(min(len(before), len(after), self.max_overlap_chars), 19, -1):
+            if before.endswith(after[:size]):
+                return size
+        return 0
+
+    @staticmethod
+    def _relevance(contexts: List[Dict[str, Any]]) -> List[float]:
+        """
+        Relevância 0-1 de cada resultado para o MMR.
+
+        A distância L2 da busca vetorial e o score BM25 da lexical estão em
+        escalas diferentes (e o score do BM25 não tem teto), então cada sinal é
+        normalizado entre os candidatos antes de combinar; na busca híbrida a
+        relevância é a média dos dois, com 0 para o sinal em que o trecho não
+        apareceu. Sem esses sinais vale o similarity_score e, sem ele, a ordem
+        da busca.
+        """
+        retrieval = [ctx.get("retrieval") or {} for ctx in contexts]
+        signals = [
+            _min_max({i: r["vector_distance"] for i, r in enumerate(retrieval)
+                      if r.get("vector_distance") is not None}, higher_is_better=False),
+            _min_max({i: r["lexical_score"] for i, r in enumerate(retrieval)
+                      if r.get("lexical_score") is not None})
+        ]
+        signals = [signal for signal in signals if signal]
+        if signals:
+            return [sum(signal.get(i, 0.0) for signal in signals) / len(signals) for i in range(len(contexts))]
+
+        best_score = max((ctx.get("similarity_score") or 0.0) for ctx in contexts)
+        return [
+            ctx["similarity_score"] / best_score if ctx.get("similarity_score") and best_score > 0 else 1.0 / (rank + 1)
+            for rank, ctx in enumerate(contexts)
+        ]
+
+    def pack(self, contexts: List[Dict[str, Any]], header: str = "") -> List[Dict[str, Any]]:
+        """
+        Escolhe os trechos que cabem no orçamento.
+
+        Args:
+            contexts: Resultados de RAGService.search_relevant_context (ordem de relevância)
+            header: Cabeçalho do contexto (seus tokens entram no orçamento)
+
+        Returns:
+            List[Dict]: Trechos escolhidos, na ordem de seleção, com "content"
+            (sem sobreposição), "tokens" e "context" (resultado original)
+        """
+        remaining = self.token_budget - (count_tokens(header) if header else 0)
+        if not contexts or remaining <= 0:
+            return []
+
+        candidates = []
+        for ctx, relevance in zip(contexts, self._relevance(contexts)):
+            terms = analyze(ctx["content"])
+            candidates.append({
+                "context": ctx,
+                "relevance": relevance,
+                "terms": set(terms),
+                "shingles": _shingles(terms)
+            })
+
+        selected: List[Dict[str, Any]] = []
+        while candidates and remaining > 0:
+            best = None
+            for candidate in candidates:
+                diversity_penalty = max((_jaccard(candidate["terms"], s["terms"]) for s in selected), default=0.0)
+                candidate["mmr"] = self.mmr_lambda * candidate["relevance"] - (1 - self.mmr_lambda) * diversity_penalty
+                if best is None or candidate["mmr"] > best["mmr"]:
+                    best = candidate
+            candidates.remove(best)
+
+            if any(_jaccard(best["shingles"], s["shingles"]) >= self.duplicate_threshold for s in selected):
+                continue
+
+            content = self._trim_overlap(best["context"]["content"], best["context"], selected)
+            if not content:
+                continue
+
+            number = len(selected) + 1
+            tokens = count_tokens(f"{number}. {content}\n")
+            if tokens > remaining:
+                # Não cabe inteiro: trunca no que resta do orçamento
+                content = self._truncate(content, number, remaining)
+                if not content:
+                    continue
+                tokens = count_tokens(f"{number}. {content}\n")
+
+            best["content"] = content
+            best["tokens"] = tokens
+            selected.append(best)
+            remaining -= tokens
+
+        return [
+            {"content": item["content"], "tokens": item["tokens"], "context": item["context"]}
+            for item in selected
+        ]
+
+    def _truncate(self, content: str, number: int, budget: int) -> str:
+        """Trunca o trecho para que a linha numerada caiba em `budget` tokens ("" se ficar curto demais)."""
+        limit = budget - count_tokens(f"{number}. …\n")
+        while limit >= self.min_truncated_tokens:
+            truncated = truncate_tokens(content, limit)
+            excess = count_tokens(f"{number}. {truncated} …\n") - budget
+            if excess <= 0:
+                return f"{truncated} …"
+            limit -= excess
+        return ""
+
+    def format(self, contexts: List[Dict[str, Any]], header: str) -> str:
+        """
+        Empacota e formata o contexto para o prompt.
+
+        Args:
+            contexts: Resultados da busca
+            header: Cabeçalho do contexto
+
+        Returns:
+            str: Contexto numerado (vazio se nenhum trecho couber)
+        """
+        packed = self.pack(contexts, header)
+        if not packed:
+            return ""
+
+        tokens = sum(item["tokens"] for item in packed)
+        print(f"🧩 Contexto: {len(packed)} de {len(contexts)} trechos, ~{tokens} tokens (orçamento {self.token_budget})")
+        body = "".join(f"{i}. {item['content']}\n" for i, item in enumerate(packed, 1))
+        return (header + body).strip()
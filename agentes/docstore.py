@@ -0,0 +1,262 @@
+"""
+Docstore em SQLite para o índice FAISS do sistema de emergência 911.
+
+O InMemoryDocstore do LangChain guarda o texto e os metadados de todos os chunks
+em um .pkl que é desserializado inteiro na carga: o tempo de início e a memória
+crescem com a base e a carga exige allow_dangerous_deserialization=True.
+O SQLiteDocstore mantém os chunks em disco e busca por ID apenas os documentos
+retornados pela busca vetorial (top-k).
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+from langchain.schema import Document
+from langchain_community.docstore.base import AddableMixin, Docstore
+
+
+class SQLiteDocstore(Docstore, AddableMixin):
+    """
+    Docstore persistido em SQLite, compatível com o FAISS do LangChain.
+
+    Inclusões e remoções ficam pendentes em memória até commit(), chamado pelo
+    VectorDBConfig ao salvar o índice: assim o arquivo em disco só passa a ter
+    os chunks novos junto com o índice que os referencia.
+    """
+
+    def __init__(self, path: str):
+        """
+        Inicializa o docstore.
+
+        Args:
+            path: Arquivo SQLite (criado se não existir)
+        """
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._conn_pid: Optional[int] = None
+        self._lock = threading.RLock()
+        self._pending_adds: Dict[str, Document] = {}
+        self._pending_deletes: set = set()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Conexão aberta sob demanda (e reaberta após fork)."""
+        if self._conn is None or self._conn_pid != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                " id TEXT PRIMARY KEY, content TEXT NOT NULL, metadata TEXT NOT NULL)"
+            )
+            self._conn = conn
+            self._conn_pid = os.getpid()
+        return self._conn
+
+    @staticmethod
+    def _to_document(content: str, metadata: str) -> Document:
+        return Document(page_content=content, metadata=json.loads(metadata))
+
+    def search(self, search: str) -> Union[str, Document]:
+        """
+        Busca um documento pelo ID.
+
+        Args:
+            search: ID do documento
+
+        Returns:
+            Union[str, Document]: Documento ou mensagem de ID não encontrado
+        """
+        found = self.mget([search])
+        return found.get(search, f"ID {search} not found.")
+
+    def mget(self, ids: Iterable[str]) -> Dict[str, Document]:
+        """
+        Busca vários documentos em uma única consulta.
+
+        Args:
+            ids: IDs dos documentos
+
+        Returns:
+            Dict[str, Document]: Documentos encontrados por ID
+        """
+        found: Dict[str, Document] = {}
+        missing = []
+        with self._lock:
+            for doc_id in ids:
+                if doc_id in self._pending_deletes:
+                    continue
+                if doc_id in self._pending_adds:
+                    found[doc_id] = self._pending_adds[doc_id]
+                else:
+                    missing.append(doc_id)
+
+            conn = self._connection()
+            # Lotes abaixo do limite de parâmetros do SQLite
+            for start in range(0, len(missing), 500):
+                batch = missing[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                for doc_id, content, metadata in conn.execute(
+                    f"SELECT id, content, metadata FROM documents WHERE id IN ({placeholders})", batch
+                ):
+                    found[doc_id] = self._to_document(content, metadata)
+        return found
+
+    def add(self, texts: Dict[str, Document]) -> None:
+        """Adiciona documentos (pendentes até commit())."""
+        with self._lock:
+            for doc_id, doc in texts.items():
+                self._pending_deletes.discard(doc_id)
+                self._pending_adds[doc_id] = doc
+
+    def delete(self, ids: List) -> None:
+        """Remove documentos (a remoção em disco acontece em commit())."""
+        with self._lock:
+            for doc_id in ids:
+                if self._pending_adds.pop(doc_id, None) is None:
+                    self._pending_deletes.add(doc_id)
+
+    def commit(self, apply_deletes: bool = True) -> None:
+        """
+        Grava as inclusões pendentes e, opcionalmente, as remoções.
+
+        Args:
+            apply_deletes: Aplica também as remoções. O VectorDBConfig grava as
+                inclusões antes de publicar o índice novo e as remoções depois,
+                para que leitores do índice anterior continuem encontrando seus chunks.
+        """
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                if self._pending_adds:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO documents (id, content, metadata) VALUES (?, ?, ?)",
+                        [
+                            (doc_id, doc.page_content, json.dumps(doc.metadata, ensure_ascii=False, default=str))
+                            for doc_id, doc in self._pending_adds.items()
+                        ]
+                    )
+                if apply_deletes and self._pending_deletes:
+                    conn.executemany(
+                        "DELETE FROM documents WHERE id = ?",
+                        [(doc_id,) for doc_id in self._pending_deletes]
+                    )
+            self._pending_adds.clear()
+            if apply_deletes:
+                self._pending_deletes.clear()
+
+    def prune(self, referenced: Set[str], candidates: Iterable[str] = ()) -> int:
+        """
+        Remove do disco os documentos que nenhum snapshot mantido referencia.
+
+        Substitui a aplicação das remoções pendentes quando o índice guarda
+        snapshots para rollback: um chunk removido do índice atual continua no
+        disco enquanto algum snapshot anterior ainda aponta para ele.
+
+        Args:
+            referenced: IDs referenciados pelos snapshots mantidos
+            candidates: IDs que deixaram de ser referenciados (ex.: snapshots descartados),
+                avaliados junto com as remoções pendentes
+
+        Returns:
+            int: Quantidade de documentos removidos do disco
+        """
+        with self._lock:
+            removable = [(doc_id,) for doc_id in self._pending_deletes.union(candidates) if doc_id not in referenced]
+            conn = self._connection()
+            with conn:
+                if removable:
+                    conn.executemany("DELETE FROM documents WHERE id = ?", removable)
+            self._pending_deletes.clear()
+            return len(removable)
+
+    @property
+    def has_pending(self) -> bool:
+        return bool(self._pending_adds or self._pending_deletes)
+
+    def iter_documents(self, ids: List[str], batch_size: int = 500) -> Iterator[Tuple[str, Document]]:
+        """
+        Percorre os documentos na ordem dos IDs, buscando em lotes.
+
+        Args:
+            ids: IDs na ordem desejada (ex.: ordem do índice FAISS)
+            batch_size: Quantidade de documentos por consulta
+
+        Yields:
+            Tuple[str, Document]: (id, documento)
+        """
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start:start + batch_size]
+            found = self.mget(batch)
+            for doc_id in batch:
+                if doc_id in found:
+                    yield doc_id, found[doc_id]
+
+    def replace_all(self, documents: Dict[str, Document]) -> None:
+        """
+        Substitui todo o conteúdo do arquivo pelos documentos informados.
+
+        Usado só na migração do .pkl, que é a fonte de verdade dos documentos.
+        """
+        with self._lock:
+            self._pending_adds.clear()
+            self._pending_deletes.clear()
+            conn = self._connection()
+            with conn:
+                conn.execute("DELETE FROM documents")
+                conn.executemany(
+                    "INSERT INTO documents (id, content, metadata) VALUES (?, ?, ?)",
+                    [
+                        (doc_id, doc.page_content, json.dumps(doc.metadata, ensure_ascii=False, default=str))
+                        for doc_id, doc in documents.items()
+                    ]
+                )
+
+    def find_metadata(self, key: str) -> Dict[str, Dict]:
+        """
+        Metadados dos documentos gravados que têm a chave informada.
+
+        O filtro roda no SQLite (json_extract): só as linhas encontradas são
+        lidas, e o texto dos documentos não é carregado.
+
+        Args:
+            key: Chave de metadados (ex.: "protocol_type")
+
+        Returns:
+            Dict[str, Dict]: Metadados por ID, incluindo as inclusões pendentes
+        """
+        with self._lock:
+            found = {
+                doc_id: json.loads(metadata)
+                for doc_id, metadata in self._connection().execute(
+                    "SELECT id, metadata FROM documents WHERE json_extract(metadata, ?) IS NOT NULL",
+                    (f"$.{key}",)
+                )
+                if doc_id not in self._pending_deletes
+            }
+            found.update({
+                doc_id: doc.metadata for doc_id, doc in self._pending_adds.items() if key in doc.metadata
+            })
+            return found
+
+    def ids(self) -> List[str]:
+        """IDs de todos os documentos gravados no arquivo."""
+        with self._lock:
+            return [row[0] for row in self._connection().execute("SELECT id FROM documents")]
+
+    def vacuum(self) -> None:
+        """Reescreve o arquivo sem as páginas livres deixadas pelas remoções."""
+        with self._lock:
+            conn = self._connection()
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            conn.execute("VACUUM")
+
+    def close(self) -> None:
+        """Fecha a conexão do processo atual."""
+        with self._lock:
+            if self._conn is not None and self._conn_pid == os.getpid():
+                self._conn.close()
+            self._conn = None
@@ -0,0 +1,144 @@
+"""
+Micro-batching de embeddings de consultas para o sistema de emergência 911.
+
+Sob carga, cada requisição de classificação fazia a sua própria chamada de
+embeddings com um único texto. O MicroBatchingEmbeddings junta as consultas
+que chegam dentro de uma janela curta (alguns milissegundos) ou até um tamanho
+máximo de lote, faz uma única chamada em lote ao modelo e devolve cada vetor a
+quem o pediu. Fica abaixo do cache: só as consultas que não estão no cache
+entram na fila.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+
+class MicroBatchingEmbeddings(Embeddings):
+    """Agrupa chamadas concorrentes de embed_query em lotes."""
+
+    def __init__(self, underlying: Embeddings, max_batch_size: int = 16, max_wait_ms: float = 5.0,
+                 max_concurrent_batches: int = 4):
+        """
+        Inicializa o micro-batcher.
+
+        Args:
+            underlying: Modelo de embeddings real (ex.: OpenAIEmbeddings)
+            max_batch_size: Máximo de consultas por chamada em lote
+            max_wait_ms: Espera máxima da primeira consulta do lote antes do envio
+            max_concurrent_batches: Lotes enviados em paralelo ao modelo
+        """
+        self.underlying = underlying
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.max_concurrent_batches = max(1, max_concurrent_batches)
+
+        self._queue: Deque[Tuple[str, Future, float]] = deque()
+        self._condition = threading.Condition()
+        self._dispatcher: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pid: Optional[int] = None
+
+        self._stats = {"requests": 0, "batched": 0, "batches": 0, "full_batches": 0, "errors": 0,
+                       "queue_seconds": 0.0, "max_queue_seconds": 0.0}
+        self._recent_queue_ms: Deque[float] = deque(maxlen=1024)
+        self._stats_lock = threading.Lock()
+
+    def _ensure_dispatcher(self) -> None:
+        """Inicia o despachante no processo atual (threads não sobrevivem ao fork)."""
+        if self._pid == os.getpid():
+            return
+        self._queue.clear()
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrent_batches, thread_name_prefix="embed-batch"
+        )
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name="embed-batcher", daemon=True)
+        self._pid = os.getpid()
+        self._dispatcher.start()
+
+    def _dispatch_loop(self) -> None:
+        """Forma lotes: envia quando o lote enche ou quando a consulta mais antiga atinge max_wait."""
+        while True:
+            with self._condition:
+                while not self._queue:
+                    self._condition.wait()
+
+                deadline = self._queue[0][2] + self.max_wait
+                while len(self._queue) < self.max_batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+
+                batch = [self._queue.popleft() for _ in range(min(self.max_batch_size, len(self._queue)))]
+
+            self._record_batch(batch)
+            self._executor.submit(self._run_batch, batch)
+
+    def _record_batch(self, batch: List[Tuple[str, Future, float]]) -> None:
+        now = time.monotonic()
+        with self._stats_lock:
+            self._stats["batches"] += 1
+            self._stats["batched"] += len(batch)
+            self._stats["full_batches"] += int(len(batch) == self.max_batch_size)
+            for _, _, enqueued_at in batch:
+                waited = now - enqueued_at
+                self._stats["queue_seconds"] += waited
+                self._stats["max_queue_seconds"] = max(self._stats["max_queue_seconds"], waited)
+                self._recent_queue_ms.append(waited * 1000)
+
+    def _run_batch(self, batch: List[Tuple[str, Future, float]]) -> None:
+        """Uma chamada em lote ao modelo; cada consulta recebe o seu vetor (ou o erro)."""
+        try:
+            vectors = self.underlying.embed_documents([text for text, _, _ in batch])
+        except Exception as e:
+            with self._stats_lock:
+                self._stats["errors"] += 1
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+
+        for (_, future, _), vector in zip(batch, vectors):
+            future.set_result(vector)
+
+    def embed_query(self, text: str) -> List[float]:
+        """Entra na fila do próximo lote e espera o vetor da consulta."""
+        future: Future = Future()
+        with self._stats_lock:
+            self._stats["requests"] += 1
+        with self._condition:
+            self._ensure_dispatcher()
+            self._queue.append((text, future, time.monotonic()))
+            self._condition.notify()
+        return future.result()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Documentos já chegam em lote (ingestão): chamada direta ao modelo."""
+        return self.underlying.embed_documents(texts)
+
+    def stats(self) -> Dict[str, Any]:
+        """Preenchimento dos lotes e atraso de fila adicionado às consultas."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+            recent = sorted(self._recent_queue_ms)
+
+        batches = stats["batches"]
+        batched = stats["batched"]
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "requests": stats["requests"],
+            "batches": batches,
+            "errors": stats["errors"],
+            "mean_batch_size": round(batched / batches, 2) if batches else 0.0,
+            "batch_fill": round(batched / (batches * self.max_batch_size), 3) if batches else 0.0,
+            "full_batches": stats["full_batches"],
+            "mean_queue_ms": round(stats["queue_seconds"] * 1000 / batched, 3) if batched else 0.0,
+            "p95_queue_ms": round(recent[min(len(recent) - 1, int(len(recent) * 0.95))], 3) if recent else 0.0,
+            "max_queue_ms": round(stats["max_queue_seconds"] * 1000, 3)
+        }
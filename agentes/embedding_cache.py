@@ -0,0 +1,204 @@
+"""
+Cache de embeddings para o sistema de emergência 911.
+
+Cada classificação de urgência embute o relato para buscar contexto, e relatos
+repetidos ou quase idênticos pagavam uma chamada de rede à OpenAI toda vez.
+O CachedEmbeddings envolve qualquer modelo de embeddings do LangChain com duas
+camadas: um LRU em memória e uma tabela SQLite em disco que sobrevive a
+reinícios e é compartilhada entre os workers.
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional
+
+from langchain_core.embeddings import Embeddings
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normaliza o texto antes de calcular a chave do cache.
+
+    Unicode NFC, minúsculas e espaços colapsados: variações triviais do mesmo
+    relato ("Fogo  na casa" / "fogo na casa") reaproveitam o mesmo vetor.
+    """
+    text = unicodedata.normalize("NFC", text)
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings com cache LRU em memória e persistência em SQLite."""
+
+    def __init__(
+        self,
+        underlying: Embeddings,
+        model_name: str,
+        cache_path: Optional[str] = None,
+        max_memory_items: int = 4096,
+        cache_documents: bool = False
+    ):
+        """
+        Inicializa o cache.
+
+        Args:
+            underlying: Modelo de embeddings real (ex.: OpenAIEmbeddings)
+            model_name: Identificador do modelo (entra na chave do cache)
+            cache_path: Arquivo SQLite do cache em disco (None desativa o disco)
+            max_memory_items: Tamanho máximo do LRU em memória
+            cache_documents: Também guarda embeddings de documentos (ingestão)
+        """
+        self.underlying = underlying
+        self.model_name = model_name
+        self.cache_path = cache_path
+        self.max_memory_items = max_memory_items
+        self.cache_documents = cache_documents
+
+        self._memory: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._conn_pid: Optional[int] = None
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+    def _key(self, text: str) -> str:
+        payload = f"{self.model_name}\x00{normalize_text(text)}".encode("utf-8")
+        return hashlib.sha256(payload).hexdigest()
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        """Conexão SQLite aberta sob demanda (e reaberta após fork)."""
+        if not self.cache_path:
+            return None
+
+        if self._conn is None or self._conn_pid != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.cache_path)), exist_ok=True)
+            conn = sqlite3.connect(self.cache_path, timeout=5, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " key TEXT PRIMARY KEY, model TEXT NOT NULL, dim INTEGER NOT NULL,"
+                " vector BLOB NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._conn = conn
+            self._conn_pid = os.getpid()
+        return self._conn
+
+    def _remember(self, key: str, vector: List[float]) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def _lookup(self, keys: List[str]) -> Dict[str, List[float]]:
+        """Busca chaves no LRU e depois no disco; atualiza as estatísticas."""
+        found: Dict[str, List[float]] = {}
+        missing_in_memory = []
+
+        with self._lock:
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+                    self._stats["memory_hits"] += 1
+                else:
+                    missing_in_memory.append(key)
+
+            if missing_in_memory:
+                conn = self._connection()
+                if conn is not None:
+                    try:
+                        rows = []
+                        # Lotes abaixo do limite de parâmetros do SQLite
+                        for start in range(0, len(missing_in_memory), 500):
+                            batch = missing_in_memory[start:start + 500]
+                            placeholders = ",".join("?" * len(batch))
+                            rows.extend(conn.execute(
+                                f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                                batch
+                            ).fetchall())
+                    except sqlite3.Error as e:
+                        print(f"⚠️ Erro ao ler cache de embeddings: {e}")
+                        rows = []
+                    for key, blob in rows:
+                        vector = array("f", blob).tolist()
+                        found[key] = vector
+                        self._remember(key, vector)
+                        self._stats["disk_hits"] += 1
+
+            self._stats["misses"] += len(keys) - len(found)
+
+        return found
+
+    def _store(self, items: Dict[str, List[float]]) -> None:
+        """Grava vetores recém-calculados nas duas camadas."""
+        with self._lock:
+            for key, vector in items.items():
+                self._remember(key, vector)
+
+            conn = self._connection()
+            if conn is None:
+                return
+            try:
+                now = time.time()
+                conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, model, dim, vector, created_at) VALUES (?, ?, ?, ?, ?)",
+                    [(key, self.model_name, len(vector), array("f", vector).tobytes(), now) for key, vector in items.items()]
+                )
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"⚠️ Erro ao gravar cache de embeddings: {e}")
+
+    def _embed_cached(self, texts: List[str], compute) -> List[List[float]]:
+        keys = [self._key(text) for text in texts]
+        found = self._lookup(list(dict.fromkeys(keys)))
+
+        # Calcula apenas os textos ausentes (sem repetir duplicatas do lote)
+        pending = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in pending:
+                pending[key] = text
+
+        if pending:
+            vectors = compute(list(pending.values()))
+            computed = dict(zip(pending.keys(), vectors))
+            self._store(computed)
+            found.update(computed)
+
+        return [found[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embute uma consulta, consultando o cache antes da API."""
+        return self._embed_cached([text], lambda missing: [self.underlying.embed_query(missing[0])])[0]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embute documentos; usa o cache apenas se cache_documents=True."""
+        if not self.cache_documents:
+            return self.underlying.embed_documents(texts)
+        return self._embed_cached(texts, self.underlying.embed_documents)
+
+    def stats(self) -> Dict[str, Any]:
+        """Estatísticas de uso do cache (acertos por camada e taxa de acerto)."""
+        hits = self._stats["memory_hits"] + self._stats["disk_hits"]
+        total = hits + self._stats["misses"]
+        return {
+            **self._stats,
+            "hit_rate": round(hits / total, 4) if total else 0.0,
+            "memory_items": len(self._memory),
+            "cache_path": self.cache_path
+        }
+
+    def clear(self) -> None:
+        """Esvazia as duas camadas do cache."""
+        with self._lock:
+            self._memory.clear()
+            conn = self._connection()
+            if conn is not None:
+                conn.execute("DELETE FROM embeddings")
+                conn.commit()
@@ -0,0 +1,906 @@
+"""
+Ingestão offline de arquivos na base de conhecimento do sistema de emergência 911.
+Extrai o conteúdo de PDFs, CSVs, XLSX e TXT das pastas database/ e o envia ao RAGService.
+
+Este módulo concentra as dependências pesadas (pandas, PyPDF2) que o servidor não
+usa em tempo de consulta, por isso não é importado pelo caminho de serviço.
+
+Uso:
+    python -m agentes.ingestion
+"""
+
+import os
+import hashlib
+import json
+import time
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+import pandas as pd
+import PyPDF2
+from typing import Optional, Dict, Any, Iterable, Iterator, List, Tuple
+from pathlib import Path
+from langchain.schema import Document
+
+# Importação robusta que funciona tanto em execução direta quanto como módulo
+try:
+    from .rag_service import RAGService
+except ImportError:
+    from rag_service import RAGService
+
+class RateLimiter:
+    """Espaça o início das requisições para respeitar um limite por minuto."""
+    
+    def __init__(self, requests_per_minute: int):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+    
+    def acquire(self) -> None:
+        """Bloqueia até a próxima janela livre."""
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+def _extract_worker(file_path: str) -> Tuple[str, str, float]:
+    """Extrai um arquivo em um processo do pool (retorna caminho, conteúdo e duração)."""
+    start = time.perf_counter()
+    content = KnowledgeIngester._extract_content(Path(file_path))
+    return file_path, content, time.perf_counter() - start
+
+
+def count_pdf_pages(pdf_path: str) -> int:
+    """Número de páginas de um PDF (lê apenas a estrutura, não o texto)."""
+    with open(pdf_path, "rb") as file:
+        return len(PyPDF2.PdfReader(file).pages)
+
+
+def iter_pdf_pages(pdf_path: str, start: int = 0, stop: Optional[int] = None) -> Iterator[Tuple[int, str]]:
+    """
+    Extrai o texto das páginas de um PDF sob demanda, uma por vez.
+    
+    Args:
+        pdf_path: Caminho para o arquivo PDF
+        start: Primeira página (0-based)
+        stop: Página final exclusiva (None = até o fim)
+        
+    Yields:
+        Tuple[int, str]: (número da página 1-based, texto da página)
+    """
+    with open(pdf_path, "rb") as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        stop = len(pdf_reader.pages) if stop is None else min(stop, len(pdf_reader.pages))
+        
+        for page_num in range(start, stop):
+            try:
+                text = pdf_reader.pages[page_num].extract_text() or ""
+            except Exception as e:
+                print(f"⚠️  Página {page_num + 1} de {os.path.basename(pdf_path)} ignorada: {e}")
+                text = ""
+            yield page_num + 1, text
+
+
+def _extract_pages_worker(pdf_path: str, start: int, stop: int) -> Tuple[str, int, List[Tuple[int, str]], float]:
+    """Extrai um intervalo de páginas em um processo do pool (caminho, início, páginas e duração)."""
+    began = time.perf_counter()
+    pages = list(iter_pdf_pages(pdf_path, start, stop))
+    return pdf_path, start, pages, time.perf_counter() - began
+
+
+class PageChunker:
+    """
+    Divide o texto de um documento em chunks à medida que as páginas chegam.
+    
+    Mantém em memória apenas uma janela de alguns chunks: o último chunk de
+    cada divisão (possivelmente incompleto) volta para a janela e é completado
+    pelas páginas seguintes. Cada chunk guarda as páginas de início e fim.
+
+    Os chunks são os mesmos da divisão do texto inteiro enquanto o separador
+    de maior nível presente na janela for o mesmo do documento (o splitter
+    escolhe o primeiro separador que aparece no texto que recebe).
+    """
+    
+    def __init__(self, text_splitter, window_chunks: int = 4):
+        """
+        Args:
+            text_splitter: Splitter do RAGService (mesmo tamanho e sobreposição dos chunks)
+            window_chunks: Tamanho da janela, em chunks, antes de cada divisão
+        """
+        self.text_splitter = text_splitter
+        self.window = getattr(text_splitter, "_chunk_size", 1000) * window_chunks
+        self._buffer = ""
+        self._pages: List[Tuple[int, int]] = []  # (posição na janela, número da página)
+    
+    def feed(self, page_number: int, text: str) -> List[Tuple[str, int, int]]:
+        """
+        Adiciona uma página e devolve os chunks que já estão completos.
+        
+        Returns:
+            List[Tuple[str, int, int]]: (texto do chunk, página inicial, página final)
+        """
+        if not self._buffer:
+            # Como no texto inteiro (strip), o documento começa no primeiro caractere visível
+            text = text.lstrip()
+            if not text:
+                return []
+        self._pages.append((len(self._buffer), page_number))
+        self._buffer += text + "\n"
+        return self._split(final=False) if len(self._buffer) >= self.window else []
+    
+    def flush(self) -> List[Tuple[str, int, int]]:
+        """Divide o restante da janela ao final do documento."""
+        self._buffer = self._buffer.rstrip()
+        return self._split(final=True) if self._buffer else []
+    
+    def _page_at(self, offset: int) -> int:
+        page = self._pages[0][1]
+        for start, number in self._pages:
+            if start > offset:
+                break
+            page = number
+        return page
+    
+    def _piece_start(self, offset: int) -> int:
+        """
+        Recua do início (sem espaços) de um chunk até o separador que abre o trecho.
+        
+        O splitter mantém o separador no começo de cada trecho e só remove os
+        espaços ao montar o chunk; recomeçar a janela depois do separador
+        mudaria o tamanho do primeiro trecho e, com ele, as fronteiras dos
+        chunks seguintes.
+        """
+        separators = getattr(self.text_splitter, "_separators", ["\n\n", "\n", " ", ""])
+        separator = next((sep for sep in separators if sep and sep in self._buffer), "")
+        if not separator:
+            return offset
+        start = self._buffer.rfind(separator, 0, offset)
+        if start < 0 or self._buffer[start + len(separator):offset].strip():
+            return offset
+        return start
+    
+    def _split(self, final: bool) -> List[Tuple[str, int, int]]:
+        located = []
+        cursor = 0
+        for chunk in self.text_splitter.split_text(self._buffer):
+            offset = self._buffer.find(chunk, cursor)
+            offset = cursor if offset < 0 else offset
+            located.append((chunk, offset))
+            cursor = offset + 1
+        
+        # O último chunk pode continuar na próxima página: volta para a janela
+        keep_from = len(self._buffer)
+        if not final and len(located) > 1:
+            keep_from = self._piece_start(located.pop()[1])
+        
+        chunks = [(chunk, self._page_at(offset), self._page_at(offset + len(chunk) - 1)) for chunk, offset in located]
+        
+        if keep_from < len(self._buffer):
+            self._pages = [(0, self._page_at(keep_from))] + [
+                (start - keep_from, number) for start, number in self._pages if start > keep_from
+            ]
+        else:
+            self._pages = []
+        self._buffer = self._buffer[keep_from:]
+        return chunks
+
+
+class KnowledgeIngester:
+    """Carrega os arquivos de database/ na base de conhecimento vetorial."""
+    
+    SUPPORTED_EXTENSIONS = (".pdf", ".csv", ".xlsx", ".txt")
+    MANIFEST_VERSION = 1
+    
+    # Pipeline: extração em processos, embeddings em lotes concorrentes
+    EXTRACT_WORKERS = int(os.getenv("INGEST_EXTRACT_WORKERS", str(os.cpu_count() or 2)))
+    EMBED_CONCURRENCY = int(os.getenv("INGEST_EMBED_CONCURRENCY", "4"))
+    EMBED_BATCH_SIZE = int(os.getenv("INGEST_EMBED_BATCH_SIZE", "100"))
+    EMBED_REQUESTS_PER_MINUTE = int(os.getenv("INGEST_EMBED_REQUESTS_PER_MINUTE", "500"))
+    CHECKPOINT_FILES = int(os.getenv("INGEST_CHECKPOINT_FILES", "0"))
+    # PDFs são extraídos por intervalos de páginas, distribuídos entre os processos
+    PDF_PAGES_PER_TASK = int(os.getenv("INGEST_PDF_PAGES_PER_TASK", "16"))
+    
+    def __init__(self, rag_service: Optional[RAGService] = None):
+        """
+        Inicializa o ingestor.
+        
+        Args:
+            rag_service: Serviço RAG de destino (criado se não fornecido)
+        """
+        self.rag_service = rag_service or RAGService()
+        # O backend local não tem limite de requisições
+        local = self.rag_service.db_config.EMBEDDING_BACKEND == "local"
+        self.rate_limiter = RateLimiter(0 if local else self.EMBED_REQUESTS_PER_MINUTE)
+        self.last_run_stats: Dict[str, Any] = {}
+        self._stats_lock = threading.Lock()
+    
+    def load_database_files_to_knowledge_base(self, force: bool = False) -> bool:
+        """
+        Carrega todos os arquivos das pastas database/Bombeiros, database/Policia e database/Saude
+        para a base de conhecimento vetorial.
+        
+        A ingestão é incremental: o manifesto guarda o hash do conteúdo de cada
+        arquivo e os IDs dos seus chunks. Arquivos inalterados são ignorados,
+        arquivos modificados têm seus chunks substituídos e arquivos removidos
+        têm seus chunks apagados do índice.
+        
+        Os arquivos a processar passam por um pipeline: a extração roda em um
+        pool de processos, os embeddings em lotes concorrentes sob limite de
+        requisições e os vetores são anexados ao índice em memória, que é salvo
+        uma única vez ao final (ou a cada INGEST_CHECKPOINT_FILES arquivos).
+        
+        Args:
+            force: Reprocessa todos os arquivos mesmo com hash inalterado
+        
+        Returns:
+            bool: True se carregamento foi bem-sucedido
+        """
+        try:
+            # Obtém o diretório base do projeto
+            current_dir = os.path.dirname(os.path.abspath(__file__))
+            project_root = os.path.dirname(current_dir)  # Sobe um nível para sair da pasta agentes
+            
+            # Diretórios a serem processados
+            database_dirs = {
+                "bombeiros": os.path.join(project_root, "database", "Bombeiros"),
+                "policia": os.path.join(project_root, "database", "Policia"), 
+                "saude": os.path.join(project_root, "database", "Saude")
+            }
+            
+            vector_store = self.rag_service.writable_vector_store
+            if not vector_store:
+                print("❌ Vector store não inicializado.")
+                return False
+            
+            manifest = self._load_manifest()
+            files = manifest["files"]
+            indexed_ids = set(vector_store.index_to_docstore_id.values())
+            
+            # Chunks de ingestões anteriores ao manifesto (duplicatas), agrupados por arquivo
+            tracked_ids = {doc_id for entry in files.values() for doc_id in entry["chunk_ids"]}
+            legacy_ids: Dict[str, List[str]] = {}
+            for doc_id, doc in self.rag_service.db_config.iter_documents(vector_store):
+                path = doc.metadata.get("file_path")
+                if path and doc_id not in tracked_ids:
+                    legacy_ids.setdefault(os.path.abspath(path), []).append(doc_id)
+            
+            counts = {"unchanged": 0, "added": 0, "updated": 0, "removed": 0, "failed": 0}
+            seen = set()
+            pending: List[Dict[str, Any]] = []
+            
+            for category, dir_path in database_dirs.items():
+                print(f"📁 Verificando arquivos da categoria: {category.upper()}")
+                
+                # Verifica se diretório existe
+                if not os.path.exists(dir_path):
+                    print(f"⚠️  Diretório não encontrado: {dir_path}")
+                    continue
+                
+                # Percorre todos os arquivos do diretório
+                for file_path in sorted(Path(dir_path).rglob("*")):
+                    if not file_path.is_file():
+                        continue
+                    
+                    file_extension = file_path.suffix.lower()
+                    if file_extension not in self.SUPPORTED_EXTENSIONS:
+                        print(f"⚠️  Tipo de arquivo não suportado: {file_extension}")
+                        continue
+                    
+                    key = file_path.relative_to(project_root).as_posix()
+                    seen.add(key)
+                    
+                    try:
+                        content_hash = self._file_hash(file_path)
+                    except OSError as e:
+                        print(f"❌ Erro ao ler arquivo {file_path}: {e}")
+                        counts["failed"] += 1
+                        continue
+                    
+                    entry = files.get(key)
+                    
+                    # Inalterado: mesmo hash e todos os chunks ainda presentes no índice
+                    if (not force and entry and entry["sha256"] == content_hash
+                            and all(doc_id in indexed_ids for doc_id in entry["chunk_ids"])):
+                        counts["unchanged"] += 1
+                        continue
+                    
+                    pending.append({
+                        "key": key,
+                        "path": str(file_path),
+                        "category": category,
+                        "sha256": content_hash,
+                        "old_ids": (entry["chunk_ids"] if entry else []) + legacy_ids.pop(os.path.abspath(str(file_path)), []),
+                        "is_update": entry is not None
+                    })
+            
+            stats = self._run_pipeline(pending, manifest, vector_store, counts)
+            
+            # Arquivos que saíram de database/: remove seus chunks do índice
+            stale_ids = [doc_id for ids in legacy_ids.values() for doc_id in ids]
+            for key in [key for key in files if key not in seen]:
+                stale_ids.extend(files.pop(key)["chunk_ids"])
+                counts["removed"] += 1
+                print(f"🗑️  Arquivo removido da base: {key}")
+            
+            if stale_ids and not self.rag_service.delete_documents(stale_ids, save=False):
+                return False
+            
+            # Converte para o tipo de índice configurado (IVF/HNSW/PQ...) sem re-embutir
+            db_config = self.rag_service.db_config
+            if not db_config.layout_matches_config(vector_store):
+                if not db_config.rebuild_index(vector_store, save=False):
+                    return False
+                stats["dirty"] = True
+            
+            if stats["dirty"] or stale_ids:
+                if not self._checkpoint(vector_store, manifest, stats):
+                    return False
+            
+            self.last_run_stats = {**counts, **{k: v for k, v in stats.items() if k != "dirty"}}
+            
+            print(f"\n📊 RESUMO DO CARREGAMENTO:")
+            print(f"   - Arquivos novos: {counts['added']}")
+            print(f"   - Arquivos atualizados: {counts['updated']}")
+            print(f"   - Arquivos inalterados: {counts['unchanged']}")
+            print(f"   - Arquivos removidos: {counts['removed']}")
+            print(f"   - Falhas: {counts['failed']}")
+            print(f"   - Chunks adicionados: {stats['chunks']}")
+            self._print_throughput(stats)
+            print(f"   - Status: {'✅ Sucesso' if not counts['failed'] and seen else '❌ Nenhum arquivo processado' if not seen else '⚠️  Concluído com falhas'}")
+            
+            return bool(seen) and not counts["failed"]
+            
+        except Exception as e:
+            print(f"❌ Erro geral no carregamento da base: {e}")
+            return False
+    
+    def _run_pipeline(self, pending: List[Dict[str, Any]], manifest: Dict[str, Any], vector_store, counts: Dict[str, int]) -> Dict[str, Any]:
+        """
+        Extrai, embute e anexa ao índice os arquivos pendentes.
+        
+        A extração de um arquivo se sobrepõe ao embedding dos anteriores. Cada
+        lote de embeddings é anexado ao índice, no thread principal, assim que
+        termina, e seus chunks e vetores são liberados em seguida; os chunks
+        antigos do arquivo só são removidos quando todos os lotes entram. PDFs
+        são extraídos por intervalos de páginas (PDF_PAGES_PER_TASK) e
+        divididos em chunks conforme as páginas chegam, sem montar o texto
+        inteiro. Extrações e lotes pendentes ficam limitados a uma janela, então
+        a memória não cresce com o tamanho do documento.
+        
+        Args:
+            pending: Arquivos a processar (montados pela varredura do manifesto)
+            manifest: Manifesto em memória, atualizado a cada arquivo concluído
+            vector_store: Índice de destino
+            counts: Contadores do resumo, atualizados in-place
+            
+        Returns:
+            Dict: Tempos e volumes por etapa
+        """
+        stats = {
+            "files": 0, "chunks": 0, "dirty": False, "checkpoints": 0,
+            "extract_seconds": 0.0, "embed_seconds": 0.0, "append_seconds": 0.0,
+            "save_seconds": 0.0, "wall_seconds": 0.0
+        }
+        if not pending:
+            return stats
+        
+        wall_start = time.perf_counter()
+        in_flight: List[Dict[str, Any]] = []
+        since_checkpoint = 0
+        
+        def fail(item: Dict[str, Any], message: str) -> None:
+            """Descarta o arquivo e desfaz os lotes dele já anexados ao índice."""
+            print(message)
+            counts["failed"] += 1
+            item["failed"] = True
+            for _, future in item["batches"]:
+                future.cancel()
+            item["batches"].clear()
+            item["unsent"] = []
+            item.pop("ranges", None)
+            if item["chunk_ids"]:
+                self.rag_service.delete_documents(item["chunk_ids"], save=False)
+                item["chunk_ids"] = []
+                stats["dirty"] = True
+        
+        def commit_batch(item: Dict[str, Any]) -> None:
+            """Anexa ao índice o lote mais antigo do arquivo (aguarda o embedding)."""
+            chunks, future = item["batches"].popleft()
+            name = os.path.basename(item["path"])
+            try:
+                vectors = future.result()
+            except Exception as e:
+                fail(item, f"❌ Erro ao gerar embeddings de {name}: {e}")
+                return
+            
+            start = time.perf_counter()
+            chunk_ids = self.rag_service.add_embedded_chunks(chunks, vectors)
+            stats["append_seconds"] += time.perf_counter() - start
+            if chunk_ids is None:
+                fail(item, f"❌ Falha ao processar arquivo: {name}")
+                return
+            item["chunk_ids"].extend(chunk_ids)
+            stats["dirty"] = True
+        
+        def finish_file(item: Dict[str, Any]) -> None:
+            """Troca os chunks antigos pelos novos e registra o arquivo no manifesto."""
+            nonlocal since_checkpoint
+            name = os.path.basename(item["path"])
+            if not item["chunk_ids"]:
+                print(f"⚠️  Conteúdo vazio ou erro na extração: {name}")
+                counts["failed"] += 1
+                return
+            if item["old_ids"] and not self.rag_service.delete_documents(item["old_ids"], save=False):
+                fail(item, f"❌ Falha ao processar arquivo: {name}")
+                return
+            
+            manifest["files"][item["key"]] = {
+                "sha256": item["sha256"],
+                "category": item["category"],
+                "chunk_ids": item["chunk_ids"],
+                "ingested_at": time.time()
+            }
+            counts["updated" if item["is_update"] else "added"] += 1
+            stats["files"] += 1
+            stats["chunks"] += len(item["chunk_ids"])
+            since_checkpoint += 1
+            print(f"✅ {name}: {len(item['chunk_ids'])} chunks")
+            
+            if self.CHECKPOINT_FILES and since_checkpoint >= self.CHECKPOINT_FILES:
+                self._checkpoint(vector_store, manifest, stats)
+                since_checkpoint = 0
+        
+        def finish_ready(block: bool) -> None:
+            for item in list(in_flight):
+                while not item["failed"] and item["batches"] and (block or item["batches"][0][1].done()):
+                    commit_batch(item)
+                if item["failed"] or (item["extracted"] and not item["batches"]):
+                    in_flight.remove(item)
+                    if not item["failed"]:
+                        finish_file(item)
+        
+        def throttle() -> None:
+            """Segura a extração enquanto há lotes demais aguardando embedding."""
+            while True:
+                waiting = [item for item in in_flight if item["batches"]]
+                if sum(len(item["batches"]) for item in waiting) <= max_batches:
+                    return
+                commit_batch(waiting[0])
+                finish_ready(block=False)
+        
+        extract_workers = max(1, min(self.EXTRACT_WORKERS, len(pending)))
+        # Tarefas de extração em andamento + intervalos de páginas aguardando os anteriores
+        window = extract_workers * 2
+        max_batches = max(1, self.EMBED_CONCURRENCY) * 2
+        
+        tasks = []
+        for item in pending:
+            item.update({
+                "metadata": self._file_metadata(item), "chunk_ids": [], "chunk_count": 0,
+                "unsent": [], "batches": deque(), "extracted": False, "failed": False
+            })
+            if Path(item["path"]).suffix.lower() == ".pdf":
+                try:
+                    total_pages = count_pdf_pages(item["path"])
+                except Exception as e:
+                    print(f"❌ Erro ao abrir PDF {os.path.basename(item['path'])}: {e}")
+                    counts["failed"] += 1
+                    continue
+                item.update({
+                    "chunker": PageChunker(self.rag_service.text_splitter),
+                    "ranges": {}, "next_page": 0, "total_pages": total_pages
+                })
+                if not total_pages:
+                    item["extracted"] = True
+                    in_flight.append(item)
+                for first in range(0, total_pages, self.PDF_PAGES_PER_TASK):
+                    last = min(first + self.PDF_PAGES_PER_TASK, total_pages)
+                    tasks.append((item, (_extract_pages_worker, item["path"], first, last)))
+            else:
+                tasks.append((item, (_extract_worker, item["path"])))
+        tasks.reverse()
+        
+        with ProcessPoolExecutor(max_workers=extract_workers) as extract_pool, \
+                ThreadPoolExecutor(max_workers=max(1, self.EMBED_CONCURRENCY)) as embed_pool:
+            extractions = {}
+            
+            def submit_more() -> None:
+                buffered = sum(len(item.get("ranges", ())) for item in in_flight)
+                while tasks and len(extractions) + buffered < window:
+                    item, task = tasks.pop()
+                    if item["failed"]:
+                        continue
+                    if item not in in_flight:
+                        in_flight.append(item)
+                    extractions[extract_pool.submit(*task)] = item
+            
+            submit_more()
+            while extractions:
+                done, _ = wait(extractions, return_when=FIRST_COMPLETED)
+                for future in done:
+                    item = extractions.pop(future)
+                    if item["failed"]:
+                        continue
+                    
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        fail(item, f"❌ Erro na extração de {os.path.basename(item['path'])}: {e}")
+                        continue
+                    
+                    stats["extract_seconds"] += result[-1]
+                    if "chunker" in item:
+                        _, first, pages, _ = result
+                        item["ranges"][first] = pages
+                        # Alimenta o chunker na ordem das páginas, mesmo que os intervalos terminem fora de ordem
+                        while item["next_page"] in item["ranges"]:
+                            first = item["next_page"]
+                            for page_number, text in item["ranges"].pop(first):
+                                self._queue_chunks(item, item["chunker"].feed(page_number, text), embed_pool, stats)
+                            item["next_page"] = min(first + self.PDF_PAGES_PER_TASK, item["total_pages"])
+                        if item["next_page"] >= item["total_pages"]:
+                            self._queue_chunks(item, item.pop("chunker").flush(), embed_pool, stats, final=True)
+                            item["extracted"] = True
+                    else:
+                        _, content, _ = result
+                        if content:
+                            self._queue_documents(item, self.rag_service.split_documents([content], [item["metadata"]]),
+                                                  embed_pool, stats, final=True)
+                        item["extracted"] = True
+                
+                finish_ready(block=False)
+                throttle()
+                submit_more()
+            
+            finish_ready(block=True)
+        
+        stats["wall_seconds"] = time.perf_counter() - wall_start
+        return stats
+    
+    @staticmethod
+    def _file_metadata(item: Dict[str, Any]) -> Dict[str, Any]:
+        """Metadados comuns a todos os chunks de um arquivo."""
+        path = item["path"]
+        return {
+            "category": item["category"],
+            "filename": os.path.basename(path),
+            "file_path": path,
+            "file_type": Path(path).suffix.lower(),
+            "source": f"{item['category']}_{os.path.basename(path)}",
+            "content_hash": item["sha256"]
+        }
+    
+    def _queue_chunks(self, item: Dict[str, Any], chunks: List[Tuple[str, int, int]], embed_pool, stats: Dict[str, Any],
+                      final: bool = False) -> None:
+        """
+        Transforma chunks de páginas em documentos e os envia para embedding.
+        
+        Args:
+            item: Arquivo PDF em processamento
+            chunks: (texto, página inicial, página final) devolvidos pelo PageChunker
+            embed_pool: Pool de threads de embeddings
+            stats: Estatísticas do pipeline
+            final: Envia também o último lote incompleto
+        """
+        documents = []
+        for text, page, page_end in chunks:
+            chunk_id = item["chunk_count"] + len(documents)
+            documents.append(Document(page_content=text, metadata={
+                **item["metadata"],
+                "chunk_id": chunk_id,
+                "chunk_index": f"0_{chunk_id}",
+                "page": page,
+                "page_end": page_end
+            }))
+        self._queue_documents(item, documents, embed_pool, stats, final)
+    
+    def _queue_documents(self, item: Dict[str, Any], documents: List[Document], embed_pool, stats: Dict[str, Any],
+                         final: bool = False) -> None:
+        """
+        Agrupa chunks em lotes e envia os lotes completos para embedding.
+        
+        Cada lote enviado guarda só os próprios chunks; o arquivo não mantém a
+        lista de todos os chunks gerados.
+        
+        Args:
+            item: Arquivo em processamento
+            documents: Chunks novos, na ordem do documento
+            embed_pool: Pool de threads de embeddings
+            stats: Estatísticas do pipeline
+            final: Envia também o último lote incompleto
+        """
+        item["chunk_count"] += len(documents)
+        item["unsent"].extend(documents)
+        while len(item["unsent"]) >= self.EMBED_BATCH_SIZE or (final and item["unsent"]):
+            batch = item["unsent"][:self.EMBED_BATCH_SIZE]
+            del item["unsent"][:self.EMBED_BATCH_SIZE]
+            texts = [chunk.page_content for chunk in batch]
+            item["batches"].append((batch, embed_pool.submit(self._embed_batch, texts, stats)))
+    
+    def _embed_batch(self, texts: List[str], stats: Dict[str, Any]) -> List[List[float]]:
+        """Embute um lote de chunks respeitando o limite de requisições."""
+        self.rate_limiter.acquire()
+        start = time.perf_counter()
+        vectors = self.rag_service.embeddings.embed_documents(texts)
+        with self._stats_lock:
+            stats["embed_seconds"] += time.perf_counter() - start
+        return vectors
+    
+    def _checkpoint(self, vector_store, manifest: Dict[str, Any], stats: Dict[str, Any]) -> bool:
+        """Salva índice e manifesto juntos (o manifesto só após o índice)."""
+        start = time.perf_counter()
+        if not self.rag_service.db_config.save_vector_store(vector_store):
+            return False
+        self._save_manifest(manifest)
+        stats["save_seconds"] += time.perf_counter() - start
+        stats["checkpoints"] += 1
+        return True
+    
+    @staticmethod
+    def _print_throughput(stats: Dict[str, Any]) -> None:
+        """Imprime a vazão de cada etapa do pipeline."""
+        if not stats["files"]:
+            return
+        
+        def rate(amount, seconds, unit):
+            return f"{amount / seconds:.1f} {unit}/s" if seconds > 0 else "n/a"
+        
+        print(f"   - Extração: {stats['extract_seconds']:.2f}s de CPU ({rate(stats['files'], stats['extract_seconds'], 'arquivos')} por processo)")
+        print(f"   - Embeddings: {stats['embed_seconds']:.2f}s somados entre lotes ({rate(stats['chunks'], stats['embed_seconds'], 'chunks')} por lote)")
+        print(f"   - Inserção no índice: {stats['append_seconds']:.2f}s ({rate(stats['chunks'], stats['append_seconds'], 'chunks')})")
+        print(f"   - Gravação: {stats['save_seconds']:.2f}s em {stats['checkpoints']} salvamento(s)")
+        print(f"   - Total do pipeline: {stats['wall_seconds']:.2f}s ({rate(stats['chunks'], stats['wall_seconds'], 'chunks')})")
+    
+    @property
+    def manifest_path(self) -> str:
+        """Arquivo do manifesto, ao lado do índice FAISS da coleção."""
+        db_config = self.rag_service.db_config
+        return os.path.join(db_config.FAISS_INDEX_PATH, f"{db_config.COLLECTION_NAME}.manifest.json")
+    
+    def _load_manifest(self) -> Dict[str, Any]:
+        """Carrega o manifesto de ingestão (vazio se ainda não existir)."""
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest.get("version") == self.MANIFEST_VERSION:
+                return manifest
+            print("⚠️  Versão do manifesto incompatível, reprocessando todos os arquivos")
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Manifesto ilegível, reprocessando todos os arquivos: {e}")
+        return {"version": self.MANIFEST_VERSION, "files": {}}
+    
+    def _save_manifest(self, manifest: Dict[str, Any]) -> None:
+        """Grava o manifesto de forma atômica (arquivo temporário + rename)."""
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+    
+    def forget_chunks(self, chunk_ids: Iterable[str]) -> int:
+        """
+        Tira do manifesto chunks removidos fora da ingestão (ex.: compactação).
+        
+        Sem isso, o arquivo de origem deixaria de ser considerado inalterado
+        (nem todos os seus chunks estariam no índice) e seria reprocessado,
+        trazendo de volta as duplicatas removidas.
+        
+        Args:
+            chunk_ids: IDs removidos do índice
+            
+        Returns:
+            int: Quantidade de IDs retirados do manifesto
+        """
+        removed = set(chunk_ids)
+        manifest = self._load_manifest()
+        forgotten = 0
+        for entry in manifest["files"].values():
+            kept = [doc_id for doc_id in entry["chunk_ids"] if doc_id not in removed]
+            forgotten += len(entry["chunk_ids"]) - len(kept)
+            entry["chunk_ids"] = kept
+        if forgotten:
+            self._save_manifest(manifest)
+        return forgotten
+    
+    @staticmethod
+    def _file_hash(file_path: Path) -> str:
+        """SHA-256 do conteúdo bruto do arquivo (calculado antes da extração)."""
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        return digest.hexdigest()
+    
+    @classmethod
+    def _extract_content(cls, file_path: Path) -> str:
+        """
+        Extrai o conteúdo de um arquivo conforme a extensão.
+        
+        Args:
+            file_path: Caminho do arquivo
+            
+        Returns:
+            str: Conteúdo extraído (vazio se a extensão não for suportada)
+        """
+        extractor = {
+            ".pdf": cls._extract_pdf_content,
+            ".csv": cls._extract_csv_content,
+            ".xlsx": cls._extract_xlsx_content,
+            ".txt": cls._extract_txt_content
+        }.get(file_path.suffix.lower())
+        return extractor(str(file_path)) if extractor else ""
+    
+    @staticmethod
+    def _extract_pdf_content(pdf_path: str) -> str:
+        """
+        Extrai conteúdo de texto de um arquivo PDF.
+        
+        Args:
+            pdf_path: Caminho para o arquivo PDF
+            
+        Returns:
+            str: Conteúdo extraído do PDF
+        """
+        try:
+            return "\n".join(text for _, text in iter_pdf_pages(pdf_path)).strip()
+            
+        except Exception as e:
+            print(f"❌ Erro ao extrair PDF {pdf_path}: {e}")
+            return ""
+    
+    @staticmethod
+    def _extract_csv_content(csv_path: str) -> str:
+        """
+        Extrai conteúdo de um arquivo CSV e converte para texto estruturado.
+        
+        Args:
+            csv_path: Caminho para o arquivo CSV
+            
+        Returns:
+            str: Conteúdo estruturado do CSV
+        """
+        try:
+            # Tenta múltiplas codificações para CSVs brasileiros
+            encodings = ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1', 'windows-1252']
+            
+            df = None
+            used_encoding = None
+            
+            for encoding in encodings:
+                try:
+                    df = pd.read_csv(csv_path, encoding=encoding)
+                    used_encoding = encoding
+                    break
+                except UnicodeDecodeError:
+                    continue
+                except Exception as e:
+                    if "codec" not in str(e).lower():
+                        print(f"❌ Erro não relacionado à codificação no CSV {csv_path}: {e}")
+                        continue
+            
+            if df is None:
+                print(f"⚠️  Não foi possível decodificar o CSV {csv_path} com nenhuma codificação")
+                return ""
+            
+            # Converte para texto estruturado
+            content = f"DADOS DO ARQUIVO: {os.path.basename(csv_path)}\n"
+            content += f"CODIFICAÇÃO USADA: {used_encoding}\n\n"
+            
+            # Adiciona informações sobre colunas
+            content += f"COLUNAS: {', '.join(df.columns.tolist())}\n\n"
+            
+            # Adiciona algumas estatísticas básicas
+            content += f"TOTAL DE REGISTROS: {len(df)}\n\n"
+            
+            # Adiciona dados (limitando para não ficar muito grande)
+            content += "DADOS:\n"
+            for index, row in df.head(100).iterrows():  # Limita a 100 linhas
+                row_text = " | ".join([f"{col}: {val}" for col, val in row.items() if pd.notna(val)])
+                content += f"{row_text}\n"
+            
+            if len(df) > 100:
+                content += f"\n... (exibindo apenas primeiras 100 linhas de {len(df)} registros)"
+            
+            return content
+            
+        except Exception as e:
+            print(f"❌ Erro ao extrair CSV {csv_path}: {e}")
+            return ""
+    
+    @staticmethod
+    def _extract_xlsx_content(xlsx_path: str) -> str:
+        """
+        Extrai conteúdo de um arquivo XLSX e converte para texto estruturado.
+        
+        Args:
+            xlsx_path: Caminho para o arquivo XLSX
+            
+        Returns:
+            str: Conteúdo estruturado do XLSX
+        """
+        try:
+            # Lê o arquivo Excel
+            excel_file = pd.ExcelFile(xlsx_path)
+            content = f"DADOS DO ARQUIVO EXCEL: {os.path.basename(xlsx_path)}\n\n"
+            
+            # Processa cada planilha
+            for sheet_name in excel_file.sheet_names:
+                content += f"PLANILHA: {sheet_name}\n"
+                content += "=" * 50 + "\n"
+                
+                # Lê os dados da planilha
+                df = pd.read_excel(xlsx_path, sheet_name=sheet_name)
+                
+                # Adiciona informações sobre colunas
+                content += f"COLUNAS: {', '.join(df.columns.tolist())}\n\n"
+                
+                # Adiciona estatísticas básicas
+                content += f"TOTAL DE REGISTROS: {len(df)}\n\n"
+                
+                # Adiciona dados (limitando para não ficar muito grande)
+                content += "DADOS:\n"
+                for index, row in df.head(50).iterrows():  # Limita a 50 linhas por planilha
+                    row_text = " | ".join([f"{col}: {val}" for col, val in row.items()])
+                    content += f"{row_text}\n"
+                
+                if len(df) > 50:
+                    content += f"\n... (exibindo apenas primeiras 50 linhas de {len(df)} registros)\n"
+                
+                content += "\n" + "=" * 50 + "\n\n"
+            
+            return content
+            
+        except Exception as e:
+            print(f"❌ Erro ao extrair XLSX {xlsx_path}: {e}")
+            return ""
+    
+    @staticmethod
+    def _extract_txt_content(txt_path: str) -> str:
+        """
+        Extrai conteúdo de um arquivo TXT.
+        
+        Args:
+            txt_path: Caminho para o arquivo TXT
+            
+        Returns:
+            str: Conteúdo do arquivo TXT
+        """
+        try:
+            # Tenta diferentes codificações
+            encodings = ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1']
+            
+            for encoding in encodings:
+                try:
+                    with open(txt_path, 'r', encoding=encoding) as file:
+                        content = file.read()
+                        
+                    # Adiciona cabeçalho com informações do arquivo
+                    header = f"ARQUIVO DE TEXTO: {os.path.basename(txt_path)}\n"
+                    header += f"CODIFICAÇÃO: {encoding}\n"
+                    header += "=" * 50 + "\n\n"
+                    
+                    return header + content.strip()
+                    
+                except UnicodeDecodeError:
+                    continue
+            
+            # Se nenhuma codificação funcionou
+            print(f"⚠️  Não foi possível decodificar o arquivo {txt_path}")
+            return ""
+            
+        except Exception as e:
+            print(f"❌ Erro ao extrair TXT {txt_path}: {e}")
+            return ""
+
+
+if __name__ == "__main__":
+    import sys
+    
+    ingester = KnowledgeIngester()
+    ingester.load_database_files_to_knowledge_base(force="--force" in sys.argv)
@@ -0,0 +1,218 @@
+"""
+Escrita em segundo plano da base de conhecimento do sistema de emergência 911.
+
+add_knowledge alterava o mesmo handle FAISS em que as classificações buscavam e
+regravava o índice inteiro dentro da requisição. O KnowledgeWriter recebe as
+inclusões em uma fila e uma única thread as aplica em lotes: divide em chunks,
+gera os embeddings em uma chamada, aplica na cópia gravável (copy-on-write) e
+publica um snapshot. As buscas seguem no handle publicado até a troca.
+"""
+
+import atexit
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, wait
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+
+@dataclass
+class WriteRequest:
+    """Inclusão pendente na fila de escrita."""
+    documents: List[str]
+    metadatas: Optional[List[Dict]]
+    future: Future = field(default_factory=Future)
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class KnowledgeWriter:
+    """Fila de inclusões aplicada em lotes por uma thread (uma por coleção no processo)."""
+
+    # Documentos por lote e espera para juntar inclusões antes de gravar um snapshot
+    KNOWLEDGE_WRITE_BATCH_SIZE = int(os.getenv("KNOWLEDGE_WRITE_BATCH_SIZE", "32"))
+    KNOWLEDGE_WRITE_DELAY_MS = float(os.getenv("KNOWLEDGE_WRITE_DELAY_MS", "200"))
+
+    def __init__(self, rag_service):
+        """
+        Inicializa o escritor.
+
+        Args:
+            rag_service: RAGService usado para dividir, embutir e gravar
+        """
+        self.rag_service = rag_service
+        self.batch_size = max(1, self.KNOWLEDGE_WRITE_BATCH_SIZE)
+        self.delay = max(0.0, self.KNOWLEDGE_WRITE_DELAY_MS) / 1000
+
+        self._queue: Deque[WriteRequest] = deque()
+        self._condition = threading.Condition()
+        self._outstanding: set = set()
+
+        self._stats = {"requests": 0, "published": 0, "documents": 0, "chunks": 0, "batches": 0, "errors": 0,
+                       "write_seconds": 0.0, "visible_seconds": 0.0, "max_visible_seconds": 0.0}
+        self._stats_lock = threading.Lock()
+
+        self._thread = threading.Thread(target=self._write_loop, name="knowledge-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, documents: List[str], metadatas: Optional[List[Dict]] = None) -> Future:
+        """
+        Enfileira uma inclusão e retorna sem esperar a gravação.
+
+        Args:
+            documents: Textos a adicionar
+            metadatas: Metadados de cada texto
+
+        Returns:
+            Future: Resolve com os IDs dos chunks depois que o snapshot é publicado
+        """
+        request = WriteRequest(list(documents), [dict(m) for m in metadatas] if metadatas else None)
+        with self._condition:
+            self._queue.append(request)
+            self._outstanding.add(request.future)
+            self._condition.notify()
+        request.future.add_done_callback(self._done)
+        with self._stats_lock:
+            self._stats["requests"] += 1
+        return request.future
+
+    def _done(self, future: Future) -> None:
+        with self._condition:
+            self._outstanding.discard(future)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Aguarda as inclusões já enfileiradas serem publicadas.
+
+        Args:
+            timeout: Espera máxima em segundos (None = sem limite)
+
+        Returns:
+            bool: True se a fila esvaziou dentro do prazo
+        """
+        with self._condition:
+            pending = list(self._outstanding)
+        _, not_done = wait(pending, timeout=timeout)
+        return not not_done
+
+    def _write_loop(self) -> None:
+        while True:
+            with self._condition:
+                while not self._queue:
+                    self._condition.wait()
+
+                # Espera mais inclusões até o lote encher ou a mais antiga atingir o atraso máximo
+                deadline = self._queue[0].enqueued_at + self.delay
+                while sum(len(request.documents) for request in self._queue) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+
+                batch = [self._queue.popleft()]
+                size = len(batch[0].documents)
+                while self._queue and size + len(self._queue[0].documents) <= self.batch_size:
+                    size += len(self._queue[0].documents)
+                    batch.append(self._queue.popleft())
+
+            self._apply(batch)
+
+    def _apply(self, batch: List[WriteRequest]) -> None:
+        """Embute e grava um lote; cada requisição recebe seus IDs (ou o erro)."""
+        rag = self.rag_service
+        db_config = rag.db_config
+        start = time.perf_counter()
+        try:
+            # Divisão e embeddings fora do write_lock: outras escritas não esperam pela API
+            splits: List[Tuple[WriteRequest, list]] = [
+                (request, rag.split_documents(request.documents, request.metadatas)) for request in batch
+            ]
+            chunks = [chunk for _, request_chunks in splits for chunk in request_chunks]
+            vectors = rag.embeddings.embed_documents([chunk.page_content for chunk in chunks]) if chunks else []
+
+            ids = rag.add_embedded_chunks(chunks, vectors, save=True)
+            if ids is None:
+                raise RuntimeError("Falha ao gravar o lote na base de conhecimento")
+        except Exception as e:
+            print(f"❌ Erro ao gravar lote de conhecimento: {e}")
+            with self._stats_lock:
+                self._stats["errors"] += 1
+            for request in batch:
+                request.future.set_exception(e)
+            return
+
+        now = time.monotonic()
+        with self._stats_lock:
+            self._stats["batches"] += 1
+            self._stats["published"] += len(batch)
+            self._stats["documents"] += sum(len(request.documents) for request in batch)
+            self._stats["chunks"] += len(chunks)
+            self._stats["write_seconds"] += time.perf_counter() - start
+            for request in batch:
+                visible = now - request.enqueued_at
+                self._stats["visible_seconds"] += visible
+                self._stats["max_visible_seconds"] = max(self._stats["max_visible_seconds"], visible)
+
+        offset = 0
+        for request, request_chunks in splits:
+            request.future.set_result(ids[offset:offset + len(request_chunks)])
+            offset += len(request_chunks)
+        print(f"📝 Lote de conhecimento publicado: {len(batch)} inclusões, {len(chunks)} chunks")
+
+    def stats(self) -> Dict[str, Any]:
+        """Tamanho dos lotes, tempo de gravação e atraso até a inclusão ficar visível nas buscas."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        batches = stats["batches"]
+        published = stats["published"]
+        return {
+            "pending": len(self._outstanding),
+            "requests": stats["requests"],
+            "batches": batches,
+            "errors": stats["errors"],
+            "documents": stats["documents"],
+            "chunks": stats["chunks"],
+            "mean_batch_documents": round(stats["documents"] / batches, 2) if batches else 0.0,
+            "mean_write_ms": round(stats["write_seconds"] * 1000 / batches, 1) if batches else 0.0,
+            "mean_visible_ms": round(stats["visible_seconds"] * 1000 / published, 1) if published else 0.0,
+            "max_visible_ms": round(stats["max_visible_seconds"] * 1000, 1)
+        }
+
+
+# Um escritor por coleção no processo (recriados após fork: threads não sobrevivem)
+_writers: Dict[Tuple[str, str], KnowledgeWriter] = {}
+_writers_pid: Optional[int] = None
+_writers_lock = threading.Lock()
+
+
+def get_knowledge_writer(rag_service) -> KnowledgeWriter:
+    """
+    Escritor da coleção do RAGService, criado no primeiro uso.
+
+    Args:
+        rag_service: RAGService da coleção
+
+    Returns:
+        KnowledgeWriter: Escritor compartilhado no processo
+    """
+    global _writers_pid
+    key = rag_service.db_config.registry_key
+    with _writers_lock:
+        if _writers_pid != os.getpid():
+            _writers.clear()
+            _writers_pid = os.getpid()
+        writer = _writers.get(key)
+        if writer is None:
+            writer = KnowledgeWriter(rag_service)
+            _writers[key] = writer
+            # Inclusões aceitas são gravadas antes do processo encerrar
+            atexit.register(writer.flush, 30)
+        return writer
+
+
+def get_existing_writer(rag_service) -> Optional[KnowledgeWriter]:
+    """Escritor da coleção, se já foi criado neste processo (para estatísticas)."""
+    if _writers_pid != os.getpid():
+        return None
+    return _writers.get(rag_service.db_config.registry_key)
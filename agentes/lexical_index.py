@@ -0,0 +1,163 @@
+"""
+Índice lexical (BM25) para o sistema de emergência 911.
+
+Termos exatos dos protocolos ("parada cardiorrespiratória", "cárcere privado")
+são melhor encontrados por correspondência de palavras do que por similaridade
+vetorial, e a busca lexical não precisa de embeddings (nem de rede). O índice é
+invertido, em memória, sobre os mesmos chunks do FAISS, com remoção de acentos
+e um stemmer leve para o português.
+"""
+
+import math
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Container, Dict, Iterable, List, Optional, Tuple
+
+# Palavras muito frequentes que não ajudam a distinguir chunks
+STOPWORDS = frozenset("""
+a ao aos as ate com como da das de dela dele deles do dos e ela ele eles em entre era essa esse esta este
+eu foi ha isso isto ja la lhe mais mas me mesmo meu minha muito na nao nas nem no nos o os ou para pela
+pelas pelo pelos por qual quando que quem se sem ser seu sua tambem te tem ter um uma umas uns voce
+""".split())
+
+# Sufixos removidos pelo stemmer, do mais longo para o mais curto (texto já sem acentos)
+_PLURAL_RULES = (("oes", "ao"), ("aes", "ao"), ("ais", "al"), ("eis", "el"), ("ois", "ol"), ("ns", "m"), ("res", "r"))
+_SUFFIXES = (
+    "amentos", "imentos", "amento", "imento", "acoes", "icoes", "mente", "idades", "idade",
+    "adores", "adora", "ador", "istas", "ista", "ismos", "ismo", "aveis", "iveis", "avel", "ivel",
+    "acao", "icao", "ancia", "encia", "ando", "endo", "indo", "ados", "idos", "adas", "idas",
+    "ado", "ido", "ada", "ida", "oso", "osa", "ico", "ica", "ar", "er", "ir", "ou", "eu", "iu"
+)
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def fold_accents(text: str) -> str:
+    """Remove acentos e cedilha ("cardiorrespiratória" -> "cardiorrespiratoria")."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def stem(token: str) -> str:
+    """
+    Stemmer leve para o português (plural, derivação e terminações verbais comuns).
+
+    Mantém pelo menos 3 caracteres de radical, para não juntar palavras curtas
+    sem relação. Não é o RSLP completo, mas aproxima "incêndios"/"incêndio" e
+    "sangramento"/"sangrando".
+    """
+    if len(token) <= 3:
+        return token
+
+    for suffix, replacement in _PLURAL_RULES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            token = token[:-len(suffix)] + replacement
+            break
+    else:
+        if token.endswith("s") and len(token) > 4:
+            token = token[:-1]
+
+    for suffix in _SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            token = token[:-len(suffix)]
+            break
+
+    # Vogal temática final (incendio/incendia -> incendi)
+    if len(token) > 4 and token[-1] in "aeo":
+        token = token[:-1]
+    return token
+
+
+def analyze(text: str) -> List[str]:
+    """Tokeniza, remove acentos e stopwords e aplica o stemmer."""
+    tokens = _TOKEN.findall(fold_accents(text.lower()))
+    return [stem(token) for token in tokens if token not in STOPWORDS and not token.isdigit()]
+
+
+class BM25Index:
+    """Índice invertido com ranqueamento BM25 (Okapi)."""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_ids: List[str] = []
+        self.doc_lengths: List[int] = []
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self.average_length = 0.0
+
+    @classmethod
+    def build(cls, documents: Iterable[Tuple[str, str]], **kwargs) -> "BM25Index":
+        """
+        Constrói o índice a partir de pares (id, texto).
+
+        Args:
+            documents: Iterável de (id do chunk, texto do chunk)
+
+        Returns:
+            BM25Index: Índice pronto para busca
+        """
+        index = cls(**kwargs)
+        for doc_id, text in documents:
+            terms = Counter(analyze(text))
+            position = len(index.doc_ids)
+            index.doc_ids.append(doc_id)
+            index.doc_lengths.append(sum(terms.values()))
+            for term, frequency in terms.items():
+                index.postings[term].append((position, frequency))
+
+        index.postings = dict(index.postings)
+        index.average_length = (sum(index.doc_lengths) / len(index.doc_lengths)) if index.doc_lengths else 0.0
+        return index
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def search(self, query: str, k: int = 10, allowed_ids: Optional[Container[str]] = None) -> List[Tuple[str, float]]:
+        """
+        Busca os k chunks com maior pontuação BM25.
+
+        Args:
+            query: Texto da consulta
+            k: Número de resultados
+            allowed_ids: Considera apenas estes chunks (ex.: partições por categoria)
+
+        Returns:
+            List[Tuple[str, float]]: (id do chunk, pontuação), em ordem decrescente
+        """
+        if not self.doc_ids:
+            return []
+
+        total = len(self.doc_ids)
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(analyze(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for position, frequency in postings:
+                length_norm = 1 - self.b + self.b * self.doc_lengths[position] / self.average_length
+                scores[position] += idf * frequency * (self.k1 + 1) / (frequency + self.k1 * length_norm)
+
+        if allowed_ids is not None:
+            scores = {position: score for position, score in scores.items() if self.doc_ids[position] in allowed_ids}
+
+        best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(self.doc_ids[position], score) for position, score in best]
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """
+    Combina listas ranqueadas pela fusão de postos recíprocos (RRF).
+
+    Args:
+        rankings: Listas de IDs, cada uma em ordem de relevância
+        k: Constante de suavização (60 é o valor usual)
+
+    Returns:
+        List[Tuple[str, float]]: (id, pontuação RRF), em ordem decrescente
+    """
+    fused: Dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, 1):
+            fused[doc_id] += 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,102 @@
+"""
+Backend de embeddings local (CPU) para o sistema de emergência 911.
+
+Roda um modelo multilíngue do sentence-transformers no próprio processo: a busca
+não depende da rede nem da OpenAI, e a ingestão em lote não fica sujeita a
+limites de requisições. O modelo é carregado apenas no primeiro uso.
+"""
+
+import os
+import threading
+from typing import List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+
+class LocalEmbeddings(Embeddings):
+    """Embeddings calculados localmente com sentence-transformers."""
+
+    def __init__(
+        self,
+        model_name: str = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
+        batch_size: int = 32,
+        runtime: str = "torch",
+        onnx_file: Optional[str] = None,
+        num_threads: Optional[int] = None,
+        normalize: bool = True
+    ):
+        """
+        Inicializa o backend local.
+
+        Args:
+            model_name: Modelo do sentence-transformers (Hugging Face ou caminho local)
+            batch_size: Quantidade de textos por lote na inferência
+            runtime: "torch" ou "onnx" (ONNX Runtime, requer optimum[onnxruntime])
+            onnx_file: Arquivo ONNX dentro do modelo (ex.: onnx/model_qint8_avx512.onnx para a versão quantizada)
+            num_threads: Threads de CPU usadas pela inferência (None mantém o padrão)
+            normalize: Normaliza os vetores (norma 1), como os embeddings da OpenAI
+        """
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.runtime = runtime
+        self.onnx_file = onnx_file
+        self.num_threads = num_threads
+        self.normalize = normalize
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        """Modelo carregado sob demanda (importa sentence-transformers só aqui)."""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = self._load_model()
+        return self._model
+
+    def _load_model(self):
+        from sentence_transformers import SentenceTransformer
+
+        if self.num_threads:
+            import torch
+            torch.set_num_threads(self.num_threads)
+            # ONNX Runtime e bibliotecas BLAS leem estas variáveis ao iniciar
+            os.environ.setdefault("OMP_NUM_THREADS", str(self.num_threads))
+
+        if self.runtime == "onnx":
+            try:
+                model_kwargs = {"file_name": self.onnx_file} if self.onnx_file else None
+                model = SentenceTransformer(self.model_name, device="cpu", backend="onnx", model_kwargs=model_kwargs)
+                print(f"🧠 Modelo local {self.model_name} carregado (ONNX{', ' + self.onnx_file if self.onnx_file else ''})")
+                return model
+            except Exception as e:
+                print(f"⚠️ ONNX indisponível para {self.model_name} ({e}); usando PyTorch")
+
+        model = SentenceTransformer(self.model_name, device="cpu")
+        print(f"🧠 Modelo local {self.model_name} carregado (PyTorch)")
+        return model
+
+    @property
+    def dimension(self) -> int:
+        """Dimensão dos vetores produzidos pelo modelo."""
+        return int(self.model.get_sentence_embedding_dimension())
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        vectors = self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            normalize_embeddings=self.normalize,
+            convert_to_numpy=True,
+            show_progress_bar=False
+        )
+        return vectors.astype("float32").tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embute documentos em lotes de batch_size."""
+        if not texts:
+            return []
+        return self._encode(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embute uma consulta (sem chamadas de rede)."""
+        return self._encode([text])[0]
@@ -4,12 +4,9 @@ Fornece funções utilitárias para busca de contexto e gestão de conhecimento.
 """
 
 import os
-import pandas as pd
-import PyPDF2
+import hashlib
+import json
 from typing import List, Dict, Any, Optional, Tuple
-from pathlib import Path
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_openai import OpenAIEmbeddings
 from langchain.schema import Document
 
 # Import do FAISS para vector store
@@ -18,12 +15,35 @@ from langchain_community.vectorstores import FAISS
 # Importação robusta que funciona tanto em execução direta quanto como módulo
 try:
     from .vectordb_config import VectorDBConfig
+    from .embedding_batcher import MicroBatchingEmbeddings
+    from .embedding_cache import CachedEmbeddings
+    from .lexical_index import reciprocal_rank_fusion
+    from .context_packer import ContextPacker
+    from .saude_data import get_saude_data
+    from .knowledge_writer import get_existing_writer, get_knowledge_writer
 except ImportError:
     from vectordb_config import VectorDBConfig
+    from embedding_batcher import MicroBatchingEmbeddings
+    from embedding_cache import CachedEmbeddings
+    from lexical_index import reciprocal_rank_fusion
+    from context_packer import ContextPacker
+    from saude_data import get_saude_data
+    from knowledge_writer import get_existing_writer, get_knowledge_writer
 
 class RAGService:
     """Serviço para operações de RAG (Retrieval-Augmented Generation)."""
     
+    # Modo de busca padrão: "hybrid" (FAISS + BM25), "vector" ou "lexical" (sem embeddings)
+    RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid").lower()
+    
+    # Categorias sempre incluídas na busca filtrada (indicadores gerais de classificação)
+    SHARED_CATEGORIES = ("keywords",)
+    
+    # Contexto do prompt: candidatos buscados e orçamento de tokens (sem sobreposição, quase-duplicatas nem redundância)
+    CONTEXT_CANDIDATES = int(os.getenv("CONTEXT_CANDIDATES", "12"))
+    CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "500"))
+    CONTEXT_MMR_LAMBDA = float(os.getenv("CONTEXT_MMR_LAMBDA", "0.7"))
+    
     def __init__(self, openai_api_key: Optional[str] = None):
         """
         Inicializa o serviço RAG.
@@ -37,169 +57,427 @@ class RAGService:
         if openai_api_key:
             os.environ["OPENAI_API_KEY"] = openai_api_key
         
-        # Inicializa embeddings
-        self.embeddings = OpenAIEmbeddings(
-            model="text-embedding-3-small",
-            chunk_size=1000
-        )
-        
-        # Inicializa text splitter
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len,
-            separators=["\n\n", "\n", ". ", " ", ""]
-        )
-        
-        self.vector_store = None
+        # Inicializa embeddings (OpenAI com cache de consultas, compartilhado no processo)
+        self.embeddings = self.db_config.get_embeddings()
+        
+        # Text splitter é criado no primeiro uso (só é necessário ao adicionar documentos)
+        self._text_splitter = None
+        
         self._initialize_vector_store()
     
+    @property
+    def vector_store(self) -> Optional[FAISS]:
+        """
+        Handle atual do índice, obtido do registro de índices do processo.
+        
+        Não desserializa o índice a cada chamada: o registro devolve o handle
+        compartilhado e só recarrega quando os arquivos em disco mudam.
+        """
+        try:
+            return self.db_config.get_vector_store(self.embeddings)
+        except Exception as e:
+            print(f"❌ Erro ao obter vector store: {e}")
+            return None
+    
+    @property
+    def writable_vector_store(self) -> Optional[FAISS]:
+        """
+        Handle para alterar o índice (igual a vector_store, exceto com FAISS_MMAP,
+        em que as escritas vão para uma cópia em memória até o próximo save).
+        """
+        try:
+            return self.db_config.get_writable_vector_store(self.embeddings)
+        except Exception as e:
+            print(f"❌ Erro ao obter vector store: {e}")
+            return None
+    
+    @property
+    def text_splitter(self):
+        """Text splitter usado para dividir documentos em chunks."""
+        if self._text_splitter is None:
+            from langchain.text_splitter import RecursiveCharacterTextSplitter
+            self._text_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=1000,
+                chunk_overlap=200,
+                length_function=len,
+                separators=["\n\n", "\n", ". ", " ", ""]
+            )
+        return self._text_splitter
+    
     def _initialize_vector_store(self) -> None:
         """Inicializa o vector store."""
         try:
-            self.vector_store = self.db_config.get_vector_store(self.embeddings)
+            self.db_config.get_vector_store(self.embeddings)
             print("🔗 Vector store FAISS inicializado")
         except Exception as e:
             print(f"❌ Erro ao inicializar vector store: {e}")
             raise
     
-    def add_documents_to_knowledge_base(self, documents: List[str], metadatas: Optional[List[Dict]] = None) -> bool:
+    def add_documents_to_knowledge_base(self, documents: List[str], metadatas: Optional[List[Dict]] = None,
+                                        wait: bool = False) -> bool:
         """
         Adiciona documentos à base de conhecimento.
         
+        A inclusão entra na fila do KnowledgeWriter, que a aplica em lote e
+        publica um snapshot novo fora do caminho da requisição; as buscas
+        passam a encontrá-la quando o snapshot é publicado.
+        
+        Args:
+            documents: Lista de textos a serem adicionados
+            metadatas: Lista de metadados associados aos documentos
+            wait: Aguarda a publicação (e o resultado da gravação)
+            
+        Returns:
+            bool: True se documentos foram aceitos (ou gravados, com wait=True)
+        """
+        if not documents:
+            print("❌ Nenhum documento fornecido.")
+            return False
+        
+        future = get_knowledge_writer(self).submit(documents, metadatas)
+        if not wait:
+            print(f"📥 {len(documents)} documentos na fila de escrita")
+            return True
+        
+        try:
+            future.result()
+            return True
+        except Exception as e:
+            print(f"❌ Erro ao adicionar documentos: {e}")
+            return False
+    
+    def replace_documents(
+        self,
+        documents: List[str],
+        metadatas: Optional[List[Dict]] = None,
+        replace_ids: Optional[List[str]] = None,
+        save: bool = True
+    ) -> Optional[List[str]]:
+        """
+        Divide documentos em chunks, remove os chunks antigos indicados e adiciona os novos.
+        
         Args:
             documents: Lista de textos a serem adicionados
             metadatas: Lista de metadados associados aos documentos
+            replace_ids: IDs de chunks existentes a remover antes de adicionar
+            save: Salva o índice em disco ao final (False para salvar em lote)
             
         Returns:
-            bool: True se documentos foram adicionados com sucesso
+            Optional[List[str]]: IDs dos chunks adicionados, ou None em caso de erro
         """
         try:
-            if not documents:
-                print("❌ Nenhum documento fornecido.")
-                return False
-            
-            # Processa documentos
-            doc_objects = []
-            for i, doc_text in enumerate(documents):
-                metadata = metadatas[i] if metadatas and i < len(metadatas) else {}
-                metadata.update({"source": f"document_{i}", "doc_id": i})
+            doc_objects = self.split_documents(documents, metadatas)
+            # Embute antes de remover: uma falha na API não apaga os chunks antigos
+            vectors = self.embeddings.embed_documents([doc.page_content for doc in doc_objects]) if doc_objects else []
+            
+            ids = self.add_embedded_chunks(doc_objects, vectors, replace_ids=replace_ids, save=save)
+            if ids is not None:
+                print(f"📝 {len(doc_objects)} chunks adicionados{' e salvos' if save else ''}")
+            return ids
                 
-                # Divide documento em chunks
-                chunks = self.text_splitter.split_text(doc_text)
+        except Exception as e:
+            print(f"❌ Erro ao adicionar documentos: {e}")
+            return None
+    
+    def split_documents(self, documents: List[str], metadatas: Optional[List[Dict]] = None) -> List[Document]:
+        """
+        Divide documentos em chunks com os metadados da base de conhecimento.
+        
+        Args:
+            documents: Lista de textos
+            metadatas: Lista de metadados associados aos documentos
+            
+        Returns:
+            List[Document]: Chunks prontos para embutir
+        """
+        doc_objects = []
+        for i, doc_text in enumerate(documents):
+            metadata = metadatas[i] if metadatas and i < len(metadatas) else {}
+            metadata.update({"source": f"document_{i}", "doc_id": i})
+            
+            # Divide documento em chunks
+            chunks = self.text_splitter.split_text(doc_text)
+            
+            for j, chunk in enumerate(chunks):
+                chunk_metadata = metadata.copy()
+                chunk_metadata.update({"chunk_id": j, "chunk_index": f"{i}_{j}"})
                 
-                for j, chunk in enumerate(chunks):
-                    chunk_metadata = metadata.copy()
-                    chunk_metadata.update({"chunk_id": j, "chunk_index": f"{i}_{j}"})
-                    
-                    doc_objects.append(Document(
-                        page_content=chunk,
-                        metadata=chunk_metadata
-                    ))
-            
-            # Adiciona ao vector store
-            if self.vector_store:
-                self.vector_store.add_documents(doc_objects)
-                # Salva o índice FAISS após adicionar documentos
-                self.db_config.save_vector_store(self.vector_store)
-                print(f"📝 {len(doc_objects)} chunks adicionados e salvos")
-                return True
-            else:
-                print("❌ Vector store não inicializado.")
-                return False
+                doc_objects.append(Document(
+                    page_content=chunk,
+                    metadata=chunk_metadata
+                ))
+        return doc_objects
+    
+    def add_embedded_chunks(
+        self,
+        chunks: List[Document],
+        vectors: List[List[float]],
+        replace_ids: Optional[List[str]] = None,
+        save: bool = False
+    ) -> Optional[List[str]]:
+        """
+        Anexa ao índice chunks já embutidos (sem chamar a API de embeddings).
+        
+        Args:
+            chunks: Chunks gerados por split_documents
+            vectors: Embeddings dos chunks, na mesma ordem
+            replace_ids: IDs de chunks existentes a remover
+            save: Salva o índice em disco ao final
+            
+        Returns:
+            Optional[List[str]]: IDs dos chunks adicionados, ou None em caso de erro
+        """
+        try:
+            # Escritas vão para a cópia gravável; as buscas seguem no handle publicado
+            with self.db_config.write_lock():
+                vector_store = self.writable_vector_store
+                if not vector_store:
+                    print("❌ Vector store não inicializado.")
+                    return None
+                
+                ids = vector_store.add_embeddings(
+                    [(chunk.page_content, vector) for chunk, vector in zip(chunks, vectors)],
+                    metadatas=[chunk.metadata for chunk in chunks]
+                ) if chunks else []
                 
+                if replace_ids:
+                    self._delete_ids(vector_store, replace_ids)
+                
+                if save and not self.db_config.save_vector_store(vector_store):
+                    return None
+            return ids
+            
         except Exception as e:
-            print(f"❌ Erro ao adicionar documentos: {e}")
+            print(f"❌ Erro ao anexar chunks: {e}")
+            return None
+    
+    def delete_documents(self, ids: List[str], save: bool = True) -> bool:
+        """
+        Remove chunks da base de conhecimento pelos IDs do docstore.
+        
+        Args:
+            ids: IDs dos chunks a remover (IDs ausentes do índice são ignorados)
+            save: Salva o índice em disco ao final
+            
+        Returns:
+            bool: True se a remoção foi bem-sucedida
+        """
+        try:
+            with self.db_config.write_lock():
+                vector_store = self.writable_vector_store
+                if not vector_store:
+                    print("❌ Vector store não inicializado.")
+                    return False
+                
+                removed = self._delete_ids(vector_store, ids)
+                if removed and save:
+                    return self.db_config.save_vector_store(vector_store)
+            return True
+            
+        except Exception as e:
+            print(f"❌ Erro ao remover documentos: {e}")
             return False
     
-    def search_relevant_context(self, query: str, top_k: int = 5, score_threshold: float = 1.5) -> List[Dict[str, Any]]:
+    def _delete_ids(self, vector_store: FAISS, ids: List[str]) -> int:
+        """Remove do índice apenas os IDs que ainda existem nele."""
+        return self.db_config.remove_ids(vector_store, ids)
+    
+    def search_relevant_context(self, query: str, top_k: int = 5, score_threshold: float = 1.5,
+                                mode: Optional[str] = None, categories: Optional[List[str]] = None,
+                                **search_params) -> List[Dict[str, Any]]:
         """
         Busca contexto relevante na base de conhecimento.
         
+        Modos de busca:
+        - "vector": apenas FAISS (exige embedding da consulta)
+        - "lexical": apenas BM25, sem nenhuma chamada de embeddings
+        - "hybrid": FAISS + BM25 combinados por fusão de postos recíprocos (RRF)
+        
         Args:
             query: Consulta de busca
             top_k: Número máximo de resultados
             score_threshold: Threshold máximo de distância (valores menores = mais similar)
+            mode: Modo de busca (RETRIEVAL_MODE por padrão)
+            categories: Busca apenas nas partições destas categorias (ex.: ["saude", "policia"]),
+                mais as categorias compartilhadas (SHARED_CATEGORIES). None = índice inteiro
+            **search_params: Parâmetros de busca do índice (nprobe, ef_search)
             
         Returns:
             List[Dict]: Lista de contextos relevantes com metadados
         """
         try:
-            if not self.vector_store:
+            vector_store = self.vector_store
+            if not vector_store:
                 print("❌ Vector store não inicializado.")
                 return []
             
-            # Busca por similaridade com scores
-            results = self.vector_store.similarity_search_with_score(
-                query=query,
-                k=top_k
-            )
+            mode = (mode or self.RETRIEVAL_MODE).lower()
+            candidates = top_k * 2 if mode == "hybrid" else top_k
+            categories = self._resolve_categories(vector_store, categories)
             
-            # DEBUG: Mostra os scores retornados
-            # print(f"🔍 DEBUG - Scores brutos do Chroma para '{query}':")
-            # for i, (doc, score) in enumerate(results):
-            #     print(f"   {i+1}. Score: {score:.4f} | Conteúdo: {doc.page_content[:50]}...")
+            # Busca vetorial: distância na escala L2 ao quadrado, filtrada pelo threshold
+            vector_hits: List[Tuple[str, float]] = []
+            if mode in ("vector", "hybrid"):
+                try:
+                    vector_hits = [
+                        (doc_id, distance)
+                        for doc_id, distance in self.db_config.search_ids_with_distance(
+                            query, k=candidates, vector_store=vector_store, categories=categories, **search_params
+                        )
+                        if distance <= score_threshold
+                    ]
+                except Exception as e:
+                    if mode == "vector":
+                        raise
+                    # Sem embeddings (ex.: API fora do ar) a busca híbrida segue só com o BM25
+                    print(f"⚠️ Busca vetorial indisponível ({e}); usando apenas a busca lexical")
+            
+            # Busca lexical: só entram chunks com ao menos um termo da consulta
+            lexical_hits: List[Tuple[str, float]] = []
+            if mode in ("lexical", "hybrid"):
+                allowed_ids = None
+                if categories is not None:
+                    _, allowed_ids = self.db_config.get_partitions(vector_store).select(categories)
+                lexical_hits = self.db_config.get_lexical_index(vector_store).search(
+                    query, k=candidates, allowed_ids=allowed_ids
+                )
+            
+            distances = dict(vector_hits)
+            lexical_scores = dict(lexical_hits)
+            max_lexical = max(lexical_scores.values(), default=0.0)
+            
+            ranked = reciprocal_rank_fusion([
+                [doc_id for doc_id, _ in vector_hits],
+                [doc_id for doc_id, _ in lexical_hits]
+            ])[:top_k]
+            documents = self.db_config.get_documents(vector_store, [doc_id for doc_id, _ in ranked])
             
-            # Filtra por threshold e formata resultados
             relevant_contexts = []
-            for doc, score in results:
-                # Chroma usa distância (menor = mais similar)
-                # Aceita scores menores que o threshold
-                if score <= score_threshold:
-                    relevant_contexts.append({
-                        "content": doc.page_content,
-                        "metadata": doc.metadata,
-                        "similarity_score": max(0, 1 - (score / 2))  # Normaliza para 0-1
-                    })
-            
-            print(f"📚 {len(relevant_contexts)} contextos relevantes")
+            for doc_id, rrf_score in ranked:
+                doc = documents.get(doc_id)
+                if doc is None:
+                    continue
+                
+                if doc_id in distances:
+                    similarity = max(0, 1 - (distances[doc_id] / 2))  # Normaliza para 0-1
+                else:
+                    similarity = lexical_scores[doc_id] / max_lexical if max_lexical else 0.0
+                
+                relevant_contexts.append({
+                    "content": doc.page_content,
+                    "metadata": doc.metadata,
+                    "similarity_score": similarity,
+                    "retrieval": {
+                        "mode": mode,
+                        "vector_distance": distances.get(doc_id),
+                        "lexical_score": lexical_scores.get(doc_id),
+                        "rrf_score": rrf_score
+                    }
+                })
+            
+            scope = ", ".join(sorted(categories)) if categories is not None else "todas as categorias"
+            print(f"📚 {len(relevant_contexts)} contextos relevantes ({mode}; {scope})")
             return relevant_contexts
             
         except Exception as e:
             print(f"❌ Erro na busca de contexto: {e}")
             return []
     
-    def get_enhanced_context(self, query: str, max_context_length: int = 2000) -> str:
+    def _resolve_categories(self, vector_store, categories: Optional[List[str]]) -> Optional[List[str]]:
+        """
+        Categorias efetivamente buscadas: as pedidas que existem no índice mais as compartilhadas.
+        
+        Se nenhuma categoria pedida existir no índice, a busca volta a cobrir o índice inteiro.
+        """
+        if not categories:
+            return None
+        
+        partitions = self.db_config.get_partitions(vector_store).positions
+        requested = {category for category in categories if category in partitions}
+        if not requested:
+            print(f"⚠️ Categorias {', '.join(categories)} sem chunks no índice; buscando em todas")
+            return None
+        return sorted(requested | {category for category in self.SHARED_CATEGORIES if category in partitions})
+    
+    def get_enhanced_context(self, query: str, token_budget: Optional[int] = None,
+                             categories: Optional[List[str]] = None) -> str:
         """
         Busca e formata contexto para melhorar resposta do LLM.
         
+        Os candidatos passam pelo ContextPacker: a sobreposição entre chunks
+        vizinhos é removida, quase-duplicatas são descartadas e os trechos são
+        escolhidos por MMR até o orçamento de tokens.
+        
         Args:
             query: Consulta original
-            max_context_length: Tamanho máximo do contexto em caracteres
+            token_budget: Máximo de tokens do contexto (CONTEXT_TOKEN_BUDGET por padrão)
+            categories: Restringe a busca a estas categorias (ex.: canais já previstos)
             
         Returns:
             str: Contexto formatado para o prompt
         """
         try:
             # Busca contextos relevantes
-            contexts = self.search_relevant_context(query, top_k=10)
+            contexts = self.search_relevant_context(query, top_k=self.CONTEXT_CANDIDATES, categories=categories)
             
             if not contexts:
                 return "Nenhum contexto específico encontrado na base de conhecimento."
             
-            # Formata contexto
-            formatted_context = "CONTEXTO RELEVANTE DA BASE DE CONHECIMENTO:\n\n"
-            current_length = len(formatted_context)
-            
-            for i, ctx in enumerate(contexts, 1):
-                context_piece = f"{i}. {ctx['content']}\n"
-                
-                if current_length + len(context_piece) > max_context_length:
-                    break
-                
-                formatted_context += context_piece
-                current_length += len(context_piece)
-            
-            return formatted_context.strip()
+            packer = ContextPacker(
+                token_budget=token_budget or self.CONTEXT_TOKEN_BUDGET,
+                mmr_lambda=self.CONTEXT_MMR_LAMBDA
+            )
+            formatted_context = packer.format(contexts, "CONTEXTO RELEVANTE DA BASE DE CONHECIMENTO:\n\n")
+            return formatted_context or "Nenhum contexto específico encontrado na base de conhecimento."
             
         except Exception as e:
             print(f"❌ Erro ao obter contexto: {e}")
             return "Erro ao acessar base de conhecimento."
     
-    def populate_initial_knowledge_base(self) -> bool:
+    def get_structured_context(self, query: str, categories: Optional[List[str]] = None,
+                               max_municipios: int = 2) -> str:
+        """
+        Dados exatos de saúde (leitos, médicos, estabelecimentos) dos municípios citados no relato.
+        
+        Consulta o cache colunar de database/Saude em vez da busca vetorial, que
+        só via as primeiras linhas dos CSVs. Usado quando o canal de saúde está
+        entre as categorias previstas (ou sem previsão).
+        
+        Args:
+            query: Relato da ocorrência
+            categories: Categorias já previstas (None = sem previsão)
+            max_municipios: Quantidade máxima de municípios incluídos
+            
+        Returns:
+            str: Contexto formatado ou string vazia se nenhum município for citado
+        """
+        if categories and "saude" not in categories:
+            return ""
+        
+        try:
+            store = get_saude_data()
+            codes = store.encontrar_municipios(query)[:max_municipios]
+            return "\n\n".join(store.format_context(code) for code in codes)
+        except Exception as e:
+            print(f"⚠️ Dados estruturados de saúde indisponíveis: {e}")
+            return ""
+    
+    def populate_initial_knowledge_base(self, force: bool = False) -> bool:
         """
         Popula a base de conhecimento com dados iniciais sobre emergências.
         
+        Idempotente: os chunks dos protocolos carregam o hash do conteúdo e só são
+        re-embutidos quando o texto dos protocolos muda (ou se force=True). Versões
+        antigas dos protocolos encontradas no índice são removidas no mesmo snapshot
+        que publica as novas.
+        
+        A verificação e a escrita acontecem sob o publish_lock da coleção: se
+        vários processos iniciam juntos, o primeiro popula e os demais encontram
+        o hash atualizado.
+        
+        Args:
+            force: Reinsere os protocolos mesmo que o hash não tenha mudado
+        
         Returns:
             bool: True se população foi bem-sucedida
         """
@@ -337,264 +615,61 @@ class RAGService:
             {"category": "keywords", "protocol_type": "classification_indicators"}
         ]
         
-        return self.add_documents_to_knowledge_base(initial_documents, metadatas)
-    
-    def load_database_files_to_knowledge_base(self) -> bool:
-        """
-        Carrega todos os arquivos das pastas database/Bombeiros, database/Policia e database/Saude
-        para a base de conhecimento vetorial.
+        content_hash = hashlib.sha256(
+            json.dumps([initial_documents, metadatas], sort_keys=True, ensure_ascii=False).encode("utf-8")
+        ).hexdigest()
+        
+        for metadata in metadatas:
+            metadata["bootstrap_hash"] = content_hash
         
-        Returns:
-            bool: True se carregamento foi bem-sucedido
-        """
         try:
-            # Obtém o diretório base do projeto
-            current_dir = os.path.dirname(os.path.abspath(__file__))
-            project_root = os.path.dirname(current_dir)  # Sobe um nível para sair da pasta agentes
-            
-            # Diretórios a serem processados
-            database_dirs = {
-                "bombeiros": os.path.join(project_root, "database", "Bombeiros"),
-                "policia": os.path.join(project_root, "database", "Policia"), 
-                "saude": os.path.join(project_root, "database", "Saude")
-            }
-            
-            total_files_processed = 0
-            total_chunks_added = 0
-            
-            for category, dir_path in database_dirs.items():
-                print(f"📁 Processando arquivos da categoria: {category.upper()}")
+            with self.db_config.publish_lock():
+                # A cópia gravável inclui o que outros processos publicaram até agora
+                vector_store = self.writable_vector_store
+                self.db_config._merge_published(vector_store)
                 
-                # Verifica se diretório existe
-                if not os.path.exists(dir_path):
-                    print(f"⚠️  Diretório não encontrado: {dir_path}")
-                    continue
+                # Chunks de protocolo já presentes no índice (só os metadados deles são lidos)
+                existing = {
+                    doc_id: metadata
+                    for doc_id, metadata in self.db_config.find_metadata("protocol_type", vector_store).items()
+                    if not metadata.get("custom")
+                }
                 
-                # Percorre todos os arquivos do diretório
-                for file_path in Path(dir_path).rglob("*"):
-                    if file_path.is_file():
-                        try:
-                            file_extension = file_path.suffix.lower()
-                            file_name = file_path.name
-                            
-                            print(f"📄 Processando arquivo: {file_name}")
-                            
-                            # Extrai conteúdo baseado na extensão
-                            content = ""
-                            if file_extension == ".pdf":
-                                content = self._extract_pdf_content(str(file_path))
-                            elif file_extension == ".csv":
-                                content = self._extract_csv_content(str(file_path))
-                            elif file_extension == ".xlsx":
-                                content = self._extract_xlsx_content(str(file_path))
-                            elif file_extension == ".txt":
-                                content = self._extract_txt_content(str(file_path))
-                            else:
-                                print(f"⚠️  Tipo de arquivo não suportado: {file_extension}")
-                                continue
-                            
-                            if content:
-                                # Prepara metadados
-                                metadata = {
-                                    "category": category,
-                                    "filename": file_name,
-                                    "file_path": str(file_path),
-                                    "file_type": file_extension,
-                                    "source": f"{category}_{file_name}"
-                                }
-                                
-                                # Adiciona à base de conhecimento
-                                if self.add_documents_to_knowledge_base([content], [metadata]):
-                                    total_files_processed += 1
-                                    # Estima chunks (aproximado)
-                                    estimated_chunks = len(content) // 1000
-                                    total_chunks_added += estimated_chunks
-                                    print(f"✅ Arquivo processado com sucesso!")
-                                else:
-                                    print(f"❌ Falha ao processar arquivo: {file_name}")
-                            else:
-                                print(f"⚠️  Conteúdo vazio ou erro na extração: {file_name}")
-                                
-                        except Exception as e:
-                            print(f"❌ Erro ao processar arquivo {file_path}: {e}")
-                            continue
-            
-            print(f"\n📊 RESUMO DO CARREGAMENTO:")
-            print(f"   - Arquivos processados: {total_files_processed}")
-            print(f"   - Chunks estimados: {total_chunks_added}")
-            print(f"   - Status: {'✅ Sucesso' if total_files_processed > 0 else '❌ Nenhum arquivo processado'}")
-            
-            return total_files_processed > 0
-            
+                if existing and not force and all(
+                    metadata.get("bootstrap_hash") == content_hash for metadata in existing.values()
+                ):
+                    print("📚 Protocolos iniciais já presentes na base (hash inalterado)")
+                    return True
+                
+                # Remove versões anteriores (ou duplicatas de inicializações antigas)
+                # no mesmo snapshot que publica os protocolos novos
+                ids = self.replace_documents(initial_documents, metadatas, replace_ids=list(existing), save=True)
+                if existing and ids is not None:
+                    print(f"🧹 {len(existing)} chunks de protocolos desatualizados removidos")
+                return ids is not None
         except Exception as e:
-            print(f"❌ Erro geral no carregamento da base: {e}")
+            print(f"❌ Erro ao popular protocolos iniciais: {e}")
             return False
     
-    def _extract_pdf_content(self, pdf_path: str) -> str:
+    def load_database_files_to_knowledge_base(self, force: bool = False) -> bool:
         """
-        Extrai conteúdo de texto de um arquivo PDF.
+        Carrega os arquivos de database/ para a base de conhecimento.
         
-        Args:
-            pdf_path: Caminho para o arquivo PDF
-            
-        Returns:
-            str: Conteúdo extraído do PDF
-        """
-        try:
-            content = ""
-            with open(pdf_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                
-                for page_num in range(len(pdf_reader.pages)):
-                    page = pdf_reader.pages[page_num]
-                    content += page.extract_text() + "\n"
-            
-            return content.strip()
-            
-        except Exception as e:
-            print(f"❌ Erro ao extrair PDF {pdf_path}: {e}")
-            return ""
-    
-    def _extract_csv_content(self, csv_path: str) -> str:
-        """
-        Extrai conteúdo de um arquivo CSV e converte para texto estruturado.
+        A ingestão vive em agentes.ingestion e é importada apenas aqui, para que o
+        caminho de consulta não carregue pandas e PyPDF2.
         
         Args:
-            csv_path: Caminho para o arquivo CSV
-            
-        Returns:
-            str: Conteúdo estruturado do CSV
-        """
-        try:
-            # Tenta múltiplas codificações para CSVs brasileiros
-            encodings = ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1', 'windows-1252']
-            
-            df = None
-            used_encoding = None
-            
-            for encoding in encodings:
-                try:
-                    df = pd.read_csv(csv_path, encoding=encoding)
-                    used_encoding = encoding
-                    break
-                except UnicodeDecodeError:
-                    continue
-                except Exception as e:
-                    if "codec" not in str(e).lower():
-                        print(f"❌ Erro não relacionado à codificação no CSV {csv_path}: {e}")
-                        continue
-            
-            if df is None:
-                print(f"⚠️  Não foi possível decodificar o CSV {csv_path} com nenhuma codificação")
-                return ""
-            
-            # Converte para texto estruturado
-            content = f"DADOS DO ARQUIVO: {os.path.basename(csv_path)}\n"
-            content += f"CODIFICAÇÃO USADA: {used_encoding}\n\n"
-            
-            # Adiciona informações sobre colunas
-            content += f"COLUNAS: {', '.join(df.columns.tolist())}\n\n"
-            
-            # Adiciona algumas estatísticas básicas
-            content += f"TOTAL DE REGISTROS: {len(df)}\n\n"
-            
-            # Adiciona dados (limitando para não ficar muito grande)
-            content += "DADOS:\n"
-            for index, row in df.head(100).iterrows():  # Limita a 100 linhas
-                row_text = " | ".join([f"{col}: {val}" for col, val in row.items() if pd.notna(val)])
-                content += f"{row_text}\n"
-            
-            if len(df) > 100:
-                content += f"\n... (exibindo apenas primeiras 100 linhas de {len(df)} registros)"
-            
-            return content
-            
-        except Exception as e:
-            print(f"❌ Erro ao extrair CSV {csv_path}: {e}")
-            return ""
-    
-    def _extract_xlsx_content(self, xlsx_path: str) -> str:
-        """
-        Extrai conteúdo de um arquivo XLSX e converte para texto estruturado.
+            force: Reprocessa todos os arquivos mesmo com hash inalterado
         
-        Args:
-            xlsx_path: Caminho para o arquivo XLSX
-            
         Returns:
-            str: Conteúdo estruturado do XLSX
+            bool: True se carregamento foi bem-sucedido
         """
         try:
-            # Lê o arquivo Excel
-            excel_file = pd.ExcelFile(xlsx_path)
-            content = f"DADOS DO ARQUIVO EXCEL: {os.path.basename(xlsx_path)}\n\n"
-            
-            # Processa cada planilha
-            for sheet_name in excel_file.sheet_names:
-                content += f"PLANILHA: {sheet_name}\n"
-                content += "=" * 50 + "\n"
-                
-                # Lê os dados da planilha
-                df = pd.read_excel(xlsx_path, sheet_name=sheet_name)
-                
-                # Adiciona informações sobre colunas
-                content += f"COLUNAS: {', '.join(df.columns.tolist())}\n\n"
-                
-                # Adiciona estatísticas básicas
-                content += f"TOTAL DE REGISTROS: {len(df)}\n\n"
-                
-                # Adiciona dados (limitando para não ficar muito grande)
-                content += "DADOS:\n"
-                for index, row in df.head(50).iterrows():  # Limita a 50 linhas por planilha
-                    row_text = " | ".join([f"{col}: {val}" for col, val in row.items()])
-                    content += f"{row_text}\n"
-                
-                if len(df) > 50:
-                    content += f"\n... (exibindo apenas primeiras 50 linhas de {len(df)} registros)\n"
-                
-                content += "\n" + "=" * 50 + "\n\n"
-            
-            return content
-            
-        except Exception as e:
-            print(f"❌ Erro ao extrair XLSX {xlsx_path}: {e}")
-            return ""
-    
-    def _extract_txt_content(self, txt_path: str) -> str:
-        """
-        Extrai conteúdo de um arquivo TXT.
+            from .ingestion import KnowledgeIngester
+        except ImportError:
+            from ingestion import KnowledgeIngester
         
-        Args:
-            txt_path: Caminho para o arquivo TXT
-            
-        Returns:
-            str: Conteúdo do arquivo TXT
-        """
-        try:
-            # Tenta diferentes codificações
-            encodings = ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1']
-            
-            for encoding in encodings:
-                try:
-                    with open(txt_path, 'r', encoding=encoding) as file:
-                        content = file.read()
-                        
-                    # Adiciona cabeçalho com informações do arquivo
-                    header = f"ARQUIVO DE TEXTO: {os.path.basename(txt_path)}\n"
-                    header += f"CODIFICAÇÃO: {encoding}\n"
-                    header += "=" * 50 + "\n\n"
-                    
-                    return header + content.strip()
-                    
-                except UnicodeDecodeError:
-                    continue
-            
-            # Se nenhuma codificação funcionou
-            print(f"⚠️  Não foi possível decodificar o arquivo {txt_path}")
-            return ""
-            
-        except Exception as e:
-            print(f"❌ Erro ao extrair TXT {txt_path}: {e}")
-            return ""
+        return KnowledgeIngester(self).load_database_files_to_knowledge_base(force=force)
     
     def get_stats(self) -> Dict[str, Any]:
         """
@@ -604,14 +679,25 @@ class RAGService:
             Dict: Estatísticas da base
         """
         try:
-            if not self.vector_store:
+            vector_store = self.vector_store
+            if not vector_store:
                 return {"error": "Vector store não inicializado"}
             
-            # Obtém estatísticas do índice FAISS
-            index_stats = self.db_config.get_index_stats()
+            # Obtém estatísticas do índice FAISS já carregado
+            index_stats = self.db_config.get_index_stats(vector_store)
+            
+            # O micro-batcher fica abaixo do cache (ou sozinho, com o cache desativado)
+            cache = self.embeddings if isinstance(self.embeddings, CachedEmbeddings) else None
+            batcher = cache.underlying if cache else self.embeddings
+            writer = get_existing_writer(self)
             
             return {
-                "vector_store_initialized": self.vector_store is not None,
+                "vector_store_initialized": vector_store is not None,
+                "embedding_cache": cache.stats() if cache else None,
+                "embedding_batcher": batcher.stats() if isinstance(batcher, MicroBatchingEmbeddings) else None,
+                "knowledge_writer": writer.stats() if writer else None,
+                "total_documents": index_stats.get("ntotal", 0),
+                "categories": index_stats.get("categories", {}),
                 "index_stats": index_stats,
                 "database_type": "FAISS"
             }
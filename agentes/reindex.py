@@ -0,0 +1,57 @@
+"""
+Reconstrução do índice FAISS sem chamar a API de embeddings.
+
+Converte o índice atual para outro tipo (FAISS_INDEX_FACTORY), outra métrica ou
+uma dimensão reduzida dos embeddings text-embedding-3. Depois de reduzir a
+dimensão, defina EMBEDDING_DIMENSIONS com o mesmo valor para que as consultas
+usem vetores compatíveis (o índice é rejeitado na carga caso contrário).
+
+Uso:
+    python -m agentes.reindex --dimensions 256
+    python -m agentes.reindex --factory HNSW32 --metric ip
+"""
+
+import argparse
+
+# Importação robusta que funciona tanto em execução direta quanto como módulo
+try:
+    from .vectordb_config import VectorDBConfig
+except ImportError:
+    from vectordb_config import VectorDBConfig
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Reconstrói o índice FAISS a partir dos vetores já armazenados")
+    parser.add_argument("--dimensions", type=int, default=None,
+                        help="Reprojeta os embeddings para esta dimensão (ex.: 256, 512)")
+    parser.add_argument("--factory", default=None,
+                        help="Tipo do índice (string do faiss.index_factory; padrão: FAISS_INDEX_FACTORY)")
+    parser.add_argument("--metric", choices=["l2", "ip"], default=None,
+                        help="Métrica do índice (padrão: FAISS_METRIC)")
+    return parser.parse_args()
+
+
+def main() -> bool:
+    args = parse_args()
+    config = VectorDBConfig()
+
+    # Nenhum outro processo publica entre a leitura dos vetores e o save
+    with config.publish_lock():
+        vector_store = config.get_writable_vector_store()
+        config._merge_published(vector_store)
+        before = config.get_index_stats(vector_store)
+        print(f"📦 Índice atual: {before.get('index_type')} com {before.get('ntotal')} vetores de {before.get('dimension')} dimensões")
+
+        if not config.rebuild_index(vector_store, factory=args.factory, metric=args.metric, dimensions=args.dimensions):
+            return False
+
+    after = config.get_index_stats(vector_store)
+    print(f"✅ Novo índice: {after.get('index_type')} com {after.get('ntotal')} vetores de {after.get('dimension')} dimensões "
+          f"({before.get('memory_bytes', 0) / 1e6:.1f} MB → {after.get('memory_bytes', 0) / 1e6:.1f} MB)")
+    if args.dimensions:
+        print(f"💡 Defina EMBEDDING_DIMENSIONS={args.dimensions} no .env antes de reiniciar o servidor")
+    return True
+
+
+if __name__ == "__main__":
+    raise SystemExit(0 if main() else 1)
@@ -0,0 +1,118 @@
+"""
+Política de acionamento do RAG na classificação de urgência.
+
+Cada classificação pagava embedding da consulta, busca no FAISS e algumas
+centenas de tokens de contexto, inclusive para relatos curtos e inequívocos
+("tem fogo na casa, muita fumaça") em que o contexto não muda a decisão: os
+níveis de urgência já estão no prompt do sistema. O RetrievalGate decide por
+requisição se a busca é feita, com base na confiança do emergency_classifier,
+nos indicadores de urgência presentes no relato e no tamanho do relato.
+"""
+
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+# Importação robusta que funciona tanto em execução direta quanto como módulo
+try:
+    from .lexical_index import fold_accents
+except ImportError:
+    from lexical_index import fold_accents
+
+# Indicadores de urgência do protocolo de palavras-chave da base (sem acentos)
+URGENCY_INDICATORS = {
+    "alta": (
+        "nao respira", "parou de respirar", "sem pulso", "sangramento", "muito sangue", "hemorragia",
+        "inconsciente", "desmaiou", "nao acorda", "fogo", "incendio", "fumaca", "chamas",
+        "explosao", "explodiu", "bomba", "arma", "armado", "tiro", "disparo", "baleado",
+        "preso", "soterrado", "nao consegue sair", "infarto", "esfaqueado", "facada", "vazamento de gas"
+    ),
+    "media": (
+        "dor forte", "dor intensa", "nao aguenta", "acidente", "bateu", "colisao",
+        "quebrou", "fraturou", "machucou", "caiu", "tropecou", "escorregou"
+    ),
+}
+
+
+@dataclass
+class GateDecision:
+    """Decisão do gate para uma requisição."""
+    retrieve: bool
+    reason: str
+    indicators: List[str] = field(default_factory=list)
+
+
+class RetrievalGate:
+    """Decide se a classificação de urgência precisa buscar contexto na base de conhecimento."""
+
+    # "off" (padrão) sempre busca; "on" aplica a política. Meça o efeito antes de ligar
+    # (python -m benchmarks.retrieval_gate --live, ou test.py com off e depois on)
+    RAG_GATING = os.getenv("RAG_GATING", "off").lower()
+    RAG_GATE_MIN_CONFIDENCE = float(os.getenv("RAG_GATE_MIN_CONFIDENCE", "0.85"))
+    RAG_GATE_MIN_INDICATORS = int(os.getenv("RAG_GATE_MIN_INDICATORS", "1"))
+    RAG_GATE_MAX_WORDS = int(os.getenv("RAG_GATE_MAX_WORDS", "30"))
+
+    def __init__(self):
+        self._patterns = {
+            level: [(term, re.compile(rf"\b{re.escape(term)}\b")) for term in terms]
+            for level, terms in URGENCY_INDICATORS.items()
+        }
+        self.stats = {"total": 0, "retrieved": 0, "skipped": 0}
+        self._stats_lock = threading.Lock()
+
+    def find_indicators(self, relato: str) -> List[str]:
+        """
+        Indicadores de urgência encontrados no relato (sem diferenciar acentos e maiúsculas).
+
+        Args:
+            relato: Texto da ocorrência
+
+        Returns:
+            List[str]: Termos encontrados, no formato "nível:termo"
+        """
+        text = fold_accents(relato.lower())
+        return [
+            f"{level}:{term}"
+            for level, patterns in self._patterns.items()
+            for term, pattern in patterns
+            if pattern.search(text)
+        ]
+
+    def decide(self, relato: str, emergency_classification: Optional[Dict[str, Any]] = None) -> GateDecision:
+        """
+        Decide se o RAG deve ser acionado.
+
+        O contexto é dispensado apenas quando o relato é curto, tem indicadores
+        explícitos de urgência e o emergency_classifier está confiante. Em
+        qualquer dúvida a busca é feita.
+
+        Args:
+            relato: Texto da ocorrência
+            emergency_classification: Resultado do emergency_classifier (opcional)
+
+        Returns:
+            GateDecision: Se busca e o motivo
+        """
+        indicators = self.find_indicators(relato)
+        decision = self._decide(relato, emergency_classification, indicators)
+
+        with self._stats_lock:
+            self.stats["total"] += 1
+            self.stats["retrieved" if decision.retrieve else "skipped"] += 1
+        return decision
+
+    def _decide(self, relato: str, emergency_classification: Optional[Dict[str, Any]],
+                indicators: List[str]) -> GateDecision:
+        if self.RAG_GATING != "on":
+            return GateDecision(True, "gating_desativado", indicators)
+        if not emergency_classification or not emergency_classification.get("tipos_emergencia"):
+            return GateDecision(True, "sem_classificacao_previa", indicators)
+        if float(emergency_classification.get("confianca") or 0.0) < self.RAG_GATE_MIN_CONFIDENCE:
+            return GateDecision(True, "baixa_confianca", indicators)
+        if len(indicators) < self.RAG_GATE_MIN_INDICATORS:
+            return GateDecision(True, "sem_indicadores", indicators)
+        if len(relato.split()) > self.RAG_GATE_MAX_WORDS:
+            return GateDecision(True, "relato_longo", indicators)
+        return GateDecision(False, "relato_claro", indicators)
@@ -0,0 +1,416 @@
+"""
+Dados estruturados de saúde (database/Saude) para o sistema de emergência 911.
+
+Os CSVs da Fundação Seade/CNES (leitos, médicos por especialidade,
+estabelecimentos e profissionais por região de saúde) viravam texto na ingestão
+vetorial, truncados nas primeiras linhas: a maioria dos municípios ficava de
+fora e a consulta dependia de similaridade aproximada. Aqui cada CSV é lido uma
+única vez (";", latin-1, vírgula decimal e ponto de milhar) para um cache
+colunar em NumPy (.npz), ordenado e indexado pelo código do município ou da
+região. A consulta de um município é uma busca em dicionário mais fatias de
+arrays, sem rede e sem embeddings.
+
+Uso:
+    python -m agentes.saude_data 3509502
+    python -m agentes.saude_data "Campinas"
+"""
+
+import os
+import re
+import sys
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Importação robusta que funciona tanto em execução direta quanto como módulo
+try:
+    from .lexical_index import fold_accents
+except ImportError:
+    from lexical_index import fold_accents
+
+load_dotenv()
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Conjuntos de dados: arquivo e coluna-chave (código IBGE do município ou da região de saúde)
+DATASETS = {
+    "leitos": {"file": "saude_leitos_mun_ano.csv", "key": "cod_ibge"},
+    "medicos": {"file": "medicos_tipos.csv", "key": "cod_mun"},
+    "estabelecimentos": {"file": "estabelecimentos_saude.csv", "key": "co_mun"},
+    "profissionais_regiao": {"file": "prof_reg_saude.csv", "key": "codregsaude"},
+}
+
+# Versão do formato do cache (mudanças no parser invalidam os .npz antigos)
+CACHE_VERSION = 1
+
+
+def read_seade_csv(path: str) -> "pd.DataFrame":
+    """
+    Lê um CSV da Seade/CNES: separador ";", vírgula decimal e ponto de milhar.
+
+    Tenta UTF-8 e depois latin-1 (a maioria dos arquivos). O pandas só é
+    importado aqui, quando o cache colunar precisa ser refeito: o caminho de
+    serviço lê apenas os .npz.
+    """
+    import pandas as pd
+
+    for encoding in ("utf-8", "latin-1"):
+        try:
+            return pd.read_csv(path, sep=";", decimal=",", thousands=".", encoding=encoding)
+        except UnicodeDecodeError:
+            continue
+    raise ValueError(f"Codificação não suportada: {path}")
+
+
+class ColumnarTable:
+    """Tabela em colunas NumPy, ordenada pela chave, com índice chave -> fatia de linhas."""
+
+    def __init__(self, key: str, columns: Dict[str, np.ndarray]):
+        self.key = key
+        self.columns = columns
+        keys = columns[key]
+        unique, starts, counts = np.unique(keys, return_index=True, return_counts=True)
+        self.index: Dict[int, Tuple[int, int]] = {
+            int(k): (int(start), int(start + count)) for k, start, count in zip(unique, starts, counts)
+        }
+
+    @classmethod
+    def from_dataframe(cls, df: "pd.DataFrame", key: str) -> "ColumnarTable":
+        """Converte o DataFrame (números em float64 com NaN, textos em unicode fixo)."""
+        import pandas as pd
+
+        df = df.dropna(subset=[key]).sort_values(key, kind="stable")
+        columns: Dict[str, np.ndarray] = {}
+        for name in df.columns:
+            series = df[name]
+            if name == key:
+                columns[name] = series.to_numpy(dtype="int64")
+            elif pd.api.types.is_numeric_dtype(series):
+                columns[name] = series.to_numpy(dtype="float64")
+            else:
+                columns[name] = series.fillna("").astype(str).str.strip().to_numpy(dtype=str)
+        return cls(key, columns)
+
+    def __len__(self) -> int:
+        return len(self.columns[self.key])
+
+    def rows(self, key: int) -> List[Dict[str, Any]]:
+        """
+        Linhas de uma chave.
+
+        Args:
+            key: Código do município ou da região de saúde
+
+        Returns:
+            List[Dict]: Linhas como dicionários (valores ausentes viram None)
+        """
+        span = self.index.get(int(key))
+        if span is None:
+            return []
+
+        start, stop = span
+        # tolist() converte a fatia inteira de uma vez para tipos Python
+        columns = {name: values[start:stop].tolist() for name, values in self.columns.items()}
+        return [
+            {name: self._clean(values[i]) for name, values in columns.items()}
+            for i in range(stop - start)
+        ]
+
+    @staticmethod
+    def _clean(value: Any) -> Any:
+        """NaN vira None e números inteiros em float viram int."""
+        if isinstance(value, float):
+            if value != value:
+                return None
+            return int(value) if value.is_integer() else value
+        return value
+
+    def save(self, path: str, source_signature: Tuple[int, int]) -> None:
+        """Grava o cache .npz (escrita atômica)."""
+        arrays = {f"col:{name}": values for name, values in self.columns.items()}
+        arrays["_columns"] = np.array(list(self.columns), dtype=str)
+        arrays["_source"] = np.array([CACHE_VERSION, *source_signature], dtype="int64")
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, key: str, source_signature: Tuple[int, int]) -> Optional["ColumnarTable"]:
+        """Carrega o cache se ele corresponder ao CSV atual (tamanho e mtime)."""
+        if not os.path.exists(path):
+            return None
+        with np.load(path, allow_pickle=False) as data:
+            if data["_source"].tolist() != [CACHE_VERSION, *source_signature]:
+                return None
+            columns = {str(name): data[f"col:{name}"] for name in data["_columns"]}
+        return cls(key, columns)
+
+
+class SaudeDataStore:
+    """Consulta exata de leitos, médicos e estabelecimentos por município."""
+
+    SAUDE_DATA_PATH = os.getenv("SAUDE_DATA_PATH", os.path.join(PROJECT_ROOT, "database", "Saude"))
+    SAUDE_CACHE_PATH = os.getenv(
+        "SAUDE_CACHE_PATH",
+        os.path.join(os.getenv("FAISS_INDEX_PATH", "./faiss_db"), "saude_cache")
+    )
+
+    def __init__(self, data_dir: Optional[str] = None, cache_dir: Optional[str] = None):
+        """
+        Inicializa o repositório (os dados são carregados em load()).
+
+        Args:
+            data_dir: Diretório dos CSVs (SAUDE_DATA_PATH por padrão)
+            cache_dir: Diretório do cache colunar (SAUDE_CACHE_PATH por padrão)
+        """
+        self.data_dir = data_dir or self.SAUDE_DATA_PATH
+        self.cache_dir = cache_dir or self.SAUDE_CACHE_PATH
+        self.tables: Dict[str, ColumnarTable] = {}
+        self.municipios: Dict[int, str] = {}
+        self.tipos_medicos: Dict[int, str] = {}
+        self._names: Dict[str, int] = {}
+        self._max_name_words = 1
+
+    def load(self) -> bool:
+        """
+        Carrega todas as tabelas, relendo apenas os CSVs alterados desde o último cache.
+
+        Returns:
+            bool: True se ao menos uma tabela foi carregada
+        """
+        start = time.perf_counter()
+        parsed = []
+        for name, spec in DATASETS.items():
+            csv_path = os.path.join(self.data_dir, spec["file"])
+            if not os.path.exists(csv_path):
+                print(f"⚠️ Arquivo de dados de saúde não encontrado: {csv_path}")
+                continue
+
+            try:
+                stat = os.stat(csv_path)
+                signature = (stat.st_size, stat.st_mtime_ns)
+                cache_path = os.path.join(self.cache_dir, f"{name}.npz")
+
+                table = ColumnarTable.load(cache_path, spec["key"], signature)
+                if table is None:
+                    table = ColumnarTable.from_dataframe(read_seade_csv(csv_path), spec["key"])
+                    os.makedirs(self.cache_dir, exist_ok=True)
+                    table.save(cache_path, signature)
+                    parsed.append(name)
+                self.tables[name] = table
+            except Exception as e:
+                print(f"❌ Erro ao carregar {spec['file']}: {e}")
+
+        self._load_municipios()
+        self._load_tipos_medicos()
+
+        if parsed:
+            print(f"🗂️ Cache colunar de saúde atualizado: {', '.join(parsed)}")
+        print(f"🏥 Dados de saúde carregados em {time.perf_counter() - start:.3f}s "
+              f"({len(self.municipios)} municípios, "
+              f"{sum(len(table) for table in self.tables.values())} linhas)")
+        return bool(self.tables)
+
+    def _load_municipios(self) -> None:
+        """Nomes dos municípios (tabela de leitos) e índice de nomes sem acentos."""
+        leitos = self.tables.get("leitos")
+        if leitos is None:
+            return
+
+        for code, (start, _) in leitos.index.items():
+            self.municipios[code] = str(leitos.columns["localidades"][start])
+
+        self._names = {self._fold(name): code for code, name in self.municipios.items()}
+        self._max_name_words = max((len(name.split()) for name in self._names), default=1)
+
+    def _load_tipos_medicos(self) -> None:
+        """Especialidades médicas (tabela "Tipo;Cod" do dicionário dic_medicos_tipos.csv)."""
+        path = os.path.join(self.data_dir, "dic_medicos_tipos.csv")
+        if not os.path.exists(path):
+            return
+
+        try:
+            with open(path, "r", encoding="latin-1") as f:
+                lines = [line.rstrip("\n").split(";") for line in f]
+            start = next(i for i, cells in enumerate(lines) if cells[:2] == ["Tipo", "Cod"]) + 1
+            for cells in lines[start:]:
+                if len(cells) >= 2 and cells[1].strip().isdigit():
+                    self.tipos_medicos[int(cells[1])] = cells[0].strip()
+        except (OSError, StopIteration):
+            pass
+
+    @staticmethod
+    def _fold(text: str) -> str:
+        return " ".join(re.findall(r"\w+", fold_accents(text.lower())))
+
+    def buscar_codigo(self, nome: str) -> Optional[int]:
+        """
+        Código IBGE de um município pelo nome (sem diferenciar acentos e maiúsculas).
+
+        Args:
+            nome: Nome do município (ex.: "Águas de Lindóia")
+
+        Returns:
+            Optional[int]: Código IBGE ou None se não encontrado
+        """
+        return self._names.get(self._fold(nome))
+
+    def encontrar_municipios(self, texto: str) -> List[int]:
+        """
+        Municípios citados em um texto livre (ex.: relato da ocorrência).
+
+        Procura primeiro os nomes mais longos ("São José dos Campos" antes de
+        "Campos") e não reaproveita palavras já atribuídas a um município.
+
+        Args:
+            texto: Texto a ser analisado
+
+        Returns:
+            List[int]: Códigos IBGE na ordem em que aparecem
+        """
+        words = self._fold(texto).split()
+        used = [False] * len(words)
+        found: List[Tuple[int, int]] = []
+        for size in range(min(self._max_name_words, len(words)), 0, -1):
+            for start in range(len(words) - size + 1):
+                if any(used[start:start + size]):
+                    continue
+                code = self._names.get(" ".join(words[start:start + size]))
+                if code is not None:
+                    found.append((start, code))
+                    used[start:start + size] = [True] * size
+
+        codes: List[int] = []
+        for _, code in sorted(found):
+            if code not in codes:
+                codes.append(code)
+        return codes
+
+    def municipio(self, cod_ibge: int) -> Optional[Dict[str, Any]]:
+        """
+        Recursos de saúde de um município.
+
+        Args:
+            cod_ibge: Código IBGE do município (7 dígitos)
+
+        Returns:
+            Optional[Dict]: Leitos (ano mais recente e série), médicos por
+            especialidade e estabelecimentos por tipo; None se desconhecido
+        """
+        cod_ibge = int(cod_ibge)
+        if cod_ibge not in self.municipios:
+            return None
+
+        leitos = sorted(self._rows("leitos", cod_ibge), key=lambda row: row["periodos"])
+        medicos = [
+            {**row, "especialidade": self.tipos_medicos.get(row["tipo"], f"Tipo {row['tipo']}")}
+            for row in self._rows("medicos", cod_ibge)
+        ]
+        return {
+            "cod_ibge": cod_ibge,
+            "nome": self.municipios[cod_ibge],
+            "leitos": leitos[-1] if leitos else None,
+            "leitos_por_ano": leitos,
+            "medicos": sorted(medicos, key=lambda row: row["total"] or 0, reverse=True),
+            "estabelecimentos": self._rows("estabelecimentos", cod_ibge),
+        }
+
+    def regiao_saude(self, codregsaude: int) -> Optional[Dict[str, Any]]:
+        """
+        Enfermeiros, médicos e população de uma região de saúde.
+
+        Args:
+            codregsaude: Código da região de saúde
+
+        Returns:
+            Optional[Dict]: Linha da região ou None se desconhecida
+        """
+        rows = self._rows("profissionais_regiao", codregsaude)
+        return rows[0] if rows else None
+
+    @staticmethod
+    def _round(value: Any) -> Any:
+        return round(value, 2) if isinstance(value, float) else value
+
+    def _rows(self, table: str, key: int) -> List[Dict[str, Any]]:
+        return self.tables[table].rows(key) if table in self.tables else []
+
+    def format_context(self, cod_ibge: int, max_especialidades: int = 8) -> str:
+        """
+        Resumo em texto dos recursos de saúde de um município, para o prompt do LLM.
+
+        Args:
+            cod_ibge: Código IBGE do município
+            max_especialidades: Quantidade máxima de especialidades listadas
+
+        Returns:
+            str: Texto formatado (vazio se o município não for encontrado)
+        """
+        dados = self.municipio(cod_ibge)
+        if dados is None:
+            return ""
+
+        lines = [f"RECURSOS DE SAÚDE - {dados['nome'].upper()} (IBGE {dados['cod_ibge']}):"]
+        leitos = dados["leitos"]
+        if leitos:
+            lines.append(
+                f"- Leitos ({leitos['periodos']}): {leitos.get('leitos_total')} no total, "
+                f"{leitos.get('leitos sus')} SUS, {leitos.get('leitos não sus')} não SUS "
+                f"({self._round(leitos.get('leitos_hab'))} por mil habitantes)"
+            )
+
+        if dados["medicos"]:
+            total = sum(row["total"] or 0 for row in dados["medicos"])
+            top = ", ".join(
+                f"{row['especialidade']} {row['total']}" for row in dados["medicos"][:max_especialidades]
+            )
+            lines.append(f"- Médicos (vínculos): {total} no total; {top}")
+
+        if dados["estabelecimentos"]:
+            tipos = ", ".join(
+                f"{row['tiposeade']} {row['total_geral']}" for row in dados["estabelecimentos"]
+                if row.get("total_geral")
+            )
+            lines.append(f"- Estabelecimentos: {tipos}")
+
+        return "\n".join(lines)
+
+
+_shared_store: Optional[SaudeDataStore] = None
+_shared_lock = threading.Lock()
+
+
+def get_saude_data() -> SaudeDataStore:
+    """Repositório de dados de saúde compartilhado no processo (carregado no primeiro uso)."""
+    global _shared_store
+    if _shared_store is None:
+        with _shared_lock:
+            if _shared_store is None:
+                store = SaudeDataStore()
+                store.load()
+                _shared_store = store
+    return _shared_store
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Uso: python -m agentes.saude_data <código IBGE | nome do município>")
+        raise SystemExit(1)
+
+    store = get_saude_data()
+    query = " ".join(sys.argv[1:])
+    code = int(query) if query.isdigit() else store.buscar_codigo(query)
+    if code is None or store.municipio(code) is None:
+        print(f"❌ Município não encontrado: {query}")
+        raise SystemExit(1)
+
+    start = time.perf_counter()
+    store.municipio(code)
+    print(f"⏱️ Consulta em {(time.perf_counter() - start) * 1e6:.0f} µs\n")
+    print(store.format_context(code))
@@ -0,0 +1,248 @@
+"""
+Snapshots do índice FAISS: listagem e rollback.
+
+Cada save publica um snapshot novo (índice + IDs) e troca o ponteiro
+"current" da coleção. Os servidores em execução passam para o snapshot
+publicado sem reiniciar; os FAISS_SNAPSHOT_RETAIN mais recentes ficam em disco.
+
+Uso:
+    python -m agentes.snapshots                  # Lista os snapshots
+    python -m agentes.snapshots --rollback       # Volta para o snapshot anterior
+    python -m agentes.snapshots --rollback v000003
+    python -m agentes.snapshots --self-check     # Autoteste de publicação/rollback/carga em diretório temporário
+"""
+
+import argparse
+import glob
+import hashlib
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import tempfile
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# Importação robusta que funciona tanto em execução direta quanto como módulo
+try:
+    from .vectordb_config import VectorDBConfig, SnapshotLoadError, index_registry
+except ImportError:
+    from vectordb_config import VectorDBConfig, SnapshotLoadError, index_registry
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Lista os snapshots do índice FAISS ou faz rollback")
+    parser.add_argument("--rollback", nargs="?", const="", default=None, metavar="SNAPSHOT",
+                        help="Publica o snapshot informado (ou o anterior ao atual) como atual")
+    parser.add_argument("--self-check", action="store_true",
+                        help="Verifica publicação concorrente, rollback e falha de carga em uma coleção temporária")
+    parser.add_argument("--writes", type=int, default=5,
+                        help="Saves de cada um dos dois processos no autoteste")
+    return parser.parse_args()
+
+
+def print_snapshots(config: VectorDBConfig) -> None:
+    snapshots = config.list_snapshots()
+    if not snapshots:
+        print(f"📭 Nenhum snapshot em {config.snapshots_dir}")
+        return
+    for snapshot in snapshots:
+        marker = "👉" if snapshot["current"] else "  "
+        print(f"{marker} {snapshot['snapshot']}  {snapshot['vectors']:>7} vetores  "
+              f"{snapshot['size_bytes'] / 1e6:7.1f} MB  {snapshot['index_factory']:<12} {snapshot['created_at'] or '-'}")
+
+
+class HashEmbeddings(Embeddings):
+    """Embeddings determinísticos derivados do hash do texto (autoteste sem rede)."""
+
+    def __init__(self, dimension: int = 32):
+        self.dimension = dimension
+
+    def _vector(self, text: str) -> List[float]:
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+        return np.random.default_rng(seed).standard_normal(self.dimension).astype("float32").tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._vector(text)
+
+
+class SelfCheckConfig(VectorDBConfig):
+    """Coleção em um diretório temporário, com HashEmbeddings e poucos snapshots mantidos."""
+
+    FAISS_INDEX_FACTORY = "Flat"
+    FAISS_MMAP = False
+
+    def __init__(self, path: str, retain: int = 2):
+        self.FAISS_INDEX_PATH = path
+        self.FAISS_SNAPSHOT_RETAIN = retain
+        super().__init__()
+
+    def get_embeddings(self) -> Embeddings:
+        return HashEmbeddings()
+
+
+def _publish_worker(path: str, prefix: str, writes: int) -> None:
+    """Processo escritor do autoteste: um chunk e um save por iteração."""
+    config = SelfCheckConfig(path)
+    for i in range(writes):
+        with config.write_lock():
+            vector_store = config.get_writable_vector_store()
+            vector_store.add_texts([f"{prefix} {i}"], metadatas=[{"category": prefix}])
+            if not config.save_vector_store(vector_store):
+                raise SystemExit(1)
+
+
+def _docstore_rows(config: VectorDBConfig) -> int:
+    conn = sqlite3.connect(config.docstore_file)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def _fresh_vector_store(config: VectorDBConfig):
+    """Carrega a coleção como um processo novo (sem o handle em cache)."""
+    index_registry.invalidate(config.registry_key)
+    return config.get_vector_store()
+
+
+def _all_documents_found(config: VectorDBConfig, vector_store) -> bool:
+    ids = list(vector_store.index_to_docstore_id.values())
+    return len(config.get_documents(vector_store, ids)) == len(ids)
+
+
+def check_concurrent_publish(config: SelfCheckConfig, writes: int) -> bool:
+    """Dois processos publicam ao mesmo tempo; nenhuma escrita pode se perder."""
+    expected = {f"{prefix} {i}" for prefix in ("escritor-a", "escritor-b") for i in range(writes)}
+    # Spawn: cada escritor tem o próprio registro de índices, como um worker separado
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=_publish_worker, args=(config.FAISS_INDEX_PATH, prefix, writes))
+               for prefix in ("escritor-a", "escritor-b")]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    if any(worker.exitcode != 0 for worker in workers):
+        print("❌ Um dos processos escritores falhou")
+        return False
+
+    vector_store = _fresh_vector_store(config)
+    found = {doc.page_content for _, doc in config.iter_documents(vector_store)}
+    missing = expected - found
+    print(f"   {len(expected) - len(missing)}/{len(expected)} chunks no snapshot {vector_store.snapshot}, "
+          f"{len(config.list_snapshots())} snapshots mantidos")
+    if missing:
+        print(f"❌ Escritas perdidas: {sorted(missing)}")
+    return not missing and _all_documents_found(config, vector_store)
+
+
+def check_rollback_after_prune(config: SelfCheckConfig) -> bool:
+    """O snapshot anterior, mantido depois do pruning, ainda encontra todos os documentos."""
+    before = config.current_snapshot()
+    if not config.rollback_snapshot():
+        return False
+    vector_store = config.get_vector_store()
+    results = config.search_documents("escritor-a 0", k=3)
+    print(f"   {before} -> {vector_store.snapshot}: {len(vector_store.index_to_docstore_id)} chunks, "
+          f"{len(results)} resultados na busca")
+    return vector_store.snapshot != before and bool(results) and _all_documents_found(config, vector_store)
+
+
+def check_load_failure(config: SelfCheckConfig) -> bool:
+    """Snapshot atual ilegível: serve o anterior e o save seguinte não perde o conteúdo do atual."""
+    current = config.current_snapshot()
+    current_ids = set(config._snapshot_ids(current))
+    rows = _docstore_rows(config)
+    with open(config.snapshot_files(current)[0], "wb") as f:
+        f.write(b"corrompido")
+
+    vector_store = _fresh_vector_store(config)
+    served = vector_store.snapshot
+    if served == current or config.current_snapshot() != current or not _all_documents_found(config, vector_store):
+        print(f"❌ Esperado servir outro snapshot no lugar de {current} sem mover o ponteiro (servindo {served})")
+        return False
+
+    # O save incorpora os IDs do atual (ilegível ou não) ou falha; nunca publica só o snapshot servido
+    with config.write_lock():
+        writable = config.get_writable_vector_store()
+        writable.add_texts(["escrita sobre o snapshot corrompido"])
+        saved = config.save_vector_store(writable)
+    published = set(config._snapshot_ids(config.current_snapshot()))
+    kept = published >= current_ids if saved else config.current_snapshot() == current
+    print(f"   Atual {current} ilegível: servindo {served}; save {'publicou ' + config.current_snapshot() if saved else 'recusado'}, "
+          f"conteúdo do atual mantido: {kept}, linhas do docstore {rows} -> {_docstore_rows(config)}")
+    if not kept or _docstore_rows(config) < rows:
+        return False
+
+    # Nenhum snapshot legível: a carga falha em vez de criar um índice vazio por cima
+    current = config.current_snapshot()
+    rows = _docstore_rows(config)
+    for index_path in glob.glob(os.path.join(config.snapshots_dir, "v*", "index.faiss")):
+        with open(index_path, "wb") as f:
+            f.write(b"corrompido")
+    try:
+        _fresh_vector_store(config)
+    except SnapshotLoadError:
+        return config.current_snapshot() == current and _docstore_rows(config) == rows
+    print("❌ A carga sem snapshots legíveis não falhou")
+    return False
+
+
+def self_check(writes: int = 5) -> bool:
+    """
+    Autoteste dos snapshots em uma coleção temporária, sem chamadas de rede.
+    
+    Args:
+        writes: Saves de cada um dos dois processos escritores
+    
+    Returns:
+        bool: True se todas as verificações passaram
+    """
+    path = tempfile.mkdtemp(prefix="faiss-selfcheck-")
+    config = SelfCheckConfig(path)
+    checks = [
+        ("Publicação concorrente sem escritas perdidas", lambda: check_concurrent_publish(config, writes)),
+        ("Rollback depois do pruning", lambda: check_rollback_after_prune(config)),
+        ("Falha de carga do snapshot atual", lambda: check_load_failure(config))
+    ]
+    try:
+        # Cria a coleção antes dos escritores: os dois partem do mesmo snapshot
+        config.get_vector_store()
+        passed = 0
+        for name, check in checks:
+            print(f"\n🔍 {name}")
+            try:
+                success = check()
+            except Exception as e:
+                print(f"❌ Erro: {e}")
+                success = False
+            print(f"{'✅ PASSOU' if success else '❌ FALHOU'} {name}")
+            passed += success
+            if not success:
+                break
+        print(f"\nResultados: {passed}/{len(checks)} verificações passaram")
+        return passed == len(checks)
+    finally:
+        index_registry.invalidate(config.registry_key)
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def main() -> bool:
+    args = parse_args()
+    if args.self_check:
+        return self_check(args.writes)
+    config = VectorDBConfig()
+
+    if args.rollback is not None and not config.rollback_snapshot(args.rollback or None):
+        return False
+    print_snapshots(config)
+    return True
+
+
+if __name__ == "__main__":
+    raise SystemExit(0 if main() else 1)
@@ -18,8 +18,10 @@ from typing import List
 # Importação robusta que funciona tanto em execução direta quanto como módulo
 try:
     from .rag_service import RAGService
+    from .retrieval_gate import RetrievalGate
 except ImportError:
     from rag_service import RAGService
+    from retrieval_gate import RetrievalGate
 
 load_dotenv()
 
@@ -30,6 +32,8 @@ class EmergencyClassification:
     nivel_urgencia: int
     justificativa: str
     confidence_score: float
+    rag_used: bool = True
+    gate_reason: str = ""
 
 class EmergencyOutputParser(BaseOutputParser[EmergencyClassification]):
     """Parser personalizado para saída estruturada do LLM."""
@@ -91,13 +95,17 @@ class EmergencyOutputParser(BaseOutputParser[EmergencyClassification]):
 class UrgencyClassifier:
     """Agente principal para classificação de urgência de emergências."""
     
-    def __init__(self, openai_api_key: Optional[str] = None, model: str = "gpt-4.1-mini"):
+    def __init__(self, openai_api_key: Optional[str] = None, model: str = "gpt-4.1-mini",
+                 rag_service: Optional[RAGService] = None, ensure_knowledge_base: bool = True):
         """
         Inicializa o classificador de urgência.
         
         Args:
             openai_api_key: Chave da API OpenAI
             model: Modelo OpenAI a ser usado
+            rag_service: Serviço RAG já inicializado (ex.: pré-carregado antes do fork dos workers)
+            ensure_knowledge_base: Verifica/popula os protocolos iniciais (False quando o
+                processo principal já fez isso antes do fork)
         """
         # Configura API key
         if openai_api_key:
@@ -111,7 +119,10 @@ class UrgencyClassifier:
         )
         
         # Inicializa serviço RAG
-        self.rag_service = RAGService()
+        self.rag_service = rag_service or RAGService()
+        
+        # Decide por requisição se a busca na base de conhecimento é necessária
+        self.retrieval_gate = RetrievalGate()
         
         # Inicializa parser de saída
         self.output_parser = EmergencyOutputParser()
@@ -120,7 +131,8 @@ class UrgencyClassifier:
         self._create_prompt_template()
         
         # Popula base de conhecimento se estiver vazia
-        self._ensure_knowledge_base()
+        if ensure_knowledge_base:
+            self._ensure_knowledge_base()
     
     def _create_prompt_template(self) -> None:
         """Cria o template de prompt para classificação."""
@@ -176,12 +188,14 @@ class UrgencyClassifier:
         ])
     
     def _ensure_knowledge_base(self) -> None:
-        """Garante que a base de conhecimento esteja populada."""
+        """
+        Garante que a base de conhecimento contenha os protocolos iniciais.
+        
+        A população é idempotente (hash do conteúdo), então reinícios não
+        re-embutem nem duplicam os protocolos.
+        """
         try:
-            stats = self.rag_service.get_stats()
-            if stats.get("total_documents", 0) == 0:
-                print("📚 Populando base de conhecimento...")
-                self.rag_service.populate_initial_knowledge_base()
+            self.rag_service.populate_initial_knowledge_base()
         except Exception as e:
             print(f"⚠️ Aviso: Erro ao verificar base de conhecimento: {e}")
     
@@ -197,15 +211,8 @@ class UrgencyClassifier:
             EmergencyClassification: Resultado estruturado da classificação
         """
         try:
-            # Busca contexto relevante via RAG
-            enhanced_context = self.rag_service.get_enhanced_context(relato_ocorrencia)
-            
-            # Adiciona informações do emergency_classifier se disponível
+            canais_sugeridos = []
             if emergency_classification:
-                tipos_emergencia = emergency_classification.get("tipos_emergencia", [])
-                justificativa_emergencia = emergency_classification.get("justificativa", "")
-                confianca_emergencia = emergency_classification.get("confianca", 0.0)
-                
                 # Mapeia tipos do emergency_classifier para canais do urgency_classifier
                 mapeamento_canais = {
                     "samu": "saude",
@@ -213,10 +220,33 @@ class UrgencyClassifier:
                     "bombeiro": "bombeiros"
                 }
                 
-                canais_sugeridos = []
-                for tipo in tipos_emergencia:
+                for tipo in emergency_classification.get("tipos_emergencia", []):
                     canal = mapeamento_canais.get(tipo, tipo)
                     canais_sugeridos.append(canal)
+            
+            # Busca contexto relevante via RAG, apenas nas categorias dos canais já previstos.
+            # Relatos curtos, com indicadores explícitos e classificação prévia confiante dispensam a busca.
+            gate = self.retrieval_gate.decide(relato_ocorrencia, emergency_classification)
+            if gate.retrieve:
+                enhanced_context = self.rag_service.get_enhanced_context(
+                    relato_ocorrencia, categories=canais_sugeridos or None
+                )
+            else:
+                indicadores = ", ".join(indicator.split(":", 1)[1] for indicator in gate.indicators)
+                enhanced_context = f"INDICADORES DE URGÊNCIA IDENTIFICADOS NO RELATO: {indicadores}"
+            
+            # Recursos de saúde dos municípios citados (consulta exata, sem embeddings)
+            dados_saude = self.rag_service.get_structured_context(
+                relato_ocorrencia, categories=canais_sugeridos or None
+            )
+            if dados_saude:
+                enhanced_context += f"\n\n{dados_saude}"
+            
+            # Adiciona informações do emergency_classifier se disponível
+            if emergency_classification:
+                tipos_emergencia = emergency_classification.get("tipos_emergencia", [])
+                justificativa_emergencia = emergency_classification.get("justificativa", "")
+                confianca_emergencia = emergency_classification.get("confianca", 0.0)
                 
                 classificacao_previa = f"""
                 CLASSIFICAÇÃO PRÉVIA DO EMERGENCY CLASSIFIER:
@@ -241,6 +271,8 @@ class UrgencyClassifier:
             
             # Parseia resposta
             classification = self.output_parser.parse(response.content)
+            classification.rag_used = gate.retrieve
+            classification.gate_reason = gate.reason
             
             print("📋 Classificação concluída")
             return classification
@@ -310,12 +342,15 @@ class UrgencyClassifier:
         """
         Adiciona conhecimento personalizado à base.
         
+        Retorna assim que a inclusão entra na fila: o KnowledgeWriter grava em
+        lote e publica um snapshot novo sem interromper as classificações.
+        
         Args:
             documents: Lista de documentos/textos
             categories: Lista de categorias correspondentes
             
         Returns:
-            bool: True se adicionado com sucesso
+            bool: True se a inclusão foi aceita
         """
         metadatas = []
         if categories:
@@ -333,6 +368,7 @@ class UrgencyClassifier:
         return {
             "llm_model": self.llm.model_name,
             "rag_stats": self.rag_service.get_stats(),
+            "retrieval_gate": dict(self.retrieval_gate.stats),
             "vector_db_connection": self.rag_service.db_config.test_connection(),
             "system_ready": True
         }
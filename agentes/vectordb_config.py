@@ -3,91 +3,1322 @@ Configurações da base vetorial FAISS para sistema de emergência 911.
 FAISS é um banco vetorial simples, rápido e confiável.
 """
 
+import json
 import os
 import pickle
+import shutil
+import tempfile
+import threading
 import time
+import warnings
+import weakref
+from contextlib import contextmanager, nullcontext
 from datetime import datetime
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Iterable, Iterator, FrozenSet, Set, Tuple
 from dotenv import load_dotenv
 
+import faiss
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: o lock de publicação vale apenas entre threads
+    fcntl = None
+
 # Importações do LangChain para FAISS
+from langchain_core.embeddings import Embeddings
 from langchain_openai import OpenAIEmbeddings
 from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
 from langchain.schema import Document
 
+# Importação robusta que funciona tanto em execução direta quanto como módulo
+try:
+    from .docstore import SQLiteDocstore
+    from .embedding_batcher import MicroBatchingEmbeddings
+    from .embedding_cache import CachedEmbeddings
+    from .local_embeddings import LocalEmbeddings
+    from .lexical_index import BM25Index
+except ImportError:
+    from docstore import SQLiteDocstore
+    from embedding_batcher import MicroBatchingEmbeddings
+    from embedding_cache import CachedEmbeddings
+    from local_embeddings import LocalEmbeddings
+    from lexical_index import BM25Index
+
 load_dotenv()
 
+
+class PublishLock:
+    """
+    Lock de publicação de uma coleção, entre threads e entre processos.
+    
+    Segura um flock exclusivo em <coleção>.lock enquanto um snapshot é gravado,
+    publicado e os antigos são descartados: dois processos nunca publicam ao
+    mesmo tempo, o ponteiro "current" só avança e a limpeza do docstore de um
+    processo não apaga linhas do snapshot que outro está publicando.
+    Reentrante na mesma thread.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._fd: Optional[int] = None
+    
+    def __enter__(self) -> "PublishLock":
+        self._lock.acquire()
+        if self._depth == 0 and fcntl is not None:
+            try:
+                fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            except BaseException:
+                self._lock.release()
+                raise
+            self._fd = fd
+        self._depth += 1
+        return self
+    
+    def __exit__(self, *exc) -> None:
+        self._depth -= 1
+        if self._depth == 0 and self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+        self._lock.release()
+
+
+class IndexRegistry:
+    """
+    Registro por processo dos vector stores carregados, um por coleção.
+    
+    Evita reler o índice .faiss e a lista de IDs a cada busca: o handle é
+    compartilhado e só é trocado quando o snapshot publicado muda (ponteiro
+    "current"). O ponteiro é verificado no máximo a cada RELOAD_CHECK_INTERVAL
+    segundos; o snapshot novo é carregado em segundo plano enquanto as buscas
+    continuam no handle anterior.
+    """
+    
+    RELOAD_CHECK_INTERVAL = float(os.getenv("FAISS_RELOAD_CHECK_INTERVAL", "1.0"))
+    
+    def __init__(self):
+        self.lock = threading.RLock()
+        self._entries: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._write_locks: Dict[Tuple[str, str], threading.RLock] = {}
+        self._publish_locks: Dict[Tuple[str, str], PublishLock] = {}
+    
+    def write_lock(self, key: Tuple[str, str]) -> threading.RLock:
+        """
+        Lock das escritas de uma coleção no processo.
+        
+        Serializa apenas os escritores (inclusões, remoções e saves na cópia
+        gravável); as buscas usam o handle publicado e nunca esperam por ele.
+        """
+        with self.lock:
+            return self._write_locks.setdefault(key, threading.RLock())
+    
+    def publish_lock(self, key: Tuple[str, str], path: str) -> PublishLock:
+        """Lock de publicação de uma coleção (um por arquivo de lock no processo)."""
+        with self.lock:
+            return self._publish_locks.setdefault(key, PublishLock(path))
+    
+    def get(self, key: Tuple[str, str], signature_fn, reload_fn=None) -> Optional[FAISS]:
+        """
+        Retorna o handle em cache se ainda corresponde ao snapshot publicado.
+        
+        Args:
+            key: (diretório do índice, nome da coleção)
+            signature_fn: Função que lê a assinatura atual (snapshot publicado)
+            reload_fn: Carrega e registra o snapshot novo. Se informada, um
+                handle desatualizado continua sendo retornado enquanto a
+                recarga roda em segundo plano
+            
+        Returns:
+            Optional[FAISS]: Handle em cache ou None se precisa (re)carregar
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        
+        now = time.monotonic()
+        if now - entry["checked_at"] < self.RELOAD_CHECK_INTERVAL:
+            return entry["vector_store"]
+        
+        if signature_fn() != entry["signature"]:
+            if reload_fn is None:
+                return None
+            self._reload_in_background(key, entry, reload_fn)
+        
+        entry["checked_at"] = now
+        return entry["vector_store"]
+    
+    def _reload_in_background(self, key: Tuple[str, str], entry: Dict[str, Any], reload_fn) -> None:
+        """Carrega o snapshot novo em uma thread (uma recarga por vez por coleção)."""
+        with self.lock:
+            if entry.get("reloading"):
+                return
+            entry["reloading"] = True
+        
+        def run():
+            try:
+                reload_fn()
+            except Exception as e:
+                print(f"⚠️ Erro ao recarregar o índice {key[1]}: {e}")
+            finally:
+                entry["reloading"] = False
+        
+        threading.Thread(target=run, name=f"faiss-reload-{key[1]}", daemon=True).start()
+    
+    def put(self, key: Tuple[str, str], vector_store: FAISS, signature: Optional[Tuple]) -> None:
+        """
+        Registra (ou substitui) o handle de uma coleção.
+        
+        A cópia gravável é mantida: pode ter alterações ainda não salvas (ex.:
+        remoções com save=False), e o save seguinte incorpora o snapshot novo
+        a ela (VectorDBConfig._merge_published).
+        """
+        with self.lock:
+            previous = self._entries.get(key)
+            self._entries[key] = {
+                "vector_store": vector_store,
+                "writable": previous["writable"] if previous else None,
+                "signature": signature,
+                "checked_at": time.monotonic(),
+                "loaded_at": time.time(),
+                "version": (previous["version"] + 1) if previous else 1
+            }
+    
+    def get_writable(self, key: Tuple[str, str]) -> Optional[FAISS]:
+        """Cópia gravável em uso para a coleção (separada do handle das buscas)."""
+        entry = self._entries.get(key)
+        return entry["writable"] if entry else None
+    
+    def set_writable(self, key: Tuple[str, str], vector_store: FAISS) -> None:
+        """Registra a cópia gravável que recebe as alterações até o próximo save."""
+        with self.lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry["writable"] = vector_store
+    
+    def invalidate(self, key: Tuple[str, str]) -> None:
+        """Descarta o handle de uma coleção (próximo acesso recarrega do disco)."""
+        with self.lock:
+            self._entries.pop(key, None)
+    
+    def describe(self, key: Tuple[str, str]) -> Dict[str, Any]:
+        """Informações do handle em cache para estatísticas."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return {"cached": False}
+        return {
+            "cached": True,
+            "version": entry["version"],
+            "loaded_at": entry["loaded_at"],
+            "snapshot": entry["signature"],
+            "reloading": bool(entry.get("reloading")),
+            "mmap": getattr(entry["vector_store"], "read_only", False),
+            "writable_copy": entry["writable"] is not None
+        }
+
+
+# Registro compartilhado por todas as instâncias de VectorDBConfig do processo
+index_registry = IndexRegistry()
+
+
+
+class CategoryPartitions:
+    """
+    Partições do índice por categoria (bombeiros, saude, policia, keywords...).
+    
+    Guarda as posições FAISS e os IDs dos chunks de cada categoria, para que a
+    busca visite apenas as partições pedidas (seletor de IDs do FAISS) sem
+    duplicar os vetores em sub-índices.
+    """
+    
+    def __init__(self):
+        self.positions: Dict[str, List[int]] = {}
+        self.ids: Dict[str, Set[str]] = {}
+        self._selections: Dict[FrozenSet[str], Tuple[Any, FrozenSet[str]]] = {}
+        self._lock = threading.Lock()
+    
+    def add(self, category: str, position: int, doc_id: str) -> None:
+        self.positions.setdefault(category, []).append(position)
+        self.ids.setdefault(category, set()).add(doc_id)
+    
+    def sizes(self) -> Dict[str, int]:
+        return {category: len(positions) for category, positions in sorted(self.positions.items())}
+    
+    def select(self, categories: Iterable[str]) -> Tuple[Any, FrozenSet[str]]:
+        """
+        Seletor FAISS e IDs dos chunks das categorias informadas (memorizados por combinação).
+        
+        Returns:
+            Tuple: (faiss.IDSelectorBatch ou None se nenhuma categoria existir, IDs dos chunks)
+        """
+        key = frozenset(category for category in categories if category in self.positions)
+        cached = self._selections.get(key)
+        if cached is not None:
+            return cached
+        
+        with self._lock:
+            if key not in self._selections:
+                positions = np.array(sorted(p for category in key for p in self.positions[category]), dtype="int64")
+                selector = faiss.IDSelectorBatch(positions) if len(positions) else None
+                ids = frozenset(doc_id for category in key for doc_id in self.ids[category])
+                self._selections[key] = (selector, ids)
+            return self._selections[key]
+
+
+# Índices BM25 e partições por categoria por handle do FAISS (descartados junto com o handle)
+_derived_indexes: "weakref.WeakKeyDictionary[FAISS, Tuple[Tuple, BM25Index, CategoryPartitions]]" = weakref.WeakKeyDictionary()
+_derived_lock = threading.Lock()
+
+# Modelos de embeddings compartilhados no processo (um por configuração)
+_shared_embeddings: Dict[Tuple, Embeddings] = {}
+_embeddings_lock = threading.Lock()
+
+def truncate_embeddings(vectors: np.ndarray, dimensions: int) -> np.ndarray:
+    """
+    Reduz embeddings às primeiras `dimensions` componentes e renormaliza.
+    
+    Para os modelos text-embedding-3 (treinados como Matryoshka) o resultado é o
+    mesmo que pedir `dimensions` à API, então um índice completo pode ser
+    reprojetado sem novas chamadas de embeddings.
+    """
+    reduced = np.ascontiguousarray(vectors[:, :dimensions], dtype="float32")
+    faiss.normalize_L2(reduced)
+    return reduced
+
+
+class IndexMismatchError(RuntimeError):
+    """O índice em disco foi criado com outro backend/modelo de embeddings."""
+
+
+class SnapshotLoadError(RuntimeError):
+    """Nenhum snapshot mantido da coleção pôde ser carregado do disco."""
+
+
+# Índices salvos antes dos metadados de embeddings foram criados com a OpenAI
+LEGACY_EMBEDDING_INFO = {"backend": "openai", "model": "text-embedding-3-small"}
+
+# Documento que inicializa uma coleção vazia (o LangChain não cria FAISS sem vetores)
+INITIAL_DOCUMENT = Document(
+    page_content="Documento inicial para configuração do sistema 911",
+    metadata={"tipo": "sistema", "categoria": "inicial"}
+)
+
+# Textos inseridos por test_vector_store_operations (removidos ao final do teste e pela compactação)
+TEST_DOCUMENTS = [
+    ("Emergência médica: paciente com dor no peito aguda", {"categoria": "medica", "prioridade": "alta"}),
+    ("Incêndio em residência: bombeiros necessários urgentemente", {"categoria": "incendio", "prioridade": "alta"}),
+    ("Acidente de trânsito: feridos graves na rodovia", {"categoria": "transito", "prioridade": "media"}),
+    ("Assalto em andamento: suspeito armado", {"categoria": "criminal", "prioridade": "alta"})
+]
+
+
 class VectorDBConfig:
     """Configurações para a base vetorial FAISS."""
     
     # Configurações via variáveis de ambiente
     FAISS_INDEX_PATH = os.getenv("FAISS_INDEX_PATH", "./faiss_db")
     COLLECTION_NAME = os.getenv("COLLECTION_NAME", "emergency_knowledge")
+    EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+    # Dimensão reduzida dos embeddings OpenAI (ex.: 256, 512); 0 usa a dimensão completa do modelo
+    EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", "0")) or None
+    
+    # Backend de embeddings: "openai" (API) ou "local" (sentence-transformers em CPU)
+    EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "openai").lower()
+    LOCAL_EMBEDDING_MODEL = os.getenv("LOCAL_EMBEDDING_MODEL", "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+    LOCAL_EMBEDDING_BATCH_SIZE = int(os.getenv("LOCAL_EMBEDDING_BATCH_SIZE", "32"))
+    # "torch" ou "onnx"; LOCAL_EMBEDDING_ONNX_FILE escolhe uma variante quantizada (ex.: onnx/model_qint8_avx512.onnx)
+    LOCAL_EMBEDDING_RUNTIME = os.getenv("LOCAL_EMBEDDING_RUNTIME", "torch").lower()
+    LOCAL_EMBEDDING_ONNX_FILE = os.getenv("LOCAL_EMBEDDING_ONNX_FILE") or None
+    LOCAL_EMBEDDING_THREADS = int(os.getenv("LOCAL_EMBEDDING_THREADS", "0")) or None
+    
+    # Tipo do índice FAISS (string do faiss.index_factory: Flat, IVF1024,Flat, HNSW32, SQ8, IVF1024,PQ64...)
+    FAISS_INDEX_FACTORY = os.getenv("FAISS_INDEX_FACTORY", "Flat")
+    # "l2" (distância euclidiana) ou "ip" (produto interno sobre vetores normalizados = cosseno)
+    FAISS_METRIC = os.getenv("FAISS_METRIC", "l2").lower()
+    FAISS_TRAIN_SAMPLE = int(os.getenv("FAISS_TRAIN_SAMPLE", "100000"))
+    # Parâmetros de busca padrão (podem ser sobrescritos por consulta)
+    FAISS_NPROBE = int(os.getenv("FAISS_NPROBE", "16"))
+    FAISS_EF_SEARCH = int(os.getenv("FAISS_EF_SEARCH", "64"))
+    # Abre o índice somente-leitura via mmap: os workers compartilham o page cache do SO
+    FAISS_MMAP = os.getenv("FAISS_MMAP", "false").lower() == "true"
+    # Snapshots publicados mantidos em disco para rollback (o atual sempre fica)
+    FAISS_SNAPSHOT_RETAIN = max(1, int(os.getenv("FAISS_SNAPSHOT_RETAIN", "3")))
+    
+    # Cache de embeddings (LRU em memória + SQLite em disco)
+    EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+    EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", os.path.join(FAISS_INDEX_PATH, "embedding_cache.sqlite"))
+    EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "4096"))
+    EMBEDDING_CACHE_DOCUMENTS = os.getenv("EMBEDDING_CACHE_DOCUMENTS", "false").lower() == "true"
+    
+    # Micro-batching das consultas concorrentes (uma chamada de embeddings por lote)
+    EMBEDDING_MICROBATCH_ENABLED = os.getenv("EMBEDDING_MICROBATCH_ENABLED", "true").lower() == "true"
+    EMBEDDING_MICROBATCH_MAX_SIZE = int(os.getenv("EMBEDDING_MICROBATCH_MAX_SIZE", "16"))
+    EMBEDDING_MICROBATCH_WAIT_MS = float(os.getenv("EMBEDDING_MICROBATCH_WAIT_MS", "5"))
     
     def __init__(self):
         """Inicializa as configurações da base vetorial."""
         # Cria diretório se não existir
         os.makedirs(self.FAISS_INDEX_PATH, exist_ok=True)
+        # Cada save publica um snapshot (índice + IDs) em um diretório próprio e
+        # troca o ponteiro "current" com um único rename
+        self.snapshots_dir = os.path.join(self.FAISS_INDEX_PATH, f"{self.COLLECTION_NAME}.snapshots")
+        self.current_file = os.path.join(self.FAISS_INDEX_PATH, f"{self.COLLECTION_NAME}.current")
+        # Layout anterior (índice e IDs soltos no diretório), adotado como primeiro snapshot
         self.index_file = os.path.join(self.FAISS_INDEX_PATH, f"{self.COLLECTION_NAME}.faiss")
+        self.ids_file = os.path.join(self.FAISS_INDEX_PATH, f"{self.COLLECTION_NAME}.ids.json")
+        self.docstore_file = os.path.join(self.FAISS_INDEX_PATH, f"{self.COLLECTION_NAME}.docstore.sqlite")
+        # Formato antigo (InMemoryDocstore pickled), migrado na primeira carga
         self.pkl_file = os.path.join(self.FAISS_INDEX_PATH, f"{self.COLLECTION_NAME}.pkl")
+        # flock dos processos que publicam snapshots da coleção
+        self.lock_file = os.path.join(self.FAISS_INDEX_PATH, f"{self.COLLECTION_NAME}.lock")
+        self.registry_key = (os.path.abspath(self.FAISS_INDEX_PATH), self.COLLECTION_NAME)
         
-    def get_embeddings(self) -> OpenAIEmbeddings:
+    def embedding_info(self) -> Dict[str, str]:
+        """Backend e modelo de embeddings configurados (gravados nos metadados do índice)."""
+        if self.EMBEDDING_BACKEND == "local":
+            return {"backend": "local", "model": self.LOCAL_EMBEDDING_MODEL, "dimensions": None}
+        return {"backend": "openai", "model": self.EMBEDDING_MODEL, "dimensions": self.EMBEDDING_DIMENSIONS}
+    
+    def get_embeddings(self) -> Embeddings:
         """
-        Retorna o modelo de embeddings OpenAI.
+        Retorna o modelo de embeddings do backend configurado, envolvido pelo cache.
+        
+        Abaixo do cache fica o micro-batcher: consultas concorrentes que não
+        estão no cache são agrupadas em uma única chamada ao modelo.
+        
+        EMBEDDING_BACKEND=openai usa a API da OpenAI; EMBEDDING_BACKEND=local roda
+        um modelo do sentence-transformers em CPU, sem rede. A instância é
+        compartilhada no processo, para que o LRU e as estatísticas de acerto
+        valham para todos os usuários (RAGService, buscas, ingestão).
         
         Returns:
-            OpenAIEmbeddings: Modelo de embeddings configurado
+            Embeddings: Modelo de embeddings configurado
         """
-        return OpenAIEmbeddings(
-            model="text-embedding-3-small",
-            chunk_size=1000
-        )
+        info = self.embedding_info()
+        key = (info["backend"], info["model"], info["dimensions"], self.EMBEDDING_CACHE_ENABLED, self.EMBEDDING_CACHE_PATH,
+               self.EMBEDDING_MICROBATCH_ENABLED, self.EMBEDDING_MICROBATCH_MAX_SIZE, self.EMBEDDING_MICROBATCH_WAIT_MS)
+        with _embeddings_lock:
+            embeddings = _shared_embeddings.get(key)
+            if embeddings is None:
+                if info["backend"] == "local":
+                    embeddings = LocalEmbeddings(
+                        model_name=self.LOCAL_EMBEDDING_MODEL,
+                        batch_size=self.LOCAL_EMBEDDING_BATCH_SIZE,
+                        runtime=self.LOCAL_EMBEDDING_RUNTIME,
+                        onnx_file=self.LOCAL_EMBEDDING_ONNX_FILE,
+                        num_threads=self.LOCAL_EMBEDDING_THREADS
+                    )
+                else:
+                    embeddings = OpenAIEmbeddings(
+                        model=self.EMBEDDING_MODEL,
+                        chunk_size=1000,
+                        dimensions=info["dimensions"]
+                    )
+                if self.EMBEDDING_MICROBATCH_ENABLED:
+                    embeddings = MicroBatchingEmbeddings(
+                        embeddings,
+                        max_batch_size=self.EMBEDDING_MICROBATCH_MAX_SIZE,
+                        max_wait_ms=self.EMBEDDING_MICROBATCH_WAIT_MS
+                    )
+                if self.EMBEDDING_CACHE_ENABLED:
+                    embeddings = CachedEmbeddings(
+                        embeddings,
+                        # A dimensão entra na chave: vetores reduzidos não servem ao índice completo
+                        model_name=f"{info['model']}@{info['dimensions']}" if info["dimensions"] else info["model"],
+                        cache_path=self.EMBEDDING_CACHE_PATH,
+                        max_memory_items=self.EMBEDDING_CACHE_SIZE,
+                        cache_documents=self.EMBEDDING_CACHE_DOCUMENTS
+                    )
+                _shared_embeddings[key] = embeddings
+            return embeddings
+    
+    def current_snapshot(self) -> Optional[str]:
+        """Nome do snapshot publicado (ex.: "v000007"); None se a coleção não tem snapshots."""
+        try:
+            with open(self.current_file, "r", encoding="utf-8") as f:
+                return json.load(f)["snapshot"]
+        except (FileNotFoundError, ValueError, KeyError):
+            return None
     
-    def get_vector_store(self, embeddings: Optional[OpenAIEmbeddings] = None) -> FAISS:
+    def snapshot_files(self, snapshot: str) -> Tuple[str, str]:
+        """Arquivos (índice, IDs) de um snapshot."""
+        return self._snapshot_paths(os.path.join(self.snapshots_dir, snapshot))
+    
+    @staticmethod
+    def _snapshot_paths(directory: str) -> Tuple[str, str]:
+        return os.path.join(directory, "index.faiss"), os.path.join(directory, "ids.json")
+    
+    def list_snapshots(self) -> List[Dict[str, Any]]:
+        """
+        Snapshots mantidos em disco, do mais antigo para o mais novo.
+        
+        Returns:
+            List[Dict]: Nome, vetores, tamanho, data de publicação e se é o atual
+        """
+        current = self.current_snapshot()
+        snapshots = []
+        for name in self._snapshot_names():
+            index_path, ids_path = self.snapshot_files(name)
+            try:
+                with open(ids_path, "r", encoding="utf-8") as f:
+                    layout = json.load(f)
+                size = os.path.getsize(index_path) + os.path.getsize(ids_path)
+            except (OSError, ValueError):
+                continue
+            snapshots.append({
+                "snapshot": name,
+                "vectors": len(layout.get("ids", [])),
+                "index_factory": layout.get("index_factory", "Flat"),
+                "created_at": layout.get("created_at"),
+                "size_bytes": size,
+                "current": name == current
+            })
+        return snapshots
+    
+    def _snapshot_names(self) -> List[str]:
+        try:
+            names = os.listdir(self.snapshots_dir)
+        except FileNotFoundError:
+            return []
+        return sorted(name for name in names if name.startswith("v") and name[1:].isdigit())
+    
+    def _point_current_to(self, snapshot: str) -> None:
+        """Troca o ponteiro "current" atomicamente (escrita em arquivo temporário + rename)."""
+        fd, tmp_path = tempfile.mkstemp(prefix=".current-", dir=self.FAISS_INDEX_PATH)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"snapshot": snapshot, "published_at": datetime.now().isoformat()}, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.current_file)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    
+    def _publish_snapshot(self, tmp_dir: str) -> str:
+        """Renomeia o diretório gravado para a próxima versão e publica-o como atual (com publish_lock)."""
+        names = self._snapshot_names()
+        snapshot = f"v{(int(names[-1][1:]) + 1) if names else 1:06d}"
+        os.rename(tmp_dir, os.path.join(self.snapshots_dir, snapshot))
+        self._point_current_to(snapshot)
+        return snapshot
+    
+    def _snapshot_ids(self, snapshot: str) -> List[str]:
+        _, ids_path = self.snapshot_files(snapshot)
+        with open(ids_path, "r", encoding="utf-8") as f:
+            layout = json.load(f)
+        return layout["ids"] if isinstance(layout, dict) else layout
+    
+    def _prune_snapshots(self, current: str, current_ids: Iterable[str],
+                         retain: Optional[int] = None) -> Tuple[Set[str], Set[str]]:
+        """
+        Descarta os snapshots mais antigos além de FAISS_SNAPSHOT_RETAIN.
+        
+        Args:
+            current: Snapshot atual (sempre mantido)
+            current_ids: IDs do snapshot atual
+            retain: Snapshots mantidos, o atual incluído (FAISS_SNAPSHOT_RETAIN por padrão)
+        
+        Returns:
+            Tuple[Set[str], Set[str]]: (IDs referenciados pelos snapshots mantidos,
+            IDs dos snapshots descartados)
+        """
+        retain = self.FAISS_SNAPSHOT_RETAIN if retain is None else max(1, retain)
+        names = [name for name in self._snapshot_names() if name != current]
+        keep = names[len(names) - (retain - 1):] if retain > 1 else []
+        
+        referenced = set(current_ids)
+        discarded: Set[str] = set()
+        for name in names:
+            try:
+                ids = self._snapshot_ids(name)
+            except (OSError, ValueError, KeyError):
+                ids = []
+            if name in keep:
+                referenced.update(ids)
+            else:
+                discarded.update(ids)
+                shutil.rmtree(os.path.join(self.snapshots_dir, name), ignore_errors=True)
+        return referenced, discarded
+    
+    def _adopt_flat_layout(self) -> bool:
+        """Publica o índice no layout anterior (arquivos soltos) como primeiro snapshot."""
+        if self.current_snapshot() or not (os.path.exists(self.index_file) and os.path.exists(self.ids_file)):
+            return False
+        
+        os.makedirs(self.snapshots_dir, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(prefix=".save-", dir=self.snapshots_dir)
+        try:
+            index_path, ids_path = self._snapshot_paths(tmp_dir)
+            shutil.copyfile(self.index_file, index_path)
+            shutil.copyfile(self.ids_file, ids_path)
+            snapshot = self._publish_snapshot(tmp_dir)
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        
+        for path in (self.index_file, self.ids_file):
+            if os.path.exists(path):
+                os.remove(path)
+        print(f"📦 Índice {self.COLLECTION_NAME} movido para o snapshot {snapshot}")
+        return True
+    
+    def get_vector_store(self, embeddings: Optional[Embeddings] = None) -> FAISS:
         """
         Retorna o vector store FAISS configurado.
         
+        O índice é carregado do disco uma única vez por processo e compartilhado
+        pelo registro de índices; só é recarregado quando os arquivos mudam
+        (mtime/tamanho), por exemplo após uma escrita de outro processo.
+        
         Args:
             embeddings: Modelo de embeddings a ser usado (OpenAI por padrão)
             
         Returns:
             FAISS: Vector store configurado
         """
+        key = self.registry_key
+        reload_fn = lambda: self._reload_vector_store(embeddings)
+        
+        vector_store = index_registry.get(key, self.current_snapshot, reload_fn)
+        if vector_store is not None:
+            return vector_store
+        
+        # Carga inicial (rara): a criação/migração do índice grava um snapshot, então
+        # segue a ordem dos escritores (write_lock antes do lock do registro)
+        with self.write_lock(), index_registry.lock:
+            # Outra thread pode ter carregado enquanto esperávamos o lock
+            vector_store = index_registry.get(key, self.current_snapshot, reload_fn)
+            if vector_store is not None:
+                return vector_store
+            
+            vector_store = self._load_vector_store(embeddings)
+            signature = getattr(vector_store, "fallback_from", None) or getattr(vector_store, "snapshot", None)
+            index_registry.put(key, vector_store, signature)
+            return vector_store
+    
+    def _reload_vector_store(self, embeddings: Optional[Embeddings] = None) -> None:
+        """
+        Troca o handle compartilhado pelo snapshot publicado por outro processo.
+        
+        Roda fora do caminho das buscas (IndexRegistry): o índice novo, o BM25 e as
+        partições são montados antes da troca, que é uma única atribuição.
+        """
+        start = time.perf_counter()
+        vector_store = self._load_with_sqlite_docstore(embeddings or self.get_embeddings(), mmap=self.FAISS_MMAP)
+        self._derived(vector_store)
+        index_registry.put(self.registry_key, vector_store, vector_store.snapshot)
+        print(f"🔄 Índice {self.COLLECTION_NAME} atualizado para o snapshot {vector_store.snapshot} "
+              f"em {time.perf_counter() - start:.2f}s")
+    
+    def get_writable_vector_store(self, embeddings: Optional[Embeddings] = None) -> FAISS:
+        """
+        Retorna um handle que pode ser alterado (inclusão/remoção de chunks).
+        
+        Copy-on-write: as escritas vão para uma cópia privada do handle
+        publicado, e as buscas em andamento continuam no handle publicado, sem
+        lock. O save publica uma cópia do estado gravado; a cópia gravável
+        continua a mesma, então quem a segura entre saves (ingestão) não perde
+        alterações. Escritores devem segurar write_lock().
+        
+        Args:
+            embeddings: Modelo de embeddings a ser usado (OpenAI por padrão)
+            
+        Returns:
+            FAISS: Vector store gravável
+        """
+        vector_store = self.get_vector_store(embeddings)
+        
+        with index_registry.lock:
+            writable = index_registry.get_writable(self.registry_key)
+            if writable is None:
+                writable = self._copy_vector_store(vector_store, mmap=False)
+                # Base da cópia: o save traz o que outros processos publicaram depois dela
+                writable.base_ids = frozenset(writable.index_to_docstore_id.values())
+                index_registry.set_writable(self.registry_key, writable)
+            return writable
+    
+    def write_lock(self) -> threading.RLock:
+        """Lock das escritas desta coleção no processo (ver IndexRegistry.write_lock)."""
+        return index_registry.write_lock(self.registry_key)
+    
+    @contextmanager
+    def publish_lock(self):
+        """
+        Lock de publicação da coleção entre processos (ver PublishLock).
+        
+        Inclui o write_lock do processo; a ordem é sempre write_lock, flock e
+        então o lock do registro.
+        """
+        with self.write_lock(), index_registry.publish_lock(self.registry_key, self.lock_file):
+            yield
+    
+    def _merge_published(self, vector_store: FAISS) -> None:
+        """
+        Traz para a cópia gravável o que outros processos publicaram desde a sua base.
+        
+        A cópia guarda o snapshot de origem e os IDs que ele tinha: os chunks
+        incluídos desde então no snapshot atual são anexados (vetores lidos do
+        snapshot, documentos já gravados no docstore) e os removidos saem da
+        cópia. As alterações ainda não salvas da cópia são mantidas. Chamado com
+        publish_lock.
+        """
+        current = self.current_snapshot()
+        base_ids = getattr(vector_store, "base_ids", None)
+        if current is None or base_ids is None or current == getattr(vector_store, "snapshot", None):
+            return
+        
+        index_path, _ = self.snapshot_files(current)
+        ids = self._snapshot_ids(current)
+        published = frozenset(ids)
+        local = set(vector_store.index_to_docstore_id.values())
+        added = [position for position, doc_id in enumerate(ids) if doc_id not in base_ids and doc_id not in local]
+        removed = [doc_id for doc_id in base_ids if doc_id not in published]
+        
+        if added:
+            index = faiss.read_index(index_path)
+            if index.d != vector_store.index.d:
+                raise IndexMismatchError(
+                    f"Snapshot {current} tem {index.d} dimensões e a cópia gravável {vector_store.index.d}"
+                )
+            vectors = np.ascontiguousarray(self._reconstruct_vectors(index)[added], dtype="float32")
+            if vector_store._normalize_L2:
+                faiss.normalize_L2(vectors)
+            start = vector_store.index.ntotal
+            vector_store.index.add(vectors)
+            for offset, position in enumerate(added):
+                vector_store.index_to_docstore_id[start + offset] = ids[position]
+        if removed:
+            self.remove_ids(vector_store, removed)
+        
+        print(f"🔀 Cópia gravável de {vector_store.snapshot} atualizada para {current} "
+              f"(+{len(added)} / -{len(removed)} chunks publicados por outro processo)")
+        vector_store.snapshot = current
+        vector_store.base_ids = published
+    
+    def _copy_vector_store(self, vector_store: FAISS, mmap: bool = False, directory: Optional[str] = None) -> FAISS:
+        """
+        Cópia independente de um handle: índice, mapa de IDs e conexão ao docstore.
+        
+        Índices mapeados (e cópias que devem ser mapeadas) são lidos do snapshot
+        em disco; os demais são clonados em memória.
+        
+        Args:
+            vector_store: Handle de origem (já salvo em um snapshot se mmap ou read_only)
+            mmap: A cópia mapeia o arquivo do snapshot (somente-leitura)
+            directory: Diretório gravado e ainda não publicado com o estado do handle
+        """
+        if mmap or getattr(vector_store, "read_only", False):
+            return self._load_with_sqlite_docstore(
+                vector_store.embedding_function, mmap=mmap, snapshot=getattr(vector_store, "snapshot", None),
+                directory=directory
+            )
+        
+        docstore = vector_store.docstore
+        if isinstance(docstore, SQLiteDocstore):
+            # Conexão própria: inclusões e remoções pendentes ficam só na cópia que as fez
+            docstore = SQLiteDocstore(docstore.path)
+        
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            copy = FAISS(
+                embedding_function=vector_store.embedding_function,
+                index=faiss.clone_index(vector_store.index),
+                docstore=docstore,
+                index_to_docstore_id=dict(vector_store.index_to_docstore_id),
+                distance_strategy=vector_store.distance_strategy,
+                normalize_L2=vector_store._normalize_L2
+            )
+        copy.index_factory = getattr(vector_store, "index_factory", "Flat")
+        copy.embedding_info = getattr(vector_store, "embedding_info", None)
+        copy.snapshot = getattr(vector_store, "snapshot", None)
+        copy.read_only = False
+        return copy
+    
+    def _load_vector_store(self, embeddings: Optional[Embeddings] = None) -> FAISS:
+        """
+        Carrega o índice do disco ou cria um novo.
+        
+        Args:
+            embeddings: Modelo de embeddings a ser usado (OpenAI por padrão)
+            
+        Returns:
+            FAISS: Vector store carregado
+        """
         if embeddings is None:
             embeddings = self.get_embeddings()
         
+        # Sem snapshot publicado, quem cria, migra ou adota o índice publica o
+        # primeiro: um processo por vez, e os seguintes carregam o que ele publicou
+        with nullcontext() if self.current_snapshot() else self.publish_lock():
+            return self._load_or_create_vector_store(embeddings)
+    
+    def _load_or_create_vector_store(self, embeddings: Embeddings) -> FAISS:
         # Verifica se já existe um índice salvo
-        if os.path.exists(self.index_file) and os.path.exists(self.pkl_file):
+        try:
+            self._adopt_flat_layout()
+        except Exception as e:
+            print(f"⚠️ Erro ao converter o índice para snapshots: {e}")
+        
+        current = self.current_snapshot()
+        if current or self._snapshot_names():
             try:
-                # Carrega índice existente
-                vector_store = FAISS.load_local(
-                    self.FAISS_INDEX_PATH, 
-                    embeddings, 
-                    self.COLLECTION_NAME,
-                    allow_dangerous_deserialization=True
-                )
-                return vector_store
+                # Carrega índice existente (documentos ficam no SQLite, lidos sob demanda)
+                return self._load_with_sqlite_docstore(embeddings, mmap=self.FAISS_MMAP)
+            except IndexMismatchError:
+                # Não recria o índice por cima: exige reset/reingestão explícitos
+                raise
             except Exception as e:
                 print(f"⚠️ Erro ao carregar índice existente: {e}")
+                # Nunca publica um índice vazio por cima do histórico (o docstore é compartilhado)
+                return self._load_retained_snapshot(embeddings, current, e)
+        elif os.path.exists(self.index_file) and os.path.exists(self.pkl_file):
+            try:
+                return self.migrate_pickle_docstore(embeddings)
+            except IndexMismatchError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Erro ao migrar índice existente: {e}")
                 print("🔄 Criando novo índice...")
         
         # Cria novo índice vazio
         # Cria com um documento dummy para inicializar
-        dummy_doc = Document(
-            page_content="Documento inicial para configuração do sistema 911",
-            metadata={"tipo": "sistema", "categoria": "inicial"}
-        )
+        dummy_doc = Document(page_content=INITIAL_DOCUMENT.page_content, metadata=dict(INITIAL_DOCUMENT.metadata))
         
-        vector_store = FAISS.from_documents([dummy_doc], embeddings)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            vector_store = FAISS.from_documents([dummy_doc], embeddings, **self._metric_kwargs(self.FAISS_METRIC))
+        vector_store.index_factory = "Flat"
+        vector_store.embedding_info = {**self.embedding_info(), "dimension": int(vector_store.index.d)}
         
         # Salva o índice
         self.save_vector_store(vector_store)
         
         return vector_store
     
+    def _load_retained_snapshot(self, embeddings: Embeddings, failed: Optional[str], error: Exception) -> FAISS:
+        """
+        Carrega o snapshot mantido mais novo que ainda abre quando o atual falha.
+        
+        O ponteiro não é alterado: o handle passa a servir as buscas, e o save
+        seguinte ainda incorpora o snapshot atual (IDs; vetores quando legíveis)
+        ou falha, então nenhuma publicação descarta o que o atual continha.
+        
+        Args:
+            embeddings: Modelo de embeddings a ser usado
+            failed: Snapshot atual que não pôde ser carregado (None sem ponteiro)
+            error: Erro da carga do snapshot atual
+        
+        Raises:
+            SnapshotLoadError: Se nenhum snapshot mantido pode ser carregado
+        """
+        for name in reversed(self._snapshot_names()):
+            if name == failed:
+                continue
+            try:
+                vector_store = self._load_with_sqlite_docstore(embeddings, mmap=self.FAISS_MMAP, snapshot=name)
+            except IndexMismatchError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Snapshot {name} também não pôde ser carregado: {e}")
+                continue
+            print(f"⏪ Servindo o snapshot {name} de {self.COLLECTION_NAME} no lugar de {failed or 'current'} "
+                  f"(restaure o atual ou use rollback_snapshot())")
+            # Registrado com a assinatura do ponteiro: só recarrega quando um snapshot novo for publicado
+            vector_store.fallback_from = failed
+            return vector_store
+        
+        raise SnapshotLoadError(
+            f"Nenhum snapshot de {self.COLLECTION_NAME} pôde ser carregado ({failed or 'sem ponteiro'}: {error}). "
+            f"Restaure os arquivos em {self.snapshots_dir} ou reconstrua a base (reset_index + python -m agentes.ingestion)."
+        ) from error
+    
+    def _load_with_sqlite_docstore(self, embeddings: Embeddings, mmap: bool = False,
+                                   snapshot: Optional[str] = None, directory: Optional[str] = None) -> FAISS:
+        """
+        Carrega o índice FAISS e a lista de IDs de um snapshot, ligando o docstore SQLite.
+        
+        Nenhum documento é lido na carga: o FAISS do LangChain consulta o
+        docstore por ID somente para os resultados de cada busca.
+        
+        Args:
+            embeddings: Modelo de embeddings a ser usado
+            mmap: Mapeia os vetores do arquivo em vez de lê-los (handle somente-leitura)
+            snapshot: Snapshot a carregar (o publicado como atual por padrão)
+            directory: Lê de um diretório gravado que ainda não foi publicado
+                (a cópia do save). O índice e os IDs vêm do próprio handle
+                salvo, então a configuração de embeddings não é verificada
+        """
+        flags = faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY if mmap else 0
+        # Índice e IDs de um snapshot nunca mudam; só o ponteiro é trocado. Se o
+        # snapshot lido do ponteiro for descartado antes da leitura, lê o ponteiro de novo
+        for attempt in range(5):
+            name = snapshot or (None if directory else self.current_snapshot())
+            if name is None and directory is None:
+                raise FileNotFoundError(f"Nenhum snapshot publicado para {self.COLLECTION_NAME}")
+            index_path, ids_path = self._snapshot_paths(directory) if directory else self.snapshot_files(name)
+            try:
+                index = faiss.read_index(index_path, flags)
+                with open(ids_path, "r", encoding="utf-8") as f:
+                    layout = json.load(f)
+                break
+            except (RuntimeError, FileNotFoundError):
+                if snapshot or directory or attempt == 4:
+                    raise
+                time.sleep(0.05 * (attempt + 1))
+        
+        # Formato inicial do arquivo era apenas a lista de IDs
+        if isinstance(layout, list):
+            layout = {"ids": layout}
+        ids = layout["ids"]
+        if len(ids) != index.ntotal:
+            raise ValueError(f"Índice com {index.ntotal} vetores e {len(ids)} IDs no snapshot {name}")
+        
+        embedding_info = layout.get("embedding", {**LEGACY_EMBEDDING_INFO, "dimension": int(index.d)})
+        if directory is None:
+            self.check_embedding_info(embedding_info, int(index.d))
+        
+        with warnings.catch_warnings():
+            # O LangChain avisa sobre normalize_L2 com produto interno, mas é
+            # justamente a combinação que transforma o produto interno em cosseno
+            warnings.simplefilter("ignore")
+            vector_store = FAISS(
+                embedding_function=embeddings,
+                index=index,
+                docstore=SQLiteDocstore(self.docstore_file),
+                index_to_docstore_id=dict(enumerate(ids)),
+                **self._metric_kwargs(layout.get("metric", "l2"))
+            )
+        vector_store.index_factory = layout.get("index_factory", "Flat")
+        vector_store.embedding_info = embedding_info
+        vector_store.snapshot = name
+        # Índice mapeado: alterá-lo aborta o processo; escritas usam get_writable_vector_store
+        vector_store.read_only = mmap
+        return vector_store
+    
+    def check_embedding_info(self, embedding_info: Dict[str, Any], dimension: int) -> None:
+        """
+        Rejeita índices criados com outro backend/modelo de embeddings.
+        
+        Vetores de modelos diferentes não são comparáveis (e em geral nem têm a
+        mesma dimensão), então buscar nesse índice retornaria lixo.
+        
+        Raises:
+            IndexMismatchError: Se o índice não corresponde à configuração atual
+        """
+        expected = self.embedding_info()
+        stored = {
+            "backend": embedding_info.get("backend"),
+            "model": embedding_info.get("model"),
+            "dimensions": embedding_info.get("dimensions")
+        }
+        stored_dimension = embedding_info.get("dimension", dimension)
+        
+        if stored != expected or stored_dimension != dimension:
+            describe = lambda info: f"{info['backend']}/{info['model']}" + (f" @{info['dimensions']}" if info["dimensions"] else "")
+            raise IndexMismatchError(
+                f"Índice {self.COLLECTION_NAME} criado com {describe(stored)} "
+                f"({stored_dimension} dimensões, índice com {dimension}), mas a configuração atual é "
+                f"{describe(expected)}. Reconstrua a base (reset_index + python -m agentes.ingestion "
+                f"ou python -m agentes.reindex) ou ajuste EMBEDDING_BACKEND/EMBEDDING_DIMENSIONS."
+            )
+    
+    def migrate_pickle_docstore(self, embeddings: Optional[Embeddings] = None) -> FAISS:
+        """
+        Converte um índice no formato antigo (.faiss + .pkl) para o docstore SQLite.
+        
+        O .pkl é desserializado uma última vez, os documentos são gravados no
+        SQLite e o arquivo antigo é renomeado para .pkl.migrated (backup).
+        
+        Args:
+            embeddings: Modelo de embeddings a ser usado (OpenAI por padrão)
+        
+        Returns:
+            FAISS: Vector store já usando o docstore SQLite
+        """
+        if embeddings is None:
+            embeddings = self.get_embeddings()
+        
+        print(f"🔄 Migrando docstore {os.path.basename(self.pkl_file)} para SQLite...")
+        legacy = FAISS.load_local(
+            self.FAISS_INDEX_PATH,
+            embeddings,
+            self.COLLECTION_NAME,
+            allow_dangerous_deserialization=True
+        )
+        legacy.index_factory = "Flat"
+        legacy.embedding_info = {**LEGACY_EMBEDDING_INFO, "dimension": int(legacy.index.d)}
+        self.check_embedding_info(legacy.embedding_info, int(legacy.index.d))
+        # O .pkl é a fonte de verdade: o docstore SQLite passa a ter exatamente os seus documentos
+        self._ensure_sqlite_docstore(legacy, replace=True)
+        if not self.save_vector_store(legacy):
+            raise RuntimeError("Falha ao gravar o índice migrado")
+        
+        os.replace(self.pkl_file, f"{self.pkl_file}.migrated")
+        # O índice migrado já está no snapshot; o .faiss solto fica junto do backup
+        os.replace(self.index_file, f"{self.index_file}.migrated")
+        print(f"✅ Migração concluída ({len(legacy.index_to_docstore_id)} documentos)")
+        return legacy
+    
+    def _ensure_sqlite_docstore(self, vector_store: FAISS, replace: bool = False) -> SQLiteDocstore:
+        """
+        Troca o docstore em memória (índices novos ou migrados) pelo SQLite da coleção.
+        
+        Os documentos entram como inclusões pendentes (gravadas no commit do
+        save), sem tocar nos chunks que snapshots mantidos referenciam. Só a
+        migração do .pkl substitui o conteúdo do arquivo (replace=True).
+        """
+        docstore = vector_store.docstore
+        if isinstance(docstore, SQLiteDocstore) and os.path.abspath(docstore.path) == os.path.abspath(self.docstore_file):
+            return docstore
+        
+        documents = {}
+        for doc_id in vector_store.index_to_docstore_id.values():
+            doc = docstore.search(doc_id)
+            if isinstance(doc, Document):
+                documents[doc_id] = doc
+        
+        sqlite_docstore = SQLiteDocstore(self.docstore_file)
+        if replace:
+            sqlite_docstore.replace_all(documents)
+        else:
+            sqlite_docstore.add(documents)
+        vector_store.docstore = sqlite_docstore
+        return sqlite_docstore
+    
+    @staticmethod
+    def _metric_kwargs(metric: str) -> Dict[str, Any]:
+        """Argumentos do FAISS do LangChain para a métrica configurada."""
+        if metric == "ip":
+            return {"distance_strategy": DistanceStrategy.MAX_INNER_PRODUCT, "normalize_L2": True}
+        return {"distance_strategy": DistanceStrategy.EUCLIDEAN_DISTANCE}
+    
+    @staticmethod
+    def _metric_of(vector_store: FAISS) -> str:
+        return "ip" if vector_store.distance_strategy == DistanceStrategy.MAX_INNER_PRODUCT else "l2"
+    
+    def layout_matches_config(self, vector_store: FAISS) -> bool:
+        """Indica se o índice carregado já tem o tipo e a métrica configurados."""
+        return (getattr(vector_store, "index_factory", "Flat") == self.FAISS_INDEX_FACTORY
+                and self._metric_of(vector_store) == self.FAISS_METRIC)
+    
+    @staticmethod
+    def _reconstruct_vectors(index) -> np.ndarray:
+        """Recupera os vetores armazenados (aproximados em índices quantizados)."""
+        if index.ntotal == 0:
+            return np.zeros((0, index.d), dtype="float32")
+        try:
+            # Índices IVF precisam do mapa direto para reconstruir por posição
+            faiss.extract_index_ivf(index).make_direct_map()
+        except RuntimeError:
+            pass
+        return index.reconstruct_n(0, index.ntotal)
+    
+    def build_index(self, vectors: np.ndarray, factory: str, metric: str):
+        """
+        Cria um índice FAISS pelo index_factory, treinando em uma amostra dos vetores.
+        
+        Args:
+            vectors: Vetores (n x d, float32) a indexar
+            factory: String do faiss.index_factory (ex.: "IVF1024,Flat", "HNSW32", "SQ8")
+            metric: "l2" ou "ip" (os vetores devem chegar normalizados para "ip")
+            
+        Returns:
+            faiss.Index: Índice treinado com os vetores adicionados
+        """
+        faiss_metric = faiss.METRIC_INNER_PRODUCT if metric == "ip" else faiss.METRIC_L2
+        index = faiss.index_factory(int(vectors.shape[1]), factory, faiss_metric)
+        
+        if not index.is_trained:
+            sample = vectors
+            if len(vectors) > self.FAISS_TRAIN_SAMPLE:
+                rng = np.random.default_rng(0)
+                sample = vectors[rng.choice(len(vectors), self.FAISS_TRAIN_SAMPLE, replace=False)]
+            index.train(sample)
+        
+        index.add(vectors)
+        return index
+    
+    def rebuild_index(self, vector_store: Optional[FAISS] = None, factory: Optional[str] = None,
+                      metric: Optional[str] = None, keep_positions: Optional[List[int]] = None,
+                      save: bool = True, dimensions: Optional[int] = None) -> bool:
+        """
+        Reconstrói o índice com outro tipo/métrica a partir dos vetores atuais.
+        
+        Não chama a API de embeddings: os vetores são reconstruídos do índice
+        existente. O handle é alterado no lugar e salvo.
+        
+        Args:
+            vector_store: Vector store a converter (o atual se não fornecido)
+            factory: String do index_factory (FAISS_INDEX_FACTORY por padrão)
+            metric: "l2" ou "ip" (FAISS_METRIC por padrão)
+            keep_positions: Posições a manter (None mantém todas)
+            save: Salva o índice ao final
+            dimensions: Reprojeta os vetores para menos dimensões (mantém as primeiras
+                e renormaliza, equivalente ao parâmetro dimensions da API para os
+                modelos text-embedding-3)
+            
+        Returns:
+            bool: True se o índice foi reconstruído (e salvo)
+        """
+        try:
+            if vector_store is None:
+                vector_store = self.get_writable_vector_store()
+            factory = factory or self.FAISS_INDEX_FACTORY
+            metric = metric or self.FAISS_METRIC
+            
+            source = vector_store.index
+            if getattr(source, "code_size", source.d * 4) < source.d * 4:
+                print("⚠️ O índice atual é quantizado: os vetores reconstruídos são aproximados "
+                      "(reingira com --force para usar os embeddings originais)")
+            vectors = self._reconstruct_vectors(source)
+            ids = [vector_store.index_to_docstore_id[i] for i in range(len(vector_store.index_to_docstore_id))]
+            if keep_positions is not None:
+                vectors = vectors[keep_positions]
+                ids = [ids[i] for i in keep_positions]
+            if dimensions and dimensions != vectors.shape[1]:
+                backend = (getattr(vector_store, "embedding_info", None) or self.embedding_info()).get("backend")
+                if backend != "openai":
+                    raise ValueError("A redução de dimensão só vale para os embeddings text-embedding-3 (backend openai)")
+                if dimensions > vectors.shape[1]:
+                    raise ValueError(f"Não é possível aumentar a dimensão de {vectors.shape[1]} para {dimensions}")
+                vectors = truncate_embeddings(vectors, dimensions)
+            if metric == "ip":
+                vectors = np.ascontiguousarray(vectors, dtype="float32")
+                faiss.normalize_L2(vectors)
+            
+            start = time.perf_counter()
+            try:
+                index = self.build_index(vectors, factory, metric)
+            except RuntimeError as e:
+                # Ex.: IVF/PQ com menos vetores que centróides; mantém a busca exata
+                print(f"⚠️ Não foi possível criar o índice {factory} ({e}); usando Flat")
+                factory = "Flat"
+                index = self.build_index(vectors, factory, metric)
+            
+            vector_store.index = index
+            vector_store.index_to_docstore_id = dict(enumerate(ids))
+            vector_store.index_factory = factory
+            if dimensions:
+                info = dict(getattr(vector_store, "embedding_info", None) or self.embedding_info())
+                info.update({"dimension": int(index.d), "dimensions": int(index.d)})
+                vector_store.embedding_info = info
+            vector_store.distance_strategy = self._metric_kwargs(metric)["distance_strategy"]
+            vector_store._normalize_L2 = metric == "ip"
+            
+            print(f"🏗️ Índice {factory} ({metric}) construído com {index.ntotal} vetores em {time.perf_counter() - start:.2f}s")
+            return self.save_vector_store(vector_store) if save else True
+            
+        except Exception as e:
+            print(f"❌ Erro ao reconstruir índice: {e}")
+            return False
+    
+    def remove_ids(self, vector_store: FAISS, ids: List[str]) -> int:
+        """
+        Remove chunks do índice e do docstore.
+        
+        Índices que não suportam remoção (HNSW) são reconstruídos sem os vetores
+        removidos.
+        
+        Args:
+            vector_store: Vector store a alterar
+            ids: IDs do docstore a remover (ausentes são ignorados)
+            
+        Returns:
+            int: Quantidade de chunks removidos
+        """
+        present = set(vector_store.index_to_docstore_id.values())
+        existing = [doc_id for doc_id in ids if doc_id in present]
+        if not existing:
+            return 0
+        
+        try:
+            vector_store.delete(existing)
+        except RuntimeError:
+            removed = set(existing)
+            keep = [position for position, doc_id in sorted(vector_store.index_to_docstore_id.items())
+                    if doc_id not in removed]
+            factory = getattr(vector_store, "index_factory", "Flat")
+            vectors = self._reconstruct_vectors(vector_store.index)[keep]
+            ids_kept = [vector_store.index_to_docstore_id[position] for position in keep]
+            vector_store.index = self.build_index(vectors, factory, self._metric_of(vector_store))
+            vector_store.index_to_docstore_id = dict(enumerate(ids_kept))
+            vector_store.docstore.delete(existing)
+        return len(existing)
+    
+    def _search_params(self, index, nprobe: Optional[int] = None, ef_search: Optional[int] = None, selector=None):
+        """Parâmetros de busca por consulta (não alteram o índice compartilhado)."""
+        if isinstance(index, faiss.IndexHNSW):
+            return faiss.SearchParametersHNSW(efSearch=ef_search or self.FAISS_EF_SEARCH, sel=selector)
+        try:
+            faiss.extract_index_ivf(index)
+        except RuntimeError:
+            return faiss.SearchParameters(sel=selector) if selector is not None else None
+        return faiss.SearchParametersIVF(nprobe=nprobe or self.FAISS_NPROBE, sel=selector)
+    
+    def _derived(self, vector_store: FAISS) -> Tuple[BM25Index, CategoryPartitions]:
+        """
+        Índice BM25 e partições por categoria, construídos juntos no primeiro uso.
+        
+        Ficam presos ao handle: cada publicação ou recarga cria um handle novo,
+        e quem o registra monta os dele antes da troca, então as buscas nunca
+        veem um handle novo com os índices do anterior. Só a cópia gravável
+        muda no lugar; para ela o cache vale enquanto o índice não muda.
+        """
+        index_to_id = vector_store.index_to_docstore_id
+        state = (vector_store.index.ntotal, index_to_id.get(len(index_to_id) - 1))
+        
+        cached = _derived_indexes.get(vector_store)
+        if cached is not None and cached[0] == state:
+            return cached[1], cached[2]
+        
+        with _derived_lock:
+            cached = _derived_indexes.get(vector_store)
+            if cached is not None and cached[0] == state:
+                return cached[1], cached[2]
+            
+            start = time.perf_counter()
+            positions = {doc_id: position for position, doc_id in vector_store.index_to_docstore_id.items()}
+            partitions = CategoryPartitions()
+            
+            def documents():
+                for doc_id, doc in self.iter_documents(vector_store):
+                    partitions.add(self.category_of(doc), positions[doc_id], doc_id)
+                    yield doc_id, doc.page_content
+            
+            lexical = BM25Index.build(documents())
+            _derived_indexes[vector_store] = (state, lexical, partitions)
+            print(f"🔤 Índice lexical e partições construídos com {len(lexical)} chunks em {time.perf_counter() - start:.2f}s "
+                  f"({', '.join(f'{c}: {n}' for c, n in partitions.sizes().items())})")
+            return lexical, partitions
+    
+    @staticmethod
+    def category_of(doc: Document) -> str:
+        """Categoria de um chunk (metadado "category")."""
+        return doc.metadata.get("category", doc.metadata.get("categoria", "sem_categoria"))
+    
+    def get_lexical_index(self, vector_store: Optional[FAISS] = None) -> BM25Index:
+        """
+        Índice BM25 sobre os mesmos chunks do FAISS, construído no primeiro uso.
+        
+        Args:
+            vector_store: Vector store já carregado (o atual se não fornecido)
+            
+        Returns:
+            BM25Index: Índice lexical dos chunks
+        """
+        if vector_store is None:
+            vector_store = self.get_vector_store()
+        return self._derived(vector_store)[0]
+    
+    def get_partitions(self, vector_store: Optional[FAISS] = None) -> CategoryPartitions:
+        """
+        Partições do índice por categoria, construídas no primeiro uso.
+        
+        Args:
+            vector_store: Vector store já carregado (o atual se não fornecido)
+            
+        Returns:
+            CategoryPartitions: Posições e IDs dos chunks de cada categoria
+        """
+        if vector_store is None:
+            vector_store = self.get_vector_store()
+        return self._derived(vector_store)[1]
+    
+    def get_documents(self, vector_store: FAISS, ids: List[str]) -> Dict[str, Document]:
+        """Busca chunks por ID no docstore (uma consulta para o SQLite)."""
+        docstore = vector_store.docstore
+        if isinstance(docstore, SQLiteDocstore):
+            return docstore.mget(ids)
+        found = {doc_id: docstore.search(doc_id) for doc_id in ids}
+        return {doc_id: doc for doc_id, doc in found.items() if isinstance(doc, Document)}
+    
+    def search_ids_with_distance(self, query: str, k: int = 5, vector_store: Optional[FAISS] = None,
+                                 nprobe: Optional[int] = None, ef_search: Optional[int] = None,
+                                 categories: Optional[Iterable[str]] = None) -> List[Tuple[str, float]]:
+        """
+        Busca vetorial que retorna apenas IDs e distâncias (sem ler o docstore).
+        
+        A distância retornada está sempre na escala L2 ao quadrado (menor = mais
+        similar), também para índices de produto interno (2 - 2·cosseno), para
+        que os limiares de score continuem valendo ao trocar a métrica.
+        
+        Args:
+            query: Texto de busca
+            k: Número de resultados
+            vector_store: Vector store já carregado (o atual se não fornecido)
+            nprobe: Listas visitadas em índices IVF (FAISS_NPROBE por padrão)
+            ef_search: Tamanho da busca em índices HNSW (FAISS_EF_SEARCH por padrão)
+            categories: Busca apenas nos chunks destas categorias (None = índice inteiro)
+            
+        Returns:
+            List[Tuple[str, float]]: (id do chunk, distância), do mais próximo ao mais distante
+        """
+        if vector_store is None:
+            vector_store = self.get_vector_store()
+        
+        selector = None
+        if categories is not None:
+            selector, _ = self.get_partitions(vector_store).select(categories)
+            if selector is None:
+                return []
+        
+        vector = np.array([vector_store._embed_query(query)], dtype="float32")
+        if vector_store._normalize_L2:
+            faiss.normalize_L2(vector)
+        
+        params = self._search_params(vector_store.index, nprobe, ef_search, selector)
+        scores, positions = vector_store.index.search(vector, k, params=params)
+        
+        is_ip = self._metric_of(vector_store) == "ip"
+        return [
+            (vector_store.index_to_docstore_id[int(position)],
+             max(0.0, 2.0 - 2.0 * float(score)) if is_ip else float(score))
+            for position, score in zip(positions[0], scores[0]) if position != -1
+        ]
+    
+    def search_with_distance(self, query: str, k: int = 5, vector_store: Optional[FAISS] = None,
+                             nprobe: Optional[int] = None, ef_search: Optional[int] = None,
+                             categories: Optional[Iterable[str]] = None) -> List[Tuple[Document, float]]:
+        """
+        Busca os k chunks mais próximos da consulta.
+        
+        Args:
+            query: Texto de busca
+            k: Número de resultados
+            vector_store: Vector store já carregado (o atual se não fornecido)
+            nprobe: Listas visitadas em índices IVF (FAISS_NPROBE por padrão)
+            ef_search: Tamanho da busca em índices HNSW (FAISS_EF_SEARCH por padrão)
+            categories: Busca apenas nos chunks destas categorias (None = índice inteiro)
+            
+        Returns:
+            List[Tuple[Document, float]]: (documento, distância na escala L2 ao quadrado)
+        """
+        if vector_store is None:
+            vector_store = self.get_vector_store()
+        
+        hits = self.search_ids_with_distance(query, k, vector_store, nprobe, ef_search, categories)
+        documents = self.get_documents(vector_store, [doc_id for doc_id, _ in hits])
+        return [(documents[doc_id], distance) for doc_id, distance in hits if doc_id in documents]
+    
     def save_vector_store(self, vector_store: FAISS) -> bool:
         """
-        Salva o vector store no disco.
+        Salva o vector store no disco como um novo snapshot.
+        
+        O índice e os IDs são gravados em um diretório novo e publicados pela
+        troca atômica do ponteiro "current": leitores nunca veem um par escrito
+        pela metade, e os servidores em outros processos passam para o snapshot
+        novo sem reiniciar. Os FAISS_SNAPSHOT_RETAIN snapshots mais recentes
+        ficam em disco para rollback.
+        
+        A publicação é serializada entre processos (publish_lock); se outro
+        processo publicou depois da base da cópia gravável, as alterações dele
+        são trazidas para a cópia antes de gravar, em vez de sobrescritas.
         
         Args:
             vector_store: Vector store a ser salvo
@@ -96,13 +1327,60 @@ class VectorDBConfig:
             bool: True se salvou com sucesso
         """
         try:
-            vector_store.save_local(self.FAISS_INDEX_PATH, self.COLLECTION_NAME)
-            print(f"✅ Índice salvo em: {self.FAISS_INDEX_PATH}")
-            return True
+            with self.publish_lock():
+                return self._write_snapshot(vector_store)
         except Exception as e:
             print(f"❌ Erro ao salvar índice: {e}")
             return False
     
+    def _write_snapshot(self, vector_store: FAISS) -> bool:
+        """Grava e publica o snapshot do handle gravável (com publish_lock)."""
+        self._merge_published(vector_store)
+        
+        os.makedirs(self.snapshots_dir, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(prefix=".save-", dir=self.snapshots_dir)
+        try:
+            docstore = self._ensure_sqlite_docstore(vector_store)
+            
+            ids = [vector_store.index_to_docstore_id[i] for i in range(len(vector_store.index_to_docstore_id))]
+            tmp_index, tmp_ids = self._snapshot_paths(tmp_dir)
+            faiss.write_index(vector_store.index, tmp_index)
+            with open(tmp_ids, "w", encoding="utf-8") as f:
+                json.dump({
+                    "index_factory": getattr(vector_store, "index_factory", "Flat"),
+                    "metric": self._metric_of(vector_store),
+                    "embedding": getattr(vector_store, "embedding_info", None) or {
+                        **self.embedding_info(), "dimension": int(vector_store.index.d)
+                    },
+                    "created_at": datetime.now().isoformat(),
+                    "ids": ids
+                }, f)
+            
+            # As buscas passam para uma cópia do estado salvo (mapeada do diretório
+            # gravado com mmap, clonada em memória sem). Feita antes de publicar:
+            # se falhar, nada é publicado. O handle salvo continua sendo a cópia gravável
+            published = self._copy_vector_store(vector_store, mmap=self.FAISS_MMAP, directory=tmp_dir)
+            
+            # Chunks novos entram antes do snapshot que os referencia
+            docstore.commit(apply_deletes=False)
+            snapshot = self._publish_snapshot(tmp_dir)
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        
+        # Os removidos só saem do disco quando nenhum snapshot mantido aponta para eles
+        referenced, discarded = self._prune_snapshots(snapshot, ids)
+        docstore.prune(referenced, candidates=discarded)
+        
+        vector_store.snapshot = published.snapshot = snapshot
+        vector_store.base_ids = frozenset(ids)
+        # As buscas seguem no handle anterior (com o BM25 e as partições dele) até a troca
+        self._derived(published)
+        index_registry.put(self.registry_key, published, snapshot)
+        index_registry.set_writable(self.registry_key, vector_store)
+        print(f"✅ Índice salvo em: {self.FAISS_INDEX_PATH} (snapshot {snapshot})")
+        return True
+    
     def add_documents(self, documents: List[Document], vector_store: Optional[FAISS] = None) -> bool:
         """
         Adiciona documentos ao vector store.
@@ -115,14 +1393,15 @@ class VectorDBConfig:
             bool: True se adicionou com sucesso
         """
         try:
-            if vector_store is None:
-                vector_store = self.get_vector_store()
-            
-            # Adiciona documentos
-            vector_store.add_documents(documents)
-            
-            # Salva alterações
-            self.save_vector_store(vector_store)
+            with self.write_lock():
+                if vector_store is None:
+                    vector_store = self.get_writable_vector_store()
+                
+                # Adiciona documentos
+                vector_store.add_documents(documents)
+                
+                # Salva alterações
+                self.save_vector_store(vector_store)
             
             print(f"✅ {len(documents)} documentos adicionados com sucesso")
             return True
@@ -143,13 +1422,14 @@ class VectorDBConfig:
             bool: True se adicionou com sucesso
         """
         try:
-            vector_store = self.get_vector_store()
-            
-            # Adiciona textos
-            vector_store.add_texts(texts, metadatas=metadatas)
-            
-            # Salva alterações
-            self.save_vector_store(vector_store)
+            with self.write_lock():
+                vector_store = self.get_writable_vector_store()
+                
+                # Adiciona textos
+                vector_store.add_texts(texts, metadatas=metadatas)
+                
+                # Salva alterações
+                self.save_vector_store(vector_store)
             
             print(f"✅ {len(texts)} textos adicionados com sucesso")
             return True
@@ -170,9 +1450,7 @@ class VectorDBConfig:
             List[Document]: Lista de documentos encontrados
         """
         try:
-            vector_store = self.get_vector_store()
-            results = vector_store.similarity_search(query, k=k)
-            return results
+            return [doc for doc, _ in self.search_with_distance(query, k=k)]
         except Exception as e:
             print(f"❌ Erro na busca: {e}")
             return []
@@ -189,31 +1467,112 @@ class VectorDBConfig:
             List[tuple]: Lista de tuplas (documento, score)
         """
         try:
-            vector_store = self.get_vector_store()
-            results = vector_store.similarity_search_with_score(query, k=k)
-            return results
+            return self.search_with_distance(query, k=k)
         except Exception as e:
             print(f"❌ Erro na busca com score: {e}")
             return []
     
-    def get_index_stats(self) -> Dict[str, Any]:
+    def find_metadata(self, key: str, vector_store: Optional[FAISS] = None) -> Dict[str, Dict]:
+        """
+        Metadados dos chunks do índice que têm a chave informada.
+        
+        Com o docstore SQLite a busca é feita no próprio SQLite, sem ler os
+        demais documentos; linhas mantidas só para snapshots anteriores são
+        ignoradas.
+        
+        Args:
+            key: Chave de metadados (ex.: "protocol_type")
+            vector_store: Vector store já carregado (carrega do disco se não fornecido)
+            
+        Returns:
+            Dict[str, Dict]: Metadados por ID do docstore
+        """
+        if vector_store is None:
+            vector_store = self.get_vector_store()
+        
+        if isinstance(vector_store.docstore, SQLiteDocstore):
+            found = vector_store.docstore.find_metadata(key)
+            indexed = set(vector_store.index_to_docstore_id.values())
+            return {doc_id: metadata for doc_id, metadata in found.items() if doc_id in indexed}
+        
+        return {doc_id: doc.metadata for doc_id, doc in self.iter_documents(vector_store) if key in doc.metadata}
+    
+    def iter_documents(self, vector_store: Optional[FAISS] = None) -> Iterator[Tuple[str, Document]]:
+        """
+        Percorre os documentos (chunks) do vector store na ordem do índice.
+        
+        Args:
+            vector_store: Vector store já carregado (carrega do disco se não fornecido)
+            
+        Yields:
+            Tuple[str, Document]: (id no docstore, documento)
+        """
+        if vector_store is None:
+            vector_store = self.get_vector_store()
+        
+        ids = [vector_store.index_to_docstore_id[position] for position in sorted(vector_store.index_to_docstore_id)]
+        
+        # Docstore SQLite: busca em lotes, sem materializar todos os documentos
+        if isinstance(vector_store.docstore, SQLiteDocstore):
+            yield from vector_store.docstore.iter_documents(ids)
+            return
+        
+        for doc_id in ids:
+            doc = vector_store.docstore.search(doc_id)
+            if isinstance(doc, Document):
+                yield doc_id, doc
+    
+    @staticmethod
+    def _index_memory_bytes(index) -> int:
+        """
+        Estima a memória ocupada pelos vetores do índice FAISS.
+        
+        Índices baseados em códigos (Flat, SQ, PQ) expõem code_size por vetor;
+        para os demais, usa o tamanho serializado como aproximação.
+        """
+        code_size = getattr(index, "code_size", None)
+        if code_size:
+            return int(index.ntotal * code_size)
+        return int(faiss.serialize_index(index).nbytes)
+    
+    def get_index_stats(self, vector_store: Optional[FAISS] = None) -> Dict[str, Any]:
         """
         Retorna estatísticas do índice.
         
+        Os números (ntotal, dimensão, memória, chunks por categoria) são lidos do
+        índice carregado, não inferidos dos arquivos.
+        
+        Args:
+            vector_store: Vector store já carregado (carrega do disco se não fornecido)
+        
         Returns:
             Dict: Estatísticas do índice
         """
         try:
-            vector_store = self.get_vector_store()
+            if vector_store is None:
+                vector_store = self.get_vector_store()
+            index = vector_store.index
+            
+            # Chunks por categoria (partições da busca filtrada)
+            categories = self.get_partitions(vector_store).sizes()
             
-            # FAISS não tem método direto para contagem, mas podemos inferir
             stats = {
-                "index_file_exists": os.path.exists(self.index_file),
-                "pkl_file_exists": os.path.exists(self.pkl_file),
+                "ntotal": int(index.ntotal),
+                "dimension": int(index.d),
+                "index_type": type(index).__name__,
+                "embedding": getattr(vector_store, "embedding_info", None),
+                "memory_bytes": self._index_memory_bytes(index),
+                "docstore_documents": len(vector_store.index_to_docstore_id),
+                "categories": dict(categories),
+                "registry": index_registry.describe(self.registry_key),
+                "snapshot": getattr(vector_store, "snapshot", None),
+                "snapshots": len(self._snapshot_names()),
+                "docstore_file_exists": os.path.exists(self.docstore_file),
+                "docstore_type": type(vector_store.docstore).__name__,
                 "index_path": self.FAISS_INDEX_PATH,
                 "collection_name": self.COLLECTION_NAME,
-                "index_file_size": os.path.getsize(self.index_file) if os.path.exists(self.index_file) else 0,
-                "pkl_file_size": os.path.getsize(self.pkl_file) if os.path.exists(self.pkl_file) else 0
+                "index_file_size": self._snapshot_index_size(getattr(vector_store, "snapshot", None)),
+                "docstore_file_size": os.path.getsize(self.docstore_file) if os.path.exists(self.docstore_file) else 0
             }
             
             return stats
@@ -222,6 +1581,79 @@ class VectorDBConfig:
             print(f"❌ Erro ao obter estatísticas: {e}")
             return {}
     
+    def referenced_ids(self) -> Set[str]:
+        """IDs de chunks referenciados por algum snapshot mantido em disco."""
+        referenced: Set[str] = set()
+        for name in self._snapshot_names():
+            try:
+                referenced.update(self._snapshot_ids(name))
+            except (OSError, ValueError, KeyError):
+                continue
+        return referenced
+    
+    def drop_snapshot_history(self) -> int:
+        """
+        Descarta todos os snapshots exceto o atual (o rollback deixa de ser possível).
+        
+        Depois disso, o docstore só precisa das linhas do snapshot atual e as
+        demais podem ser removidas (ver agentes.compact --drop-history).
+        
+        Returns:
+            int: Quantidade de snapshots descartados
+        """
+        with self.publish_lock():
+            current = self.current_snapshot()
+            if not current:
+                return 0
+            before = len(self._snapshot_names())
+            self._prune_snapshots(current, self._snapshot_ids(current), retain=1)
+            return before - len(self._snapshot_names())
+    
+    def _snapshot_index_size(self, snapshot: Optional[str]) -> int:
+        index_path, _ = self.snapshot_files(snapshot) if snapshot else (None, None)
+        return os.path.getsize(index_path) if index_path and os.path.exists(index_path) else 0
+    
+    def rollback_snapshot(self, snapshot: Optional[str] = None) -> bool:
+        """
+        Volta a coleção para um snapshot mantido em disco.
+        
+        Só o ponteiro "current" muda: este processo troca o handle na hora e os
+        demais servidores recarregam na próxima verificação do ponteiro.
+        
+        Args:
+            snapshot: Snapshot de destino (o anterior ao atual por padrão)
+            
+        Returns:
+            bool: True se o snapshot foi publicado como atual
+        """
+        try:
+            # Escolha, carga e troca do ponteiro sem que outro processo publique ou descarte snapshots
+            with self.publish_lock():
+                names = self._snapshot_names()
+                current = self.current_snapshot()
+                if snapshot is None:
+                    older = [name for name in names if current is None or name < current]
+                    if not older:
+                        print("⚠️ Nenhum snapshot anterior ao atual para rollback")
+                        return False
+                    snapshot = older[-1]
+                elif snapshot not in names:
+                    print(f"❌ Snapshot {snapshot} não encontrado (disponíveis: {', '.join(names) or 'nenhum'})")
+                    return False
+                
+                embeddings = self.get_embeddings()
+                # Carrega antes de publicar: um snapshot ilegível não vira o atual
+                vector_store = self._load_with_sqlite_docstore(embeddings, mmap=self.FAISS_MMAP, snapshot=snapshot)
+                self._derived(vector_store)
+                self._point_current_to(snapshot)
+                index_registry.put(self.registry_key, vector_store, snapshot)
+            print(f"⏪ Coleção {self.COLLECTION_NAME}: snapshot {current} -> {snapshot}")
+            return True
+            
+        except Exception as e:
+            print(f"❌ Erro no rollback do índice: {e}")
+            return False
+    
     def reset_index(self) -> bool:
         """
         Reseta o índice, removendo todos os documentos.
@@ -230,11 +1662,20 @@ class VectorDBConfig:
             bool: True se resetou com sucesso
         """
         try:
-            # Remove arquivos do índice
-            if os.path.exists(self.index_file):
-                os.remove(self.index_file)
-            if os.path.exists(self.pkl_file):
-                os.remove(self.pkl_file)
+            with self.publish_lock():
+                # Fecha o docstore do handle atual antes de apagar o arquivo
+                current = index_registry.get(self.registry_key, self.current_snapshot)
+                if current is not None and isinstance(current.docstore, SQLiteDocstore):
+                    current.docstore.close()
+                index_registry.invalidate(self.registry_key)
+                
+                # Remove arquivos do índice (o ponteiro primeiro: nenhum leitor encontra snapshot apagado).
+                # O arquivo de lock fica: outros processos podem estar esperando nele
+                for path in (self.current_file, self.index_file, self.ids_file, self.pkl_file, self.docstore_file,
+                             f"{self.docstore_file}-wal", f"{self.docstore_file}-shm"):
+                    if os.path.exists(path):
+                        os.remove(path)
+                shutil.rmtree(self.snapshots_dir, ignore_errors=True)
             
             print("✅ Índice resetado com sucesso")
             return True
@@ -298,32 +1739,24 @@ class VectorDBConfig:
         """
         try:
             # Dados de teste
-            test_texts = [
-                "Emergência médica: paciente com dor no peito aguda",
-                "Incêndio em residência: bombeiros necessários urgentemente",
-                "Acidente de trânsito: feridos graves na rodovia",
-                "Assalto em andamento: suspeito armado"
-            ]
-            
-            test_metadatas = [
-                {"categoria": "medica", "prioridade": "alta"},
-                {"categoria": "incendio", "prioridade": "alta"},
-                {"categoria": "transito", "prioridade": "media"},
-                {"categoria": "criminal", "prioridade": "alta"}
-            ]
-            
-            # Obtém o vector store
-            vector_store = self.get_vector_store()
-            
-            # Testa inserção
-            print("🔄 Testando inserção de textos...")
-            vector_store.add_texts(texts=test_texts, metadatas=test_metadatas)
-            self.save_vector_store(vector_store)
-            print("✅ Textos inseridos com sucesso!")
+            test_texts = [text for text, _ in TEST_DOCUMENTS]
+            test_metadatas = [dict(metadata) for _, metadata in TEST_DOCUMENTS]
             
-            # Testa busca
-            print("🔄 Testando busca de documentos...")
-            results = vector_store.similarity_search(query="dor no peito", k=2)
+            with self.write_lock():
+                # Obtém o vector store
+                vector_store = self.get_writable_vector_store()
+                
+                # Testa inserção
+                print("🔄 Testando inserção de textos...")
+                test_ids = vector_store.add_texts(texts=test_texts, metadatas=test_metadatas)
+                print("✅ Textos inseridos com sucesso!")
+                
+                # Testa busca
+                print("🔄 Testando busca de documentos...")
+                results = vector_store.similarity_search(query="dor no peito", k=2)
+                
+                # Os textos de teste não ficam na coleção real
+                self.remove_ids(vector_store, test_ids)
             
             if results and len(results) > 0:
                 print(f"✅ Busca funcionando! Encontrados {len(results)} documentos")
@@ -11,6 +11,15 @@ from contextlib import asynccontextmanager
 # Carregar variáveis de ambiente
 load_dotenv()
 
+
+def available_cpus() -> int:
+    """CPUs que o processo pode usar (afinidade/cpuset do container), não as do host"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
 class APIConfig:
     """Configurações da API"""
     
@@ -32,8 +41,17 @@ class APIConfig:
     # Configurações do servidor
     HOST: str = os.getenv("HOST", "0.0.0.0")
     PORT: int = int(os.getenv("PORT", "8000"))
-    RELOAD: bool = os.getenv("RELOAD", "true").lower() == "true"
+    # development: um processo com reload | production: vários workers pré-carregados (pre-fork)
+    RUN_MODE: str = os.getenv("RUN_MODE", "development").lower()
+    RELOAD: bool = os.getenv("RELOAD", "true" if RUN_MODE == "development" else "false").lower() == "true"
+    # Cada worker tem seus clientes OpenAI e classificadores: padrão pelas CPUs disponíveis, até 4
+    WORKERS: int = int(os.getenv("WORKERS", str(min(available_cpus(), 4))))
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "info")
+    # Tempo máximo (segundos) para concluir classificações em andamento no encerramento
+    GRACEFUL_SHUTDOWN_TIMEOUT: int = int(os.getenv("GRACEFUL_SHUTDOWN_TIMEOUT", "30"))
+    
+    # Warm-up dos classificadores: background (padrão), blocking ou lazy (na primeira requisição)
+    WARMUP_MODE: str = os.getenv("WARMUP_MODE", "background").lower()
     
     @classmethod
     def get_database_url(cls) -> str:
@@ -61,11 +79,15 @@ class APIConfig:
     @classmethod
     def get_server_config(cls) -> dict:
         """Retorna configuração do servidor"""
+        production = cls.RUN_MODE == "production"
         return {
             "host": cls.HOST,
             "port": cls.PORT,
-            "reload": cls.RELOAD,
-            "log_level": cls.LOG_LEVEL
+            "run_mode": cls.RUN_MODE,
+            "reload": cls.RELOAD and not production,
+            "workers": max(1, cls.WORKERS) if production else 1,
+            "log_level": cls.LOG_LEVEL,
+            "graceful_shutdown_timeout": cls.GRACEFUL_SHUTDOWN_TIMEOUT
         }
 
 
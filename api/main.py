@@ -26,6 +26,8 @@ def main():
     print("🚀 Iniciando servidor para o on caller...")
     print(f"📍 Host: {config['host']}")
     print(f"🔌 Porta: {config['port']}")
+    print(f"🏭 Modo: {config['run_mode']}")
+    print(f"👷 Workers: {config['workers']}")
     print(f"🔄 Reload: {config['reload']}")
     print(f"📝 Log Level: {config['log_level']}")
     print("=" * 50)
@@ -36,12 +38,18 @@ def main():
     except Exception as e:
         print(f"❌ Erro na configuração inicial: {e}")
     
+    if config["run_mode"] == "production":
+        from .prefork import serve_prefork
+        serve_prefork(config)
+        return
+    
     uvicorn.run(
         "api.server:app",
         host=config["host"],
         port=config["port"],
         reload=config["reload"],
-        log_level=config["log_level"]
+        log_level=config["log_level"],
+        timeout_graceful_shutdown=config["graceful_shutdown_timeout"]
     )
 
 if __name__ == "__main__":
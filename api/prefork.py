@@ -0,0 +1,167 @@
+"""
+Modo de produção: vários workers uvicorn criados por fork após o pré-carregamento
+
+O processo mestre abre o socket, importa a aplicação e carrega o estado
+somente-leitura (índice FAISS) uma única vez. Em seguida cria os workers com
+os.fork(), de modo que todos compartilham essas páginas de memória por
+copy-on-write em vez de cada um ler o índice do disco. O `workers=N` do
+uvicorn não serve aqui porque ele inicia os workers com spawn (processos novos).
+
+No encerramento (SIGTERM/SIGINT) o mestre repassa o sinal aos workers, que
+param de aceitar conexões e concluem as classificações em andamento dentro de
+GRACEFUL_SHUTDOWN_TIMEOUT antes de sair.
+"""
+
+import gc
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+from typing import Dict, Any
+
+import uvicorn
+
+from .runtime import runtime
+
+logger = logging.getLogger(__name__)
+
+# Intervalo mínimo entre reinícios de um worker que caiu, evita loop de falhas
+RESPAWN_BACKOFF_SECONDS = 1.0
+
+
+def _has_module(name: str) -> bool:
+    try:
+        __import__(name)
+        return True
+    except ImportError:
+        return False
+
+
+def build_uvicorn_config(config: Dict[str, Any]) -> uvicorn.Config:
+    """Configuração do uvicorn para produção (uvloop/httptools quando disponíveis)"""
+    return uvicorn.Config(
+        "api.server:app",
+        host=config["host"],
+        port=config["port"],
+        log_level=config["log_level"],
+        loop="uvloop" if _has_module("uvloop") else "auto",
+        http="httptools" if _has_module("httptools") else "auto",
+        timeout_graceful_shutdown=config["graceful_shutdown_timeout"],
+        proxy_headers=True,
+        reload=False,
+        workers=1
+    )
+
+
+def _run_worker(uvicorn_config: uvicorn.Config, sock) -> None:
+    """Executa um worker uvicorn sobre o socket herdado do mestre"""
+    # Sinais herdados do mestre: o uvicorn instala os próprios handlers em Server.run
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+    runtime.created_at = time.time()
+    server = uvicorn.Server(uvicorn_config)
+    server.run(sockets=[sock])
+
+
+def serve_prefork(config: Dict[str, Any]) -> None:
+    """
+    Sobe o servidor com `config["workers"]` processos pré-carregados.
+
+    Args:
+        config: Configuração retornada por APIConfig.get_server_config()
+    """
+    if not hasattr(os, "fork"):
+        # Sem fork (Windows): workers independentes do uvicorn, sem compartilhamento
+        logger.warning("os.fork indisponível; usando workers do uvicorn sem pré-carregamento")
+        uvicorn.run("api.server:app", host=config["host"], port=config["port"],
+                    workers=config["workers"], log_level=config["log_level"],
+                    timeout_graceful_shutdown=config["graceful_shutdown_timeout"])
+        return
+
+    uvicorn_config = build_uvicorn_config(config)
+    sock = uvicorn_config.bind_socket()
+
+    # Importa a aplicação e carrega o estado compartilhado uma única vez
+    uvicorn_config.load()
+    try:
+        runtime.preload()
+    except Exception as e:
+        # Os workers ainda podem carregar o índice individualmente no warm-up
+        logger.error(f"Falha no pré-carregamento, workers carregarão o índice individualmente: {e}")
+
+    # Objetos criados até aqui não mudam mais: tirá-los do GC evita que a
+    # coleta toque nas páginas compartilhadas e force cópias nos workers
+    gc.collect()
+    gc.freeze()
+
+    workers: Dict[int, float] = {}
+    stopping = threading.Event()
+
+    def spawn() -> None:
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 0
+            try:
+                _run_worker(uvicorn_config, sock)
+            except BaseException as e:
+                logger.error(f"Worker {os.getpid()} encerrado com erro: {e}")
+                exit_code = 1
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(exit_code)
+        workers[pid] = time.monotonic()
+        logger.info(f"Worker {pid} iniciado")
+
+    def kill_remaining() -> None:
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGKILL)
+                logger.warning(f"Worker {pid} não encerrou a tempo e foi finalizado")
+            except ProcessLookupError:
+                pass
+
+    def handle_stop(signum, frame) -> None:
+        if stopping.is_set():
+            return
+        stopping.set()
+        logger.info(f"Encerrando {len(workers)} workers (aguardando classificações em andamento)...")
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        # Rede de segurança: o uvicorn já respeita timeout_graceful_shutdown
+        timer = threading.Timer(config["graceful_shutdown_timeout"] + 5, kill_remaining)
+        timer.daemon = True
+        timer.start()
+
+    signal.signal(signal.SIGTERM, handle_stop)
+    signal.signal(signal.SIGINT, handle_stop)
+
+    print(f"👷 Iniciando {config['workers']} workers (pre-fork, loop={uvicorn_config.loop}, http={uvicorn_config.http})")
+    for _ in range(config["workers"]):
+        spawn()
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+
+        started_at = workers.pop(pid, None)
+        if started_at is None:
+            continue
+
+        if not stopping.is_set():
+            logger.error(f"Worker {pid} saiu inesperadamente (status {status}); reiniciando")
+            elapsed = time.monotonic() - started_at
+            if elapsed < RESPAWN_BACKOFF_SECONDS:
+                time.sleep(RESPAWN_BACKOFF_SECONDS - elapsed)
+            spawn()
+
+    sock.close()
+    print("✅ Todos os workers foram encerrados")
@@ -0,0 +1,214 @@
+"""
+Estado de execução do servidor: inicialização preguiçosa dos classificadores
+
+Construir os classificadores carrega o índice FAISS do disco e pode popular a
+base de conhecimento (chamadas de embeddings na rede). Isso não deve acontecer
+na importação de api.server, senão cada worker/reload demora segundos para
+começar a escutar e falha quando a OpenAI está inacessível. Aqui essa etapa
+vira um warm-up explícito, executado em segundo plano pelo lifespan do FastAPI
+ou sob demanda na primeira classificação.
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+from .config import APIConfig
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceUnavailableError(RuntimeError):
+    """Classificadores indisponíveis ou servidor em encerramento (respondido com 503)"""
+
+
+class ServiceRuntime:
+    """Guarda os classificadores e o estado de prontidão do servidor"""
+
+    STARTING = "starting"
+    WARMING = "warming"
+    READY = "ready"
+    FAILED = "failed"
+    DRAINING = "draining"
+
+    def __init__(self):
+        self.state = self.STARTING
+        self.error: Optional[str] = None
+        self.emergency_classifier = None
+        self.urgency_classifier = None
+        self.warm_up_seconds: Optional[float] = None
+        self.created_at = time.time()
+        self.ready_at: Optional[float] = None
+        self.shared_rag_service = None
+        self.knowledge_base_ready = False
+        self._openai_client = None
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._inflight = 0
+        self._inflight_done = threading.Condition()
+
+    @property
+    def is_ready(self) -> bool:
+        return self.state == self.READY
+
+    @property
+    def openai_client(self):
+        """Cliente OpenAI criado no primeiro uso (não faz chamadas de rede)"""
+        if self._openai_client is None:
+            from openai import OpenAI
+            self._openai_client = OpenAI(api_key=APIConfig.OPENAI_API_KEY)
+        return self._openai_client
+
+    def preload(self) -> None:
+        """
+        Carrega o estado somente-leitura (índice FAISS, BM25 e dados de saúde) antes do fork dos workers.
+
+        Os workers herdam as páginas do índice por copy-on-write e só constroem
+        os clientes OpenAI depois do fork. Os protocolos iniciais são verificados
+        aqui, uma única vez: só há chamadas de embeddings quando eles faltam ou
+        mudaram, e os workers não repetem a verificação.
+        """
+        from agentes.rag_service import RAGService
+        from agentes.saude_data import get_saude_data
+
+        start = time.perf_counter()
+        self.shared_rag_service = RAGService()
+        self.knowledge_base_ready = self.shared_rag_service.populate_initial_knowledge_base()
+        # BM25 e partições por categoria também são herdados: sem isso cada worker os monta na 1ª busca
+        self.shared_rag_service.db_config.get_lexical_index()
+        get_saude_data()
+        logger.info(f"Estado compartilhado pré-carregado em {time.perf_counter() - start:.2f}s")
+
+    def _set_state(self, state: str) -> bool:
+        """Muda o estado, exceto durante o encerramento (DRAINING é definitivo)"""
+        with self._inflight_done:
+            if self.state == self.DRAINING:
+                return False
+            self.state = state
+            return True
+
+    def warm_up(self) -> bool:
+        """
+        Constrói os classificadores e carrega o índice vetorial.
+
+        Idempotente e seguro entre threads: chamadas concorrentes esperam a
+        primeira terminar. Após uma falha, uma nova chamada tenta novamente.
+        Durante o encerramento o warm-up é recusado e não tira o servidor do
+        estado DRAINING.
+
+        Returns:
+            bool: True se o servidor ficou pronto
+        """
+        with self._lock:
+            if self.state == self.READY:
+                return True
+
+            if not self._set_state(self.WARMING):
+                return False
+            self.error = None
+            start = time.perf_counter()
+
+            try:
+                # Importações tardias: mantêm a importação de api.server leve
+                from agentes.emergency_classifier import EmergencyClassifierAgent
+                from agentes.urgency_classifier import UrgencyClassifier
+                from agentes.context_packer import get_encoding
+
+                self.emergency_classifier = EmergencyClassifierAgent()
+                self.urgency_classifier = UrgencyClassifier(
+                    rag_service=self.shared_rag_service,
+                    ensure_knowledge_base=not self.knowledge_base_ready
+                )
+                # Codificação do tiktoken usada para contar os tokens do contexto
+                get_encoding()
+
+                self.warm_up_seconds = time.perf_counter() - start
+                if not self._set_state(self.READY):
+                    return False
+                self.ready_at = time.time()
+                logger.info(f"Classificadores prontos em {self.warm_up_seconds:.2f}s")
+                return True
+
+            except Exception as e:
+                self.warm_up_seconds = time.perf_counter() - start
+                self._set_state(self.FAILED)
+                self.error = str(e)
+                logger.error(f"Erro no warm-up dos classificadores: {e}")
+                return False
+
+    def start_background_warm_up(self) -> None:
+        """Dispara o warm-up em uma thread para não atrasar o início do servidor"""
+        if self.is_ready or (self._thread and self._thread.is_alive()):
+            return
+
+        self._thread = threading.Thread(target=self.warm_up, name="warm-up", daemon=True)
+        self._thread.start()
+
+    def ensure_ready(self) -> None:
+        """
+        Garante que os classificadores estão prontos, fazendo o warm-up se necessário.
+
+        Raises:
+            ServiceUnavailableError: Se o servidor estiver em encerramento ou o warm-up falhar
+        """
+        if self.state == self.DRAINING:
+            raise ServiceUnavailableError("Servidor em encerramento")
+        if not self.is_ready and not self.warm_up():
+            if self.state == self.DRAINING:
+                raise ServiceUnavailableError("Servidor em encerramento")
+            raise ServiceUnavailableError(f"Classificadores indisponíveis: {self.error}")
+
+    @contextmanager
+    def track_classification(self):
+        """
+        Conta uma classificação em andamento para o encerramento gracioso.
+
+        Raises:
+            ServiceUnavailableError: Se o encerramento já começou
+        """
+        with self._inflight_done:
+            # Verificado sob o mesmo lock do drain: nenhuma classificação começa depois dele
+            if self.state == self.DRAINING:
+                raise ServiceUnavailableError("Servidor em encerramento")
+            self._inflight += 1
+        try:
+            yield
+        finally:
+            with self._inflight_done:
+                self._inflight -= 1
+                if self._inflight == 0:
+                    self._inflight_done.notify_all()
+
+    def drain(self, timeout: float) -> bool:
+        """
+        Para de aceitar novas classificações e espera as em andamento terminarem.
+
+        Args:
+            timeout: Tempo máximo de espera em segundos
+
+        Returns:
+            bool: True se todas as classificações terminaram dentro do prazo
+        """
+        with self._inflight_done:
+            self.state = self.DRAINING
+            drained = self._inflight_done.wait_for(lambda: self._inflight == 0, timeout=timeout)
+            if not drained:
+                logger.warning(f"Encerrando com {self._inflight} classificações em andamento")
+        return drained
+
+    def get_status(self) -> Dict[str, Any]:
+        """Retorna o estado de prontidão para os endpoints de saúde"""
+        return {
+            "state": self.state,
+            "ready": self.is_ready,
+            "inflight": self._inflight,
+            "error": self.error,
+            "warm_up_seconds": round(self.warm_up_seconds, 3) if self.warm_up_seconds is not None else None,
+            "time_to_ready_seconds": round(self.ready_at - self.created_at, 3) if self.ready_at else None
+        }
+
+
+# Instância global do estado do servidor
+runtime = ServiceRuntime()
@@ -4,35 +4,53 @@ from typing import Dict, Any, Optional, List
 from urllib.parse import urljoin
 from datetime import datetime
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 import httpx
-from openai import OpenAI
 import io
 
 from .config import APIConfig, db_client
 from .ocorrencias_service import ocorrencia_service
+from .runtime import runtime, ServiceUnavailableError
 from Crypto.Cipher import AES
 from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from cryptography.hazmat.primitives import hashes
 import base64
-from agentes.emergency_classifier import EmergencyClassifierAgent
-from agentes.urgency_classifier import UrgencyClassifier
 
 # Configuração de logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Validar configurações
-APIConfig.validate()
 
-# Configurar OpenAI (nova versão)
-openai_client = OpenAI(api_key=APIConfig.OPENAI_API_KEY)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Inicialização e encerramento do servidor"""
+    # Validar configurações
+    APIConfig.validate()
 
+    # Conectar ao banco de dados na inicialização
+    await db_client.connect()
+
+    # Classificadores e índice vetorial são carregados fora do caminho de importação
+    if APIConfig.WARMUP_MODE == "blocking":
+        runtime.warm_up()
+    elif APIConfig.WARMUP_MODE == "background":
+        runtime.start_background_warm_up()
+
+    yield
+
+    # Aguarda classificações em andamento antes de liberar recursos
+    await run_in_threadpool(runtime.drain, APIConfig.GRACEFUL_SHUTDOWN_TIMEOUT)
+
+    # Desconectar do banco de dados no encerramento
+    await db_client.disconnect()
 
-app = FastAPI(title="911 Server", version="1.0.0")
+
+app = FastAPI(title="911 Server", version="1.0.0", lifespan=lifespan)
 
 # Configurar CORS para permitir conexões do frontend
 app.add_middleware(
@@ -59,10 +77,6 @@ class OcorrenciaData(BaseModel):
     reporter: Optional[str] = None
     timestamp: Optional[str] = None
 
-# Instanciar classificadores
-emergency_classifier = EmergencyClassifierAgent()
-urgency_classifier = UrgencyClassifier()
-
 class EvolutionAPIClient:
     def __init__(self, base_url: str, api_key: str, instance: str):
         self.base_url = base_url
@@ -295,7 +309,7 @@ async def transcribe_audio_from_url(audio_url: str, media_key: str) -> Optional[
         logger.info(f"Enviando arquivo para transcrição. Tamanho: {len(decrypted)} bytes")
         
         # Fazer transcrição
-        res = openai_client.audio.transcriptions.create(
+        res = runtime.openai_client.audio.transcriptions.create(
             model="whisper-1", file=audio_file, language="pt"
         )
         
@@ -317,16 +331,6 @@ async def transcribe_audio_from_url(audio_url: str, media_key: str) -> Optional[
         
         return None
 
-@app.on_event("startup")
-async def startup_event():
-    """Conectar ao banco de dados na inicialização"""
-    await db_client.connect()
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    """Desconectar do banco de dados no encerramento"""
-    await db_client.disconnect()
-
 async def parse_message(data: Dict[str, Any]) -> str:
     """
     Extrai o texto da mensagem
@@ -378,7 +382,8 @@ async def process_message_event(data: Dict[str, Any]):
         parsed_message = await parse_message(data)
         
         if parsed_message:
-            classificacao = classificar_emergencia(parsed_message)
+            await aguardar_classificadores()
+            classificacao = await run_in_threadpool(classificar_emergencia, parsed_message)
             print(f"Relato: {parsed_message} foi classificado como {classificacao}")
 
             agencias = classificacao["emergency_classification"] 
@@ -466,18 +471,42 @@ async def send_message_with_classification(
         return False
 
 
+async def aguardar_classificadores():
+    """
+    Espera o warm-up dos classificadores sem bloquear o loop de eventos
+
+    Raises:
+        HTTPException: 503 se os classificadores não puderem ser carregados
+    """
+    if runtime.is_ready:
+        return
+    try:
+        await run_in_threadpool(runtime.ensure_ready)
+    except ServiceUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+
 def classificar_emergencia(relato: str):
-    # Passo 1: Classificar emergência (tipos de serviço)
-    emergency_result = emergency_classifier.classify_emergency(relato)
-        
-    # Passo 2: Classificar urgência usando o resultado anterior
-    urgency_result = urgency_classifier.classify_emergency(relato, emergency_result)
+    # Garante que os classificadores foram carregados (warm-up sob demanda)
+    runtime.ensure_ready()
+    emergency_classifier = runtime.emergency_classifier
+    urgency_classifier = runtime.urgency_classifier
+
+    # Executada em threadpool: o contador permite drenar classificações no encerramento
+    with runtime.track_classification():
+        # Passo 1: Classificar emergência (tipos de serviço)
+        emergency_result = emergency_classifier.classify_emergency(relato)
+            
+        # Passo 2: Classificar urgência usando o resultado anterior
+        urgency_result = urgency_classifier.classify_emergency(relato, emergency_result)
         
     # Passo 3: Retornar resultado completo em formato de dicionário
     return {
         "relato": relato,
         "emergency_classification": emergency_result["tipos_emergencia"],
         "nivel_urgencia": urgency_result.nivel_urgencia,
+        "rag_used": urgency_result.rag_used,
+        "gate_reason": urgency_result.gate_reason,
         "status": "sucesso",
         "timestamp": datetime.now().isoformat()
     }
@@ -497,8 +526,14 @@ async def classify_emergency_report(request: RelatoRequest):
     try:
         relato = request.relato
         
-        return classificar_emergencia(relato)
+        await aguardar_classificadores()
+        return await run_in_threadpool(classificar_emergencia, relato)
         
+    except HTTPException:
+        raise
+    except ServiceUnavailableError as e:
+        # Encerramento iniciado entre a verificação de prontidão e a classificação
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Erro na classificação: {e}")
         raise HTTPException(status_code=500, detail={
@@ -519,6 +554,7 @@ async def health_check():
             "status": "healthy" if connection_ok else "unhealthy",
             "service": "911-server",
             "database": "connected" if connection_ok else "disconnected",
+            "classifiers": runtime.get_status(),
             "version": "1.0.0"
         }
     except Exception as e:
@@ -529,6 +565,19 @@ async def health_check():
             "version": "1.0.0"
         }
 
+@app.get("/ready")
+async def readiness_check():
+    """Endpoint de prontidão: 200 somente quando os classificadores estão carregados"""
+    status = runtime.get_status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+@app.post("/warmup")
+async def warmup_endpoint():
+    """Executa o warm-up dos classificadores e aguarda a conclusão (503 durante o encerramento)"""
+    await run_in_threadpool(runtime.warm_up)
+    status = runtime.get_status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
 @app.post("/send-message")
 async def send_message_endpoint(request: dict):
     """
@@ -555,7 +604,8 @@ async def send_message_endpoint(request: dict):
         
         # Se não tem dados de classificação, classificar a mensagem
         if not classification_data:
-            classification_data = classificar_emergencia(message)
+            await aguardar_classificadores()
+            classification_data = await run_in_threadpool(classificar_emergencia, message)
             original_message = message
         else:
             # Se tem dados de classificação, usar a mensagem como situação original
@@ -593,6 +643,10 @@ async def send_message_endpoint(request: dict):
             "saved_to_database": saved_data if saved_data else False
         }
         
+    except HTTPException:
+        raise
+    except ServiceUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Erro no endpoint send-message: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -607,6 +661,8 @@ async def root():
             "webhook": "/webhook",
             "classify": "/classify",
             "health": "/health",
+            "ready": "/ready",
+            "warmup": "/warmup",
             "ocorrencias": "/api/ocorrencias",
             "send-message": "/send-message"
         }
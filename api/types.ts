@@ -41,6 +41,8 @@ export interface EmergencyClassification {
   relato: string;
   emergency_classification: string[];
   nivel_urgencia: number;
+  rag_used: boolean;
+  gate_reason: string;
   status: string;
   timestamp: string;
 } 
@@ -0,0 +1,3 @@
+"""
+Benchmarks de desempenho do sistema 911 (inicialização, importação e busca vetorial)
+"""
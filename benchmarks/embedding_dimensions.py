@@ -0,0 +1,151 @@
+"""
+Comparação de dimensões de embeddings: recall, latência e memória
+
+Reconstrói os vetores do índice atual (dimensão completa) e, para cada dimensão
+candidata, trunca + renormaliza os vetores (equivalente ao parâmetro
+`dimensions` dos modelos text-embedding-3) e mede contra a busca exata na
+dimensão completa:
+- recall@k: fração dos k vizinhos da dimensão completa recuperados
+- latência p50/p95 de uma consulta (índice Flat de produto interno)
+- memória dos vetores
+
+As consultas são os relatos de test_cases_classificados.csv (embutidos uma vez
+pela API na dimensão completa) ou, com --corpus-queries, chunks do próprio
+corpus (sem chamadas de rede; o próprio chunk é excluído dos vizinhos).
+
+Uso:
+    python -m benchmarks.embedding_dimensions --dimensions 1536,1024,512,256
+    python -m benchmarks.embedding_dimensions --corpus-queries 300 --output dims.json
+"""
+
+import argparse
+import csv
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Dict, Any, List
+
+import faiss
+import numpy as np
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from agentes.vectordb_config import VectorDBConfig, truncate_embeddings
+
+
+def load_query_texts(path: str) -> List[str]:
+    """Relatos do CSV de casos de teste (primeira coluna)"""
+    with open(path, "r", encoding="utf-8") as f:
+        return [row[0].strip("\"'") for row in csv.reader(f) if row]
+
+
+def exact_neighbors(corpus: np.ndarray, queries: np.ndarray, k: int, exclude_self: bool) -> np.ndarray:
+    """Vizinhos exatos por produto interno (opcionalmente ignorando o próprio vetor)"""
+    index = faiss.IndexFlatIP(corpus.shape[1])
+    index.add(corpus)
+    _, neighbors = index.search(queries, k + 1 if exclude_self else k)
+    return neighbors[:, 1:] if exclude_self else neighbors
+
+
+def measure_dimension(corpus: np.ndarray, queries: np.ndarray, truth: np.ndarray,
+                      dimensions: int, k: int, exclude_self: bool) -> Dict[str, Any]:
+    """Recall, latência e memória de um índice com `dimensions` dimensões"""
+    reduced_corpus = truncate_embeddings(corpus, dimensions)
+    reduced_queries = truncate_embeddings(queries, dimensions)
+
+    index = faiss.IndexFlatIP(dimensions)
+    index.add(reduced_corpus)
+
+    fetch = k + 1 if exclude_self else k
+    latencies = []
+    recalls = []
+    for i in range(len(reduced_queries)):
+        start = time.perf_counter()
+        _, neighbors = index.search(reduced_queries[i:i + 1], fetch)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+        found = neighbors[0][1:] if exclude_self else neighbors[0]
+        recalls.append(len(set(found.tolist()) & set(truth[i].tolist())) / k)
+
+    latencies.sort()
+    return {
+        "dimensions": dimensions,
+        f"recall_at_{k}": round(statistics.mean(recalls), 4),
+        "latency_p50_ms": round(latencies[len(latencies) // 2], 4),
+        "latency_p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 4),
+        "memory_mb": round(reduced_corpus.nbytes / 1e6, 2)
+    }
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    config = VectorDBConfig()
+    vector_store = config.get_vector_store()
+    corpus = config._reconstruct_vectors(vector_store.index).astype("float32")
+    faiss.normalize_L2(corpus)
+    full_dimension = corpus.shape[1]
+    print(f"📦 Corpus: {len(corpus)} vetores de {full_dimension} dimensões")
+
+    if args.corpus_queries:
+        rng = np.random.default_rng(0)
+        sample = rng.choice(len(corpus), min(args.corpus_queries, len(corpus)), replace=False)
+        queries = corpus[sample]
+        exclude_self = True
+        source = f"{len(queries)} chunks do corpus"
+    else:
+        texts = load_query_texts(args.cases)
+        queries = np.array(vector_store.embedding_function.embed_documents(texts), dtype="float32")
+        faiss.normalize_L2(queries)
+        exclude_self = False
+        source = f"{len(queries)} relatos de {os.path.basename(args.cases)}"
+    print(f"🔎 Consultas: {source}")
+
+    k = min(args.k, len(corpus) - 1)
+    truth = exact_neighbors(corpus, queries, k, exclude_self)
+
+    results = []
+    for dimensions in sorted({int(d) for d in args.dimensions.split(",")}, reverse=True):
+        if dimensions > full_dimension:
+            print(f"⚠️  {dimensions} > dimensão do índice ({full_dimension}), ignorado")
+            continue
+        results.append(measure_dimension(corpus, queries, truth, dimensions, k, exclude_self))
+
+    return {
+        "corpus_vectors": int(len(corpus)),
+        "full_dimension": int(full_dimension),
+        "queries": source,
+        "k": k,
+        "results": results
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    k = report["k"]
+    print(f"\n{'dim':>6} {'recall@' + str(k):>10} {'p50 ms':>9} {'p95 ms':>9} {'memória MB':>11}")
+    for row in report["results"]:
+        print(f"{row['dimensions']:>6} {row[f'recall_at_{k}']:>10.4f} {row['latency_p50_ms']:>9.4f} "
+              f"{row['latency_p95_ms']:>9.4f} {row['memory_mb']:>11.2f}")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Compara recall/latência/memória de dimensões reduzidas de embeddings")
+    parser.add_argument("--dimensions", default="1536,1024,512,256", help="Dimensões candidatas, separadas por vírgula")
+    parser.add_argument("--k", type=int, default=10, help="Vizinhos considerados no recall")
+    parser.add_argument("--cases", default=os.path.join(PROJECT_ROOT, "test_cases_classificados.csv"),
+                        help="CSV com os relatos usados como consultas")
+    parser.add_argument("--corpus-queries", type=int, default=0,
+                        help="Usa N chunks do corpus como consultas (sem chamar a API)")
+    parser.add_argument("--output", help="Arquivo JSON para salvar o resultado")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = run(args)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Resultado salvo em {args.output}")
@@ -0,0 +1,118 @@
+"""
+Benchmark do custo de importação do caminho de serviço
+
+Para cada alvo, executa um interpretador novo e mede:
+- tempo de importação (wall clock) e os módulos mais caros segundo `-X importtime`
+- pico de memória alocada pelo Python (tracemalloc) e RSS máximo do processo
+- se bibliotecas exclusivas da ingestão (pandas, PyPDF2) foram carregadas
+
+Uso:
+    python -m benchmarks.import_footprint
+    python -m benchmarks.import_footprint --target agentes.ingestion --top 15
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, Any, List
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Caminho de serviço: o servidor e o que o warm-up importa
+DEFAULT_TARGETS = ["api.server", "agentes.urgency_classifier"]
+
+# Bibliotecas que só a ingestão offline deve carregar
+INGESTION_ONLY_MODULES = ["pandas", "PyPDF2", "langchain_text_splitters", "openpyxl"]
+
+PROBE = """
+import json, resource, sys, time, tracemalloc
+if {trace}:
+    tracemalloc.start()
+start = time.perf_counter()
+import {target}
+elapsed = time.perf_counter() - start
+_, peak = tracemalloc.get_traced_memory()
+print(json.dumps({{
+    "import_seconds": elapsed,
+    "tracemalloc_peak_bytes": peak,
+    "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    "modules_loaded": len(sys.modules),
+    "ingestion_modules_loaded": [m for m in {ingestion_only!r} if m in sys.modules]
+}}))
+"""
+
+
+def run_probe(target: str, trace: bool) -> Dict[str, Any]:
+    code = PROBE.format(target=target, trace=trace, ingestion_only=INGESTION_ONLY_MODULES)
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=PROJECT_ROOT, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def probe_target(target: str) -> Dict[str, Any]:
+    """
+    Mede tempo, memória e módulos carregados ao importar o alvo.
+
+    O tempo vem de uma execução sem tracemalloc, que deixa a importação várias vezes mais lenta.
+    """
+    stats = run_probe(target, trace=False)
+    stats["tracemalloc_peak_bytes"] = run_probe(target, trace=True)["tracemalloc_peak_bytes"]
+    return stats
+
+
+def importtime_top(target: str, top: int) -> List[Dict[str, Any]]:
+    """Retorna os módulos com maior tempo cumulativo segundo -X importtime"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        cwd=PROJECT_ROOT, capture_output=True, text=True, check=True
+    )
+
+    entries = []
+    for line in result.stderr.splitlines():
+        # Formato: "import time: self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = [part.strip() for part in line[len("import time:"):].split("|")]
+        entries.append({
+            "module": name.strip(),
+            "self_us": int(self_us),
+            "cumulative_us": int(cumulative_us)
+        })
+
+    entries.sort(key=lambda e: e["cumulative_us"], reverse=True)
+    return entries[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Custo de importação do caminho de serviço")
+    parser.add_argument("--target", action="append", help="Módulo a importar (pode repetir)")
+    parser.add_argument("--top", type=int, default=10, help="Quantidade de módulos mais caros a exibir")
+    parser.add_argument("--output", default=None, help="Arquivo JSON de saída (opcional)")
+    args = parser.parse_args()
+
+    report = {"benchmark": "import_footprint", "targets": {}}
+    for target in args.target or DEFAULT_TARGETS:
+        stats = probe_target(target)
+        stats["importtime_top"] = importtime_top(target, args.top)
+        report["targets"][target] = stats
+
+        print(f"\n📦 {target}")
+        print(f"   Importação: {stats['import_seconds'] * 1000:.0f}ms | "
+              f"pico tracemalloc: {stats['tracemalloc_peak_bytes'] / 1024 / 1024:.1f}MB | "
+              f"RSS máx: {stats['max_rss_kb'] / 1024:.1f}MB | módulos: {stats['modules_loaded']}")
+        loaded = stats["ingestion_modules_loaded"]
+        print(f"   Dependências de ingestão carregadas: {', '.join(loaded) if loaded else 'nenhuma'}")
+        for entry in stats["importtime_top"]:
+            print(f"   {entry['cumulative_us'] / 1000:>9.1f}ms  {entry['module']}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
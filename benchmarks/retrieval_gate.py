@@ -0,0 +1,199 @@
+"""
+Avaliação offline do RetrievalGate sobre test_cases_classificados.csv
+
+Para cada caso, decide com o gate ligado se o RAG seria acionado e relata:
+- taxa de rag_used e motivos da decisão
+- acurácia de urgência (exata e ±1) com e sem o gate
+
+Sem --live (padrão, sem chamadas de rede) a classificação prévia é simulada
+com os tipos esperados do caso e confiança --confidence, e a urgência de um
+caso dispensado é estimada pelos indicadores que substituem o contexto no
+prompt (nível "alta" → 5, "media" → 3). Casos com RAG não têm estimativa
+offline: a acurácia "sem gate" e a dos casos com RAG exigem --live.
+
+Com --live, cada caso passa pelo emergency_classifier e pelo
+urgency_classifier duas vezes (RAG_GATING=off e on), via API da OpenAI.
+
+Uso:
+    python -m benchmarks.retrieval_gate
+    python -m benchmarks.retrieval_gate --confidence 0.95 --max-words 20
+    python -m benchmarks.retrieval_gate --live --limit 50 --output gate.json
+"""
+
+import argparse
+import ast
+import csv
+import json
+import os
+import sys
+from typing import Any, Dict, List, Optional
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from agentes.retrieval_gate import RetrievalGate
+
+# Urgência implícita nos indicadores usados no lugar do contexto quando o RAG é dispensado
+INDICATOR_URGENCY = {"alta": 5, "media": 3}
+
+
+def load_cases(path: str) -> List[Dict[str, Any]]:
+    """Relatos, tipos e urgência esperados do CSV de casos de teste"""
+    cases = []
+    with open(path, "r", encoding="utf-8") as f:
+        for row in csv.reader(f):
+            if len(row) < 3:
+                continue
+            # Tipos como lista Python ("['samu']") ou separados por vírgula ("bombeiro, samu")
+            types = row[1].strip("\"'")
+            try:
+                types = ast.literal_eval(types) if types.startswith("[") else types.split(",")
+                urgency = int(row[2].strip())
+            except (ValueError, SyntaxError):
+                continue
+            cases.append({
+                "relato": row[0].strip("\"'"),
+                "tipos": [t.strip() for t in types],
+                "urgencia": urgency
+            })
+    return cases
+
+
+def accuracy(pairs: List[tuple]) -> Dict[str, Any]:
+    """Acurácia exata e com tolerância de um nível para pares (previsto, esperado)"""
+    if not pairs:
+        return {"cases": 0, "exact": None, "within_1": None}
+    return {
+        "cases": len(pairs),
+        "exact": round(sum(p == e for p, e in pairs) / len(pairs), 4),
+        "within_1": round(sum(abs(p - e) <= 1 for p, e in pairs) / len(pairs), 4)
+    }
+
+
+def indicator_urgency(indicators: List[str]) -> Optional[int]:
+    """Urgência do indicador de maior nível encontrado no relato"""
+    levels = [INDICATOR_URGENCY[indicator.split(":", 1)[0]] for indicator in indicators]
+    return max(levels) if levels else None
+
+
+def run_offline(cases: List[Dict[str, Any]], gate: RetrievalGate, confidence: float) -> Dict[str, Any]:
+    decisions = []
+    for case in cases:
+        decision = gate.decide(case["relato"], {"tipos_emergencia": case["tipos"], "confianca": confidence})
+        decisions.append({**case, "rag_used": decision.retrieve, "gate_reason": decision.reason,
+                          "predicted": None if decision.retrieve else indicator_urgency(decision.indicators)})
+
+    skipped = [d for d in decisions if not d["rag_used"]]
+    return {
+        "mode": "offline",
+        "confidence": confidence,
+        "decisions": decisions,
+        "gated_estimate": accuracy([(d["predicted"], d["urgencia"]) for d in skipped])
+    }
+
+
+def run_live(cases: List[Dict[str, Any]], gate: RetrievalGate) -> Dict[str, Any]:
+    from agentes.emergency_classifier import EmergencyClassifierAgent
+    from agentes.urgency_classifier import UrgencyClassifier
+
+    emergency_classifier = EmergencyClassifierAgent()
+    urgency_classifier = UrgencyClassifier()
+    urgency_classifier.retrieval_gate = gate
+
+    decisions = []
+    for i, case in enumerate(cases, 1):
+        emergency = emergency_classifier.classify_emergency(case["relato"])
+        gate.RAG_GATING = "off"
+        without_gate = urgency_classifier.classify_emergency(case["relato"], emergency)
+        gate.RAG_GATING = "on"
+        with_gate = urgency_classifier.classify_emergency(case["relato"], emergency)
+        decisions.append({**case, "rag_used": with_gate.rag_used, "gate_reason": with_gate.gate_reason,
+                          "predicted": with_gate.nivel_urgencia, "predicted_without_gate": without_gate.nivel_urgencia,
+                          "confianca": emergency.get("confianca")})
+        print(f"   [{i}/{len(cases)}] gate={'rag' if with_gate.rag_used else 'sem_rag'} "
+              f"urgência {without_gate.nivel_urgencia} → {with_gate.nivel_urgencia} (esperado {case['urgencia']})")
+
+    skipped = [d for d in decisions if not d["rag_used"]]
+    return {
+        "mode": "live",
+        "decisions": decisions,
+        "without_gate": accuracy([(d["predicted_without_gate"], d["urgencia"]) for d in decisions]),
+        "with_gate": accuracy([(d["predicted"], d["urgencia"]) for d in decisions]),
+        "gated_without_gate": accuracy([(d["predicted_without_gate"], d["urgencia"]) for d in skipped]),
+        "gated_with_gate": accuracy([(d["predicted"], d["urgencia"]) for d in skipped])
+    }
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    cases = load_cases(args.cases)[:args.limit or None]
+    print(f"📋 {len(cases)} casos de {os.path.basename(args.cases)}")
+
+    gate = RetrievalGate()
+    gate.RAG_GATING = "on"
+    if args.min_confidence is not None:
+        gate.RAG_GATE_MIN_CONFIDENCE = args.min_confidence
+    if args.max_words is not None:
+        gate.RAG_GATE_MAX_WORDS = args.max_words
+
+    report = run_live(cases, gate) if args.live else run_offline(cases, gate, args.confidence)
+
+    reasons: Dict[str, int] = {}
+    for decision in report["decisions"]:
+        reasons[decision["gate_reason"]] = reasons.get(decision["gate_reason"], 0) + 1
+    used = sum(d["rag_used"] for d in report["decisions"])
+    report.update({
+        "cases": len(cases),
+        "gate": {
+            "min_confidence": gate.RAG_GATE_MIN_CONFIDENCE,
+            "min_indicators": gate.RAG_GATE_MIN_INDICATORS,
+            "max_words": gate.RAG_GATE_MAX_WORDS
+        },
+        "rag_used": used,
+        "rag_used_rate": round(used / len(cases), 4) if cases else None,
+        "reasons": reasons
+    })
+    return report
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    def fmt(result: Dict[str, Any]) -> str:
+        if not result["cases"]:
+            return "sem casos"
+        return f"{result['exact']:.1%} exata, {result['within_1']:.1%} ±1 ({result['cases']} casos)"
+
+    print(f"\n🚦 Gate {report['gate']} ({report['mode']})")
+    print(f"   - RAG acionado: {report['rag_used']}/{report['cases']} ({report['rag_used_rate']:.1%})")
+    print(f"   - Motivos: {report['reasons']}")
+    if report["mode"] == "live":
+        print(f"   - Acurácia sem gate: {fmt(report['without_gate'])}")
+        print(f"   - Acurácia com gate: {fmt(report['with_gate'])}")
+        print(f"   - Casos dispensados, sem gate: {fmt(report['gated_without_gate'])}")
+        print(f"   - Casos dispensados, com gate: {fmt(report['gated_with_gate'])}")
+    else:
+        print(f"   - Casos dispensados, urgência pelos indicadores: {fmt(report['gated_estimate'])}")
+        print("   - Acurácia com RAG e sem gate: use --live")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Taxa de RAG e acurácia de urgência com e sem o RetrievalGate")
+    parser.add_argument("--cases", default=os.path.join(PROJECT_ROOT, "test_cases_classificados.csv"),
+                        help="CSV com os casos de teste")
+    parser.add_argument("--confidence", type=float, default=0.9,
+                        help="Confiança simulada do emergency_classifier (modo offline)")
+    parser.add_argument("--min-confidence", type=float, help="Sobrescreve RAG_GATE_MIN_CONFIDENCE")
+    parser.add_argument("--max-words", type=int, help="Sobrescreve RAG_GATE_MAX_WORDS")
+    parser.add_argument("--limit", type=int, default=0, help="Avalia apenas os N primeiros casos")
+    parser.add_argument("--live", action="store_true",
+                        help="Classifica pela API (com e sem gate) em vez de simular")
+    parser.add_argument("--output", help="Arquivo JSON para salvar o resultado")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = run(args)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Resultado salvo em {args.output}")
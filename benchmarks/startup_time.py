@@ -0,0 +1,127 @@
+"""
+Benchmark do tempo de inicialização do servidor (time-to-listen)
+
+Sobe `uvicorn api.server:app` em um subprocesso e mede:
+- time_to_listen: do início do processo até a porta aceitar conexões TCP
+- time_to_ready: até GET /ready responder 200 (classificadores carregados)
+
+Requer as mesmas variáveis de ambiente do servidor (.env), incluindo o PostgreSQL,
+pois o lifespan conecta ao banco antes de começar a escutar.
+
+Uso:
+    python -m benchmarks.startup_time --runs 5 --port 8050
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from typing import Dict, Any, Optional
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def wait_for_port(host: str, port: int, deadline: float) -> Optional[float]:
+    """Espera a porta aceitar conexões e retorna o instante em que aceitou"""
+    while time.perf_counter() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=0.05):
+                return time.perf_counter()
+        except OSError:
+            time.sleep(0.01)
+    return None
+
+
+def wait_for_ready(host: str, port: int, deadline: float) -> Optional[float]:
+    """Espera GET /ready responder 200 e retorna o instante da resposta"""
+    url = f"http://{host}:{port}/ready"
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return time.perf_counter()
+        except (urllib.error.URLError, OSError):
+            pass
+        time.sleep(0.05)
+    return None
+
+
+def measure_once(host: str, port: int, timeout: float, warmup_mode: str) -> Dict[str, Any]:
+    """Executa uma inicialização completa do servidor e mede os tempos"""
+    env = dict(os.environ, WARMUP_MODE=warmup_mode)
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api.server:app", "--host", host, "--port", str(port), "--log-level", "warning"],
+        cwd=PROJECT_ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+
+    try:
+        deadline = start + timeout
+        listening_at = wait_for_port(host, port, deadline)
+        ready_at = wait_for_ready(host, port, deadline) if listening_at else None
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+    return {
+        "time_to_listen_s": round(listening_at - start, 3) if listening_at else None,
+        "time_to_ready_s": round(ready_at - start, 3) if ready_at else None
+    }
+
+
+def summarize(values) -> Dict[str, Any]:
+    values = [v for v in values if v is not None]
+    if not values:
+        return {"runs": 0}
+    return {
+        "runs": len(values),
+        "min_s": min(values),
+        "median_s": round(statistics.median(values), 3),
+        "max_s": max(values)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de time-to-listen do servidor 911")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8050)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--warmup-mode", default="background", choices=["background", "blocking", "lazy"])
+    parser.add_argument("--output", default=None, help="Arquivo JSON de saída (opcional)")
+    args = parser.parse_args()
+
+    runs = []
+    for i in range(args.runs):
+        result = measure_once(args.host, args.port, args.timeout, args.warmup_mode)
+        print(f"Execução {i + 1}/{args.runs}: listen={result['time_to_listen_s']}s ready={result['time_to_ready_s']}s")
+        runs.append(result)
+
+    report = {
+        "benchmark": "startup_time",
+        "warmup_mode": args.warmup_mode,
+        "time_to_listen": summarize(r["time_to_listen_s"] for r in runs),
+        "time_to_ready": summarize(r["time_to_ready_s"] for r in runs),
+        "runs": runs
+    }
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,402 @@
+"""
+Micro-benchmark da busca vetorial, sem chamadas à API de embeddings
+
+Monta índices FAISS a partir de vetores sintéticos ou já existentes, em vários
+tamanhos de corpus e tipos de índice (strings do faiss.index_factory, montadas
+por VectorDBConfig.build_index como no serviço), e mede para cada combinação:
+- build: tempo de treino + inclusão dos vetores
+- memória: bytes dos códigos, tamanho serializado e variação do RSS do processo
+- load: tempo de leitura do arquivo salvo (completo e via mmap, como FAISS_MMAP)
+- QPS e latência p50/p95 de consultas individuais com 1, 2, 4... threads
+- recall@k contra a busca exata (força bruta) sobre os mesmos vetores
+
+Fontes de vetores (--source):
+- synthetic: clusters gaussianos normalizados, reproduzíveis pela --seed
+- index: vetores do snapshot publicado da coleção (faiss_db/)
+- cache: vetores do cache de embeddings (EMBEDDING_CACHE_PATH)
+- npy: matriz n x d de um arquivo .npy (--vectors)
+
+Nas fontes reais as consultas são vetores do corpus com ruído (--query-noise);
+tamanhos maiores que o número de vetores disponíveis são reduzidos a ele.
+O relatório JSON tem sempre o mesmo formato e inclui o ambiente da execução;
+--baseline compara com um relatório anterior.
+
+Uso:
+    python -m benchmarks.vector_search --sizes 1000,10000 --output vs.json
+    python -m benchmarks.vector_search --indexes Flat HNSW32 --concurrency 1,4 --baseline vs.json
+    python -m benchmarks.vector_search --source index --sizes 776
+"""
+
+import argparse
+import gc
+import json
+import math
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from agentes.vectordb_config import VectorDBConfig
+
+DEFAULT_INDEXES = ["Flat", "IVF{nlist},Flat", "HNSW32", "SQ8", "IVF{nlist},PQ64"]
+
+
+def synthetic_vectors(count: int, dimension: int, clusters: int, spread: float,
+                      rng: np.random.Generator) -> np.ndarray:
+    """
+    Vetores normalizados agrupados em clusters, parecidos com embeddings de texto.
+
+    Cada vetor é o centro de um cluster somado a um ruído de norma ~`spread`
+    (spread=1.0 dá cosseno ~0.7 com o centro).
+    """
+    centers = rng.standard_normal((clusters, dimension), dtype=np.float32)
+    faiss.normalize_L2(centers)
+    vectors = centers[rng.integers(0, clusters, count)]
+    vectors += rng.standard_normal((count, dimension), dtype=np.float32) * (spread / math.sqrt(dimension))
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def index_vectors(config: VectorDBConfig) -> np.ndarray:
+    """Vetores do snapshot publicado (ou do layout antigo), lidos sem carregar embeddings."""
+    snapshot = config.current_snapshot()
+    path = config.snapshot_files(snapshot)[0] if snapshot else config.index_file
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Nenhum índice em {config.FAISS_INDEX_PATH}")
+    return VectorDBConfig._reconstruct_vectors(faiss.read_index(path))
+
+
+def cache_vectors(config: VectorDBConfig) -> np.ndarray:
+    """Vetores do cache de embeddings; havendo várias dimensões, usa a mais frequente."""
+    if not os.path.exists(config.EMBEDDING_CACHE_PATH):
+        raise FileNotFoundError(f"Cache de embeddings não encontrado: {config.EMBEDDING_CACHE_PATH}")
+    with sqlite3.connect(config.EMBEDDING_CACHE_PATH) as conn:
+        rows = conn.execute("SELECT dim, vector FROM embeddings").fetchall()
+    if not rows:
+        raise ValueError("Cache de embeddings vazio")
+    dimension = Counter(dim for dim, _ in rows).most_common(1)[0][0]
+    return np.stack([np.frombuffer(blob, dtype=np.float32) for dim, blob in rows if dim == dimension])
+
+
+def noisy_queries(pool: np.ndarray, count: int, noise: float, rng: np.random.Generator) -> np.ndarray:
+    """Consultas próximas de vetores do corpus, mas diferentes deles."""
+    queries = pool[rng.integers(0, len(pool), count)].copy()
+    queries += rng.standard_normal(queries.shape, dtype=np.float32) * (noise / math.sqrt(pool.shape[1]))
+    faiss.normalize_L2(queries)
+    return queries
+
+
+def load_vectors(args: argparse.Namespace, max_size: int, rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray, Dict[str, Any]]:
+    """
+    Corpus e consultas da fonte escolhida.
+
+    Returns:
+        Tuple: (corpus normalizado, consultas normalizadas, descrição da fonte)
+    """
+    if args.source == "synthetic":
+        vectors = synthetic_vectors(max_size + args.queries, args.dimension, args.clusters, args.spread, rng)
+        # Consultas tiradas da mesma distribuição, fora do corpus
+        return vectors[:max_size], vectors[max_size:], {
+            "source": "synthetic", "clusters": args.clusters, "spread": args.spread
+        }
+
+    config = VectorDBConfig()
+    if args.source == "index":
+        pool = index_vectors(config)
+        description = {"source": "index", "path": os.path.abspath(config.FAISS_INDEX_PATH)}
+    elif args.source == "cache":
+        pool = cache_vectors(config)
+        description = {"source": "cache", "path": os.path.abspath(config.EMBEDDING_CACHE_PATH)}
+    else:
+        if not args.vectors:
+            raise ValueError("--source npy requer --vectors")
+        pool = np.load(args.vectors)
+        description = {"source": "npy", "path": os.path.abspath(args.vectors)}
+
+    pool = np.ascontiguousarray(pool, dtype="float32")
+    faiss.normalize_L2(pool)
+    description["available_vectors"] = int(len(pool))
+    description["query_noise"] = args.query_noise
+    return pool, noisy_queries(pool, args.queries, args.query_noise, rng), description
+
+
+def resolve_factory(template: str, size: int) -> str:
+    """Preenche {nlist} com ~4·√n listas, limitado a 39 vetores de treino por lista."""
+    nlist = max(1, min(int(4 * math.sqrt(size)), size // 39))
+    return template.replace("{nlist}", str(nlist))
+
+
+def _rss_bytes() -> Optional[int]:
+    """RSS atual do processo (Linux); None se indisponível."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _rss_delta_mb(before: Optional[int]) -> Optional[float]:
+    after = _rss_bytes()
+    return round((after - before) / 1e6, 2) if before is not None and after is not None else None
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray, k: int) -> float:
+    """Fração média dos k vizinhos exatos recuperados"""
+    return statistics.mean(
+        len(set(row[row >= 0].tolist()) & set(expected.tolist())) / k
+        for row, expected in zip(found, truth)
+    )
+
+
+def measure_throughput(index, queries: np.ndarray, k: int, params, concurrency: int) -> Dict[str, Any]:
+    """
+    QPS de consultas individuais (uma por requisição, como no serviço) com N threads.
+
+    As threads consomem a mesma lista de consultas; a busca do FAISS libera o GIL.
+    """
+    latencies: List[float] = []
+    latencies_lock = threading.Lock()
+    next_query = iter(range(len(queries)))
+
+    def worker():
+        local = []
+        for row in next_query:
+            start = time.perf_counter()
+            index.search(queries[row:row + 1], k, params=params)
+            local.append((time.perf_counter() - start) * 1000)
+        with latencies_lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "qps": round(len(latencies) / elapsed, 1),
+        "latency_p50_ms": round(_percentile(latencies, 0.5), 4),
+        "latency_p95_ms": round(_percentile(latencies, 0.95), 4)
+    }
+
+
+def measure_load(path: str, mmap: bool) -> Dict[str, Any]:
+    """Tempo de leitura do índice salvo e variação do RSS"""
+    gc.collect()
+    rss_before = _rss_bytes()
+    flags = faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY if mmap else 0
+    start = time.perf_counter()
+    try:
+        index = faiss.read_index(path, flags)
+    except RuntimeError as e:
+        # Nem todo tipo de índice pode ser aberto via mmap
+        return {"error": str(e).strip().splitlines()[-1]}
+    seconds = time.perf_counter() - start
+    result = {"seconds": round(seconds, 4), "rss_delta_mb": _rss_delta_mb(rss_before)}
+    del index
+    return result
+
+
+def measure_index(config: VectorDBConfig, corpus: np.ndarray, queries: np.ndarray, truth: np.ndarray,
+                  factory: str, k: int, args: argparse.Namespace, concurrency: List[int], workdir: str) -> Dict[str, Any]:
+    """Build, memória, load, QPS e recall de um tipo de índice sobre um corpus"""
+    gc.collect()
+    rss_before = _rss_bytes()
+    start = time.perf_counter()
+    index = config.build_index(corpus, factory, args.metric)
+    build_seconds = time.perf_counter() - start
+    rss_delta = _rss_delta_mb(rss_before)
+
+    path = os.path.join(workdir, "index.faiss")
+    faiss.write_index(index, path)
+    params = config._search_params(index, nprobe=args.nprobe, ef_search=args.ef_search)
+
+    _, found = index.search(queries, k, params=params)
+
+    result = {
+        "factory": factory,
+        "build_seconds": round(build_seconds, 4),
+        "memory": {
+            "code_bytes": VectorDBConfig._index_memory_bytes(index),
+            "file_bytes": os.path.getsize(path),
+            "build_rss_delta_mb": rss_delta
+        },
+        "load": {"full": measure_load(path, mmap=False), "mmap": measure_load(path, mmap=True)},
+        "k": k,
+        "recall": round(recall_at_k(found, truth, k), 4),
+        "throughput": [measure_throughput(index, queries, k, params, level) for level in concurrency]
+    }
+    del index
+    os.remove(path)
+    return result
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    if args.omp_threads > 0:
+        faiss.omp_set_num_threads(args.omp_threads)
+
+    sizes = sorted({int(size) for size in args.sizes.split(",")})
+    concurrency = sorted({int(level) for level in args.concurrency.split(",")})
+    rng = np.random.default_rng(args.seed)
+
+    corpus_pool, queries, source = load_vectors(args, sizes[-1], rng)
+    if len(corpus_pool) < sizes[-1]:
+        print(f"⚠️  Só há {len(corpus_pool)} vetores: tamanhos maiores foram reduzidos")
+        sizes = sorted({min(size, len(corpus_pool)) for size in sizes})
+    print(f"📦 Vetores: {source['source']}, {len(corpus_pool)} x {corpus_pool.shape[1]}, {len(queries)} consultas")
+
+    config = VectorDBConfig()
+    results = []
+    with tempfile.TemporaryDirectory(prefix="vector-bench-") as workdir:
+        for size in sizes:
+            corpus = corpus_pool[:size]
+            k = min(args.k, size)
+            if k != args.k:
+                print(f"⚠️  k reduzido para {k} (corpus de {size})")
+            metric = faiss.METRIC_INNER_PRODUCT if args.metric == "ip" else faiss.METRIC_L2
+            _, truth = faiss.knn(queries, corpus, k, metric=metric)
+
+            for template in args.indexes:
+                factory = resolve_factory(template, size)
+                print(f"⏱️  {size} vetores, {factory}...")
+                try:
+                    row = measure_index(config, corpus, queries, truth, factory, k, args, concurrency, workdir)
+                except RuntimeError as e:
+                    print(f"❌ {factory}: {e}")
+                    row = {"factory": factory, "error": str(e).strip().splitlines()[-1]}
+                row = {"corpus_size": size, "template": template, **row}
+                results.append(row)
+
+    return {
+        "benchmark": "vector_search",
+        "environment": {
+            "python": platform.python_version(),
+            "faiss": faiss.__version__,
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "omp_threads": faiss.omp_get_max_threads()
+        },
+        "parameters": {
+            **source,
+            "dimension": int(corpus_pool.shape[1]),
+            "metric": args.metric,
+            "k": args.k,
+            "queries": int(len(queries)),
+            "nprobe": args.nprobe or config.FAISS_NPROBE,
+            "ef_search": args.ef_search or config.FAISS_EF_SEARCH,
+            "seed": args.seed
+        },
+        "results": results
+    }
+
+
+def _row_key(row: Dict[str, Any]) -> Tuple[int, str]:
+    return row["corpus_size"], row["template"]
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Variação de cada combinação (tamanho, índice) em relação a um relatório anterior.
+
+    Returns:
+        List[Dict]: Razões atual/anterior de build, QPS por concorrência e diferença de recall
+    """
+    previous = {_row_key(row): row for row in baseline.get("results", []) if "error" not in row}
+    changes = []
+    for row in report["results"]:
+        old = previous.get(_row_key(row))
+        if old is None or "error" in row:
+            continue
+        old_qps = {level["concurrency"]: level["qps"] for level in old["throughput"]}
+        changes.append({
+            "corpus_size": row["corpus_size"],
+            "factory": row["factory"],
+            "build_ratio": round(row["build_seconds"] / old["build_seconds"], 3) if old["build_seconds"] else None,
+            "qps_ratio": {
+                level["concurrency"]: round(level["qps"] / old_qps[level["concurrency"]], 3)
+                for level in row["throughput"] if old_qps.get(level["concurrency"])
+            },
+            "recall_delta": round(row["recall"] - old["recall"], 4) if row["k"] == old.get("k") else None
+        })
+    return changes
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    k = report["parameters"]["k"]
+    levels = [level["concurrency"] for level in next(
+        (row["throughput"] for row in report["results"] if "throughput" in row), []
+    )]
+    header = f"\n{'n':>7} {'índice':<18} {'build s':>8} {'arquivo MB':>10} {'load ms':>8} {'recall@' + str(k):>9}"
+    print(header + "".join(f" {'qps x' + str(level):>9}" for level in levels))
+    for row in report["results"]:
+        if "error" in row:
+            print(f"{row['corpus_size']:>7} {row['factory']:<18} erro: {row['error']}")
+            continue
+        print(f"{row['corpus_size']:>7} {row['factory']:<18} {row['build_seconds']:>8.3f} "
+              f"{row['memory']['file_bytes'] / 1e6:>10.2f} {row['load']['full']['seconds'] * 1000:>8.2f} "
+              f"{row['recall']:>9.4f}" + "".join(f" {level['qps']:>9.1f}" for level in row["throughput"]))
+
+    for change in report.get("comparison", []):
+        qps = ", ".join(f"x{level}: {ratio:.2f}" for level, ratio in change["qps_ratio"].items())
+        recall = f"{change['recall_delta']:+.4f}" if change["recall_delta"] is not None else "k diferente"
+        print(f"📊 {change['corpus_size']} {change['factory']}: build {change['build_ratio']}x, QPS [{qps}], recall {recall}")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark offline de build/memória/load/QPS/recall de índices FAISS")
+    parser.add_argument("--source", default="synthetic", choices=["synthetic", "index", "cache", "npy"],
+                        help="Origem dos vetores")
+    parser.add_argument("--vectors", help="Arquivo .npy (com --source npy)")
+    parser.add_argument("--sizes", default="1000,10000,50000", help="Tamanhos de corpus, separados por vírgula")
+    parser.add_argument("--indexes", nargs="+", default=DEFAULT_INDEXES,
+                        help="Strings do index_factory ({nlist} = ~4·√n listas)")
+    parser.add_argument("--concurrency", default="1,2,4,8", help="Threads de consulta, separadas por vírgula")
+    parser.add_argument("--queries", type=int, default=1000, help="Consultas por medição")
+    parser.add_argument("--k", type=int, default=10, help="Vizinhos considerados no recall")
+    parser.add_argument("--metric", default=VectorDBConfig.FAISS_METRIC, choices=["l2", "ip"])
+    parser.add_argument("--nprobe", type=int, default=None, help="Listas visitadas em índices IVF (FAISS_NPROBE)")
+    parser.add_argument("--ef-search", type=int, default=None, help="efSearch de índices HNSW (FAISS_EF_SEARCH)")
+    parser.add_argument("--dimension", type=int, default=1536, help="Dimensão dos vetores sintéticos")
+    parser.add_argument("--clusters", type=int, default=100, help="Clusters dos vetores sintéticos")
+    parser.add_argument("--spread", type=float, default=1.0, help="Dispersão dos clusters sintéticos")
+    parser.add_argument("--query-noise", type=float, default=0.3, help="Ruído das consultas nas fontes reais")
+    parser.add_argument("--omp-threads", type=int, default=1,
+                        help="Threads OpenMP do FAISS (0 = padrão); 1 isola o efeito da concorrência")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", help="Relatório JSON anterior para comparação")
+    parser.add_argument("--output", help="Arquivo JSON para salvar o resultado")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = run(args)
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            report["comparison"] = compare(report, json.load(f))
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Resultado salvo em {args.output}")
@@ -1,12 +1,44 @@
+"""
+Avaliador de acurácia e latência da rota /classify.
+
+Envia os casos de test_cases_classificados.csv de forma concorrente, grava cada
+resultado em um arquivo de checkpoint (JSONL) para que execuções interrompidas
+possam ser retomadas e gera um relatório com matrizes de confusão, percentis de
+latência e comparação com o test_report.json anterior.
+
+O relatório separa acurácia e latência dos casos com e sem busca no RAG
+(RetrievalGate). Para medir o efeito do gate, rode o servidor com RAG_GATING=off,
+depois com RAG_GATING=on, e compare os relatórios.
+
+Uso:
+    python test.py --concurrency 16
+    python test.py --fresh            # ignora o checkpoint e recomeça do zero
+"""
+
+import argparse
+import asyncio
 import csv
-import requests
+import hashlib
 import json
 import ast
+import os
 import statistics
-from typing import List, Dict, Any, Tuple
+import time
+from typing import List, Dict, Any, Optional
+
+import httpx
 
 # Configuração da API
-API_URL = "http://localhost:8001/classify"
+API_URL = os.getenv("TEST_API_URL", "http://localhost:8001/classify")
+
+# Arquivos padrão da avaliação
+CASES_FILE = "test_cases_classificados.csv"
+REPORT_FILE = "test_report.json"
+CHECKPOINT_FILE = "test_checkpoint.jsonl"
+
+# Agências e níveis avaliados nas matrizes de confusão
+AGENCIES = ["bombeiro", "samu", "policia"]
+URGENCY_LEVELS = [1, 2, 3, 4, 5]
 
 def normalize_emergency_types(types_str: str) -> List[str]:
     """
@@ -14,7 +46,7 @@ def normalize_emergency_types(types_str: str) -> List[str]:
     """
     # Remove aspas duplas externas se existirem
     types_str = types_str.strip('"\'')
-    
+
     # Tenta interpretar como lista Python
     try:
         if types_str.startswith('[') and types_str.endswith(']'):
@@ -49,37 +81,86 @@ def load_test_cases(filename: str) -> List[Dict[str, Any]]:
     Carrega os casos de teste do arquivo CSV
     """
     test_cases = []
-    
+
     with open(filename, 'r', encoding='utf-8') as file:
         reader = csv.reader(file)
-        
+
         for row_num, row in enumerate(reader, 1):
             if len(row) >= 3:
                 relato = row[0].strip('"\'')
                 expected_types = normalize_emergency_types(row[1])
                 expected_urgency = normalize_urgency_level(row[2])
-                
+
                 test_cases.append({
                     'row_number': row_num,
                     'relato': relato,
                     'expected_types': expected_types,
                     'expected_urgency': expected_urgency
                 })
-    
+
     return test_cases
 
-def call_classify_api(relato: str) -> Dict[str, Any]:
+def normalize_type_names(types: List[str]) -> List[str]:
+    """
+    Normaliza nomes de agências para comparação (bombeiros -> bombeiro, polícia -> policia)
+    """
+    type_mapping = {
+        'bombeiro': 'bombeiro',
+        'bombeiros': 'bombeiro',
+        'samu': 'samu',
+        'saude': 'samu',
+        'policia': 'policia',
+        'polícia': 'policia'
+    }
+    return [type_mapping.get(t.lower(), t.lower()) for t in types]
+
+def compare_emergency_types(actual: List[str], expected: List[str]) -> bool:
+    """
+    Compara os tipos de emergência (considerando mapeamentos)
+    """
+    # Comparar conjuntos (ordem não importa)
+    return set(normalize_type_names(actual)) == set(normalize_type_names(expected))
+
+def case_key(test_case: Dict[str, Any]) -> str:
+    """
+    Chave estável de um caso: linha + hash do relato, para que o checkpoint
+    não seja reaproveitado se o CSV mudar.
+    """
+    digest = hashlib.sha1(test_case['relato'].encode('utf-8')).hexdigest()[:12]
+    return f"{test_case['row_number']}:{digest}"
+
+def load_checkpoint(path: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Carrega resultados já concluídos do checkpoint.
+
+    Apenas respostas válidas são reaproveitadas; erros de API são refeitos.
+    """
+    completed = {}
+    if not os.path.exists(path):
+        return completed
+
+    with open(path, 'r', encoding='utf-8') as file:
+        for line in file:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # Última linha pode estar truncada se o processo caiu no meio da escrita
+                continue
+            if not entry.get('error'):
+                completed[entry['key']] = entry
+
+    return completed
+
+async def call_classify_api(client: httpx.AsyncClient, api_url: str, relato: str) -> Dict[str, Any]:
     """
     Chama a API de classificação
     """
     try:
-        response = requests.post(
-            API_URL,
-            json={"relato": relato},
-            headers={"Content-Type": "application/json"},
-            timeout=30
-        )
-        
+        response = await client.post(api_url, json={"relato": relato})
+
         if response.status_code == 200:
             return response.json()
         else:
@@ -89,77 +170,135 @@ def call_classify_api(relato: str) -> Dict[str, Any]:
             }
     except Exception as e:
         return {
-            "error": str(e),
+            "error": str(e) or type(e).__name__,
             "success": False
         }
 
-def compare_emergency_types(actual: List[str], expected: List[str]) -> bool:
+async def evaluate_case(
+    client: httpx.AsyncClient,
+    semaphore: asyncio.Semaphore,
+    api_url: str,
+    test_case: Dict[str, Any],
+    checkpoint_file
+) -> Dict[str, Any]:
     """
-    Compara os tipos de emergência (considerando mapeamentos)
+    Avalia um caso de teste e grava o resultado no checkpoint
     """
-    # Normalizar nomes para comparação
-    type_mapping = {
-        'bombeiro': 'bombeiro',
-        'bombeiros': 'bombeiro',
-        'samu': 'samu',
-        'policia': 'policia',
-        'polícia': 'policia'
+    async with semaphore:
+        start = time.perf_counter()
+        result = await call_classify_api(client, api_url, test_case['relato'])
+        latency_ms = (time.perf_counter() - start) * 1000
+
+    entry = {
+        'key': case_key(test_case),
+        'row': test_case['row_number'],
+        'latency_ms': round(latency_ms, 2),
     }
-    
-    # Normalizar listas
-    actual_normalized = [type_mapping.get(t.lower(), t.lower()) for t in actual]
-    expected_normalized = [type_mapping.get(t.lower(), t.lower()) for t in expected]
-    
-    # Comparar conjuntos (ordem não importa)
-    return set(actual_normalized) == set(expected_normalized)
 
-def run_tests():
+    if result.get('error') or not result.get('emergency_classification'):
+        entry['error'] = result.get('error', 'Resposta inválida da API')
+    else:
+        entry['actual_types'] = result.get('emergency_classification', [])
+        entry['actual_urgency'] = result.get('nivel_urgencia', 0)
+        entry['rag_used'] = result.get('rag_used', True)
+        entry['gate_reason'] = result.get('gate_reason', '')
+
+    # Todas as escritas acontecem no loop de eventos, então não há concorrência no arquivo
+    checkpoint_file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    checkpoint_file.flush()
+
+    return entry
+
+def percentile(values: List[float], pct: float) -> float:
     """
-    Executa todos os testes e gera relatório
+    Percentil por interpolação linear (mesmo método do numpy)
     """
-    print("🚨 Iniciando validação dos casos de teste...")
-    print("=" * 60)
-    
-    # Carregar casos de teste
-    test_cases = load_test_cases('test_cases_classificados.csv')
-    print(f"📋 Carregados {len(test_cases)} casos de teste")
-    
-    # Estatísticas
-    total_tests = len(test_cases)
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * pct / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+def latency_summary(latencies: List[float]) -> Dict[str, float]:
+    """
+    Resumo das latências por caso, em milissegundos
+    """
+    if not latencies:
+        return {}
+    return {
+        "count": len(latencies),
+        "mean_ms": round(statistics.mean(latencies), 2),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p90_ms": round(percentile(latencies, 90), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "max_ms": round(max(latencies), 2)
+    }
+
+def build_report(test_cases: List[Dict[str, Any]], results: Dict[str, Dict[str, Any]], wall_time_s: float) -> Dict[str, Any]:
+    """
+    Consolida os resultados em um relatório
+    """
+    emergency_errors = []
+    urgency_errors = []
+    api_errors = []
+    cases = []
+    latencies = []
+
+    # Matriz por agência (multi-rótulo): verdadeiro/falso positivo/negativo
+    agency_matrix = {agency: {"tp": 0, "fp": 0, "fn": 0, "tn": 0} for agency in AGENCIES}
+    # Matriz de urgência: esperado x obtido (0 = nível inválido)
+    labels = [0] + URGENCY_LEVELS
+    urgency_matrix = {str(exp): {str(act): 0 for act in labels} for exp in labels}
+
     emergency_correct = 0
     urgency_correct = 0
     both_correct = 0
-    api_errors = 0
-    
-    # Listas para análise detalhada
-    emergency_errors = []
-    urgency_errors = []
-    api_error_details = []
-    
-    print("\n🔍 Executando testes...\n")
-    
-    for i, test_case in enumerate(test_cases, 1):
-        print(f"[{i}/{total_tests}] Testando: {test_case['relato'][:50]}...")
-        
-        # Chamar API
-        result = call_classify_api(test_case['relato'])
-        
-        # Verificar se houve erro na API
-        if result.get('error') or not result.get('emergency_classification'):
-            api_errors += 1
-            api_error_details.append({
+
+    # Efeito do RetrievalGate: casos com e sem busca no RAG
+    gating = {
+        group: {"cases": 0, "urgency_correct": 0, "both_correct": 0, "latencies": []}
+        for group in ("rag", "sem_rag")
+    }
+    gate_reasons: Dict[str, int] = {}
+
+    for test_case in test_cases:
+        entry = results.get(case_key(test_case))
+        if entry is None or entry.get('error'):
+            api_errors.append({
                 'row': test_case['row_number'],
                 'relato': test_case['relato'],
-                'error': result.get('error', 'Resposta inválida da API')
+                'error': entry.get('error') if entry else 'Não executado'
             })
             continue
-        
-        # Extrair resultados da API
-        actual_types = result.get('emergency_classification', [])
-        actual_urgency = result.get('nivel_urgencia', 0)
-        
-        # Comparar tipos de emergência
-        emergency_match = compare_emergency_types(actual_types, test_case['expected_types'])
+
+        latencies.append(entry['latency_ms'])
+        actual_types = entry['actual_types']
+        actual_urgency = entry['actual_urgency']
+
+        expected_set = set(normalize_type_names(test_case['expected_types']))
+        actual_set = set(normalize_type_names(actual_types))
+        for agency in AGENCIES:
+            in_expected = agency in expected_set
+            in_actual = agency in actual_set
+            if in_expected and in_actual:
+                agency_matrix[agency]["tp"] += 1
+            elif in_actual:
+                agency_matrix[agency]["fp"] += 1
+            elif in_expected:
+                agency_matrix[agency]["fn"] += 1
+            else:
+                agency_matrix[agency]["tn"] += 1
+
+        expected_label = str(test_case['expected_urgency'] if test_case['expected_urgency'] in URGENCY_LEVELS else 0)
+        actual_label = str(actual_urgency if actual_urgency in URGENCY_LEVELS else 0)
+        urgency_matrix[expected_label][actual_label] += 1
+
+        emergency_match = expected_set == actual_set
+        urgency_match = actual_urgency == test_case['expected_urgency']
+
         if emergency_match:
             emergency_correct += 1
         else:
@@ -169,9 +308,7 @@ def run_tests():
                 'expected': test_case['expected_types'],
                 'actual': actual_types
             })
-        
-        # Comparar urgência
-        urgency_match = actual_urgency == test_case['expected_urgency']
+
         if urgency_match:
             urgency_correct += 1
         else:
@@ -181,89 +318,301 @@ def run_tests():
                 'expected': test_case['expected_urgency'],
                 'actual': actual_urgency
             })
-        
-        # Ambos corretos
+
         if emergency_match and urgency_match:
             both_correct += 1
-        
-        # Mostrar progresso
-        if i % 10 == 0:
-            print(f"   Progresso: {i}/{total_tests} ({(i/total_tests)*100:.1f}%)")
-    
-    # Gerar relatório
+
+        rag_used = entry.get('rag_used', True)
+        group = gating["rag" if rag_used else "sem_rag"]
+        group["cases"] += 1
+        group["urgency_correct"] += int(urgency_match)
+        group["both_correct"] += int(emergency_match and urgency_match)
+        group["latencies"].append(entry['latency_ms'])
+        reason = entry.get('gate_reason') or 'desconhecido'
+        gate_reasons[reason] = gate_reasons.get(reason, 0) + 1
+
+        case_entry = {
+            'row': test_case['row_number'],
+            'emergency_match': emergency_match,
+            'urgency_match': urgency_match,
+            'latency_ms': entry['latency_ms'],
+            'rag_used': rag_used,
+            'gate_reason': entry.get('gate_reason', '')
+        }
+        cases.append(case_entry)
+
+    valid_tests = len(test_cases) - len(api_errors)
+
+    # Precisão e revocação por agência
+    agency_metrics = {}
+    for agency, counts in agency_matrix.items():
+        precision = counts["tp"] / max(1, counts["tp"] + counts["fp"])
+        recall = counts["tp"] / max(1, counts["tp"] + counts["fn"])
+        agency_metrics[agency] = {
+            **counts,
+            "precision": round(precision * 100, 2),
+            "recall": round(recall * 100, 2)
+        }
+
+    return {
+        "summary": {
+            "total_tests": len(test_cases),
+            "valid_tests": valid_tests,
+            "emergency_correct": emergency_correct,
+            "urgency_correct": urgency_correct,
+            "both_correct": both_correct,
+            "api_errors": len(api_errors),
+            "emergency_accuracy": round(emergency_correct / max(1, valid_tests) * 100, 2),
+            "urgency_accuracy": round(urgency_correct / max(1, valid_tests) * 100, 2),
+            "both_accuracy": round(both_correct / max(1, valid_tests) * 100, 2),
+            "wall_time_s": round(wall_time_s, 2)
+        },
+        "latency": latency_summary(latencies),
+        "retrieval_gate": {
+            "reasons": gate_reasons,
+            **{
+                group: {
+                    "cases": values["cases"],
+                    "urgency_accuracy": round(values["urgency_correct"] / max(1, values["cases"]) * 100, 2),
+                    "both_accuracy": round(values["both_correct"] / max(1, values["cases"]) * 100, 2),
+                    "latency": latency_summary(values["latencies"])
+                }
+                for group, values in gating.items()
+            }
+        },
+        "confusion_matrices": {
+            "agency": agency_metrics,
+            "urgency": urgency_matrix
+        },
+        "cases": cases,
+        "emergency_errors": emergency_errors,
+        "urgency_errors": urgency_errors,
+        "api_errors": api_errors
+    }
+
+def diff_reports(previous: Dict[str, Any], current: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Compara o relatório atual com um relatório anterior.
+
+    Funciona também com relatórios no formato antigo (sem latência e sem casos),
+    usando as listas de erros para identificar correções e regressões.
+    """
+    diff = {"summary": {}, "latency": {}}
+
+    for key in ("emergency_accuracy", "urgency_accuracy", "both_accuracy", "api_errors"):
+        if key in previous.get("summary", {}) and key in current["summary"]:
+            before = previous["summary"][key]
+            after = current["summary"][key]
+            diff["summary"][key] = {"before": before, "after": after, "delta": round(after - before, 2)}
+
+    for key in ("p50_ms", "p95_ms", "p99_ms", "mean_ms"):
+        if key in previous.get("latency", {}) and key in current["latency"]:
+            before = previous["latency"][key]
+            after = current["latency"][key]
+            diff["latency"][key] = {"before": before, "after": after, "delta": round(after - before, 2)}
+
+    for category in ("emergency_errors", "urgency_errors"):
+        before_rows = {error["row"] for error in previous.get(category, [])}
+        after_rows = {error["row"] for error in current.get(category, [])}
+        diff[category] = {
+            "fixed": sorted(before_rows - after_rows),
+            "regressed": sorted(after_rows - before_rows)
+        }
+
+    return diff
+
+def print_report(report: Dict[str, Any], diff: Optional[Dict[str, Any]]) -> None:
+    """
+    Exibe o relatório no terminal
+    """
+    summary = report["summary"]
+
     print("\n" + "=" * 60)
     print("📊 RELATÓRIO FINAL")
     print("=" * 60)
-    
+
     print(f"\n📈 ESTATÍSTICAS GERAIS:")
-    print(f"   Total de testes: {total_tests}")
-    print(f"   Erros de API: {api_errors}")
-    print(f"   Testes válidos: {total_tests - api_errors}")
-    
-    if total_tests - api_errors > 0:
-        valid_tests = total_tests - api_errors
-        
+    print(f"   Total de testes: {summary['total_tests']}")
+    print(f"   Erros de API: {summary['api_errors']}")
+    print(f"   Testes válidos: {summary['valid_tests']}")
+    print(f"   Tempo total: {summary['wall_time_s']:.1f}s")
+
+    if summary['valid_tests'] > 0:
+        valid_tests = summary['valid_tests']
         print(f"\n🎯 ACURÁCIA POR CATEGORIA:")
-        print(f"   Classificação de Emergência: {emergency_correct}/{valid_tests} ({(emergency_correct/valid_tests)*100:.1f}%)")
-        print(f"   Nível de Urgência: {urgency_correct}/{valid_tests} ({(urgency_correct/valid_tests)*100:.1f}%)")
-        print(f"   Ambos Corretos: {both_correct}/{valid_tests} ({(both_correct/valid_tests)*100:.1f}%)")
-        
-        print(f"\n❌ ERROS POR CATEGORIA:")
-        print(f"   Erros de Emergência: {len(emergency_errors)}")
-        print(f"   Erros de Urgência: {len(urgency_errors)}")
-        print(f"   Erros de API: {api_errors}")
-    
+        print(f"   Classificação de Emergência: {summary['emergency_correct']}/{valid_tests} ({summary['emergency_accuracy']:.1f}%)")
+        print(f"   Nível de Urgência: {summary['urgency_correct']}/{valid_tests} ({summary['urgency_accuracy']:.1f}%)")
+        print(f"   Ambos Corretos: {summary['both_correct']}/{valid_tests} ({summary['both_accuracy']:.1f}%)")
+
+        print(f"\n🏢 MATRIZ POR AGÊNCIA:")
+        print(f"   {'Agência':<10} {'VP':>5} {'FP':>5} {'FN':>5} {'VN':>5} {'Prec.':>8} {'Rev.':>8}")
+        for agency, metrics in report["confusion_matrices"]["agency"].items():
+            print(f"   {agency:<10} {metrics['tp']:>5} {metrics['fp']:>5} {metrics['fn']:>5} {metrics['tn']:>5} "
+                  f"{metrics['precision']:>7.1f}% {metrics['recall']:>7.1f}%")
+
+        print(f"\n🔥 MATRIZ DE URGÊNCIA (linhas = esperado, colunas = obtido, 0 = inválido):")
+        matrix = report["confusion_matrices"]["urgency"]
+        labels = list(matrix.keys())
+        print("        " + "".join(f"{label:>6}" for label in labels))
+        for expected in labels:
+            print(f"   {expected:>4} " + "".join(f"{matrix[expected][actual]:>6}" for actual in labels))
+
+        latency = report["latency"]
+        print(f"\n⏱️  LATÊNCIA POR CASO:")
+        print(f"   média {latency['mean_ms']:.0f}ms | p50 {latency['p50_ms']:.0f}ms | p90 {latency['p90_ms']:.0f}ms | "
+              f"p95 {latency['p95_ms']:.0f}ms | p99 {latency['p99_ms']:.0f}ms | máx {latency['max_ms']:.0f}ms")
+
+        gate = report.get("retrieval_gate", {})
+        print(f"\n🚦 RETRIEVAL GATE (motivos: {gate.get('reasons', {})}):")
+        for group, label in (("rag", "Com RAG"), ("sem_rag", "Sem RAG")):
+            values = gate.get(group)
+            if not values or not values["cases"]:
+                continue
+            print(f"   {label:<8} {values['cases']:>4} casos | urgência {values['urgency_accuracy']:.1f}% | "
+                  f"ambos {values['both_accuracy']:.1f}% | p50 {values['latency']['p50_ms']:.0f}ms | "
+                  f"p95 {values['latency']['p95_ms']:.0f}ms")
+
     # Mostrar alguns exemplos de erros
-    if emergency_errors:
+    if report["emergency_errors"]:
         print(f"\n🔍 EXEMPLOS DE ERROS DE CLASSIFICAÇÃO DE EMERGÊNCIA (primeiros 5):")
-        for error in emergency_errors[:5]:
+        for error in report["emergency_errors"][:5]:
             print(f"   Linha {error['row']}: {error['relato'][:40]}...")
             print(f"      Esperado: {error['expected']}")
             print(f"      Obtido: {error['actual']}")
             print()
-    
-    if urgency_errors:
+
+    if report["urgency_errors"]:
         print(f"\n🔍 EXEMPLOS DE ERROS DE URGÊNCIA (primeiros 5):")
-        for error in urgency_errors[:5]:
+        for error in report["urgency_errors"][:5]:
             print(f"   Linha {error['row']}: {error['relato'][:40]}...")
             print(f"      Esperado: {error['expected']}")
             print(f"      Obtido: {error['actual']}")
             print()
-    
-    if api_error_details:
+
+    if report["api_errors"]:
         print(f"\n🔍 EXEMPLOS DE ERROS DE API (primeiros 3):")
-        for error in api_error_details[:3]:
+        for error in report["api_errors"][:3]:
             print(f"   Linha {error['row']}: {error['relato'][:40]}...")
             print(f"      Erro: {error['error']}")
             print()
-    
+
+    if diff:
+        print(f"\n🔁 COMPARAÇÃO COM O RELATÓRIO ANTERIOR:")
+        for key, values in {**diff["summary"], **diff["latency"]}.items():
+            print(f"   {key}: {values['before']} → {values['after']} ({values['delta']:+})")
+        for category in ("emergency_errors", "urgency_errors"):
+            print(f"   {category}: corrigidos {diff[category]['fixed']} | regressões {diff[category]['regressed']}")
+
+async def run_evaluation(
+    api_url: str,
+    cases_file: str,
+    checkpoint_path: str,
+    concurrency: int,
+    timeout: float,
+    fresh: bool
+) -> Dict[str, Any]:
+    """
+    Executa os casos pendentes de forma concorrente e retorna o relatório
+    """
+    test_cases = load_test_cases(cases_file)
+    print(f"📋 Carregados {len(test_cases)} casos de teste")
+
+    if fresh and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    results = load_checkpoint(checkpoint_path)
+    pending = [case for case in test_cases if case_key(case) not in results]
+    if results:
+        print(f"♻️  Retomando do checkpoint: {len(test_cases) - len(pending)} casos já concluídos")
+
+    print(f"\n🔍 Executando {len(pending)} testes (concorrência: {concurrency})...\n")
+
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    start = time.perf_counter()
+
+    with open(checkpoint_path, 'a', encoding='utf-8') as checkpoint_file:
+        async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+            tasks = [
+                asyncio.create_task(evaluate_case(client, semaphore, api_url, case, checkpoint_file))
+                for case in pending
+            ]
+            for done, task in enumerate(asyncio.as_completed(tasks), 1):
+                entry = await task
+                results[entry['key']] = entry
+                if done % 10 == 0 or done == len(tasks):
+                    print(f"   Progresso: {done}/{len(tasks)} ({(done / len(tasks)) * 100:.1f}%)")
+
+    wall_time_s = time.perf_counter() - start
+    return build_report(test_cases, results, wall_time_s)
+
+def run_tests(args: Optional[argparse.Namespace] = None):
+    """
+    Executa todos os testes e gera relatório
+    """
+    if args is None:
+        args = parse_args([])
+
+    print("🚨 Iniciando validação dos casos de teste...")
+    print("=" * 60)
+
+    # Carrega o relatório anterior antes de sobrescrevê-lo
+    previous_report = None
+    previous_path = args.previous or args.report
+    if os.path.exists(previous_path):
+        with open(previous_path, 'r', encoding='utf-8') as f:
+            previous_report = json.load(f)
+
+    report = asyncio.run(run_evaluation(
+        api_url=args.api_url,
+        cases_file=args.cases,
+        checkpoint_path=args.checkpoint,
+        concurrency=args.concurrency,
+        timeout=args.timeout,
+        fresh=args.fresh
+    ))
+
+    diff = diff_reports(previous_report, report) if previous_report else None
+    if diff:
+        report["diff_vs_previous"] = diff
+
+    print_report(report, diff)
+
     # Salvar relatório detalhado
-    save_detailed_report(test_cases, emergency_errors, urgency_errors, api_error_details)
-    
+    save_detailed_report(report, args.report)
+
     print("=" * 60)
     print("✅ Validação concluída!")
-    print("📄 Relatório detalhado salvo em 'test_report.json'")
+    print(f"📄 Relatório detalhado salvo em '{args.report}'")
+    if report["summary"]["api_errors"]:
+        print(f"♻️  {report['summary']['api_errors']} casos com erro serão refeitos na próxima execução (checkpoint: '{args.checkpoint}')")
+    elif os.path.exists(args.checkpoint):
+        # Execução completa: a próxima começa do zero
+        os.remove(args.checkpoint)
 
-def save_detailed_report(test_cases, emergency_errors, urgency_errors, api_errors):
+def save_detailed_report(report: Dict[str, Any], path: str = REPORT_FILE):
     """
     Salva relatório detalhado em JSON
     """
-    report = {
-        "summary": {
-            "total_tests": len(test_cases),
-            "emergency_correct": len(test_cases) - len(emergency_errors),
-            "urgency_correct": len(test_cases) - len(urgency_errors),
-            "api_errors": len(api_errors),
-            "emergency_accuracy": ((len(test_cases) - len(emergency_errors) - len(api_errors)) / max(1, len(test_cases) - len(api_errors))) * 100,
-            "urgency_accuracy": ((len(test_cases) - len(urgency_errors) - len(api_errors)) / max(1, len(test_cases) - len(api_errors))) * 100
-        },
-        "emergency_errors": emergency_errors,
-        "urgency_errors": urgency_errors,
-        "api_errors": api_errors
-    }
-    
-    with open('test_report.json', 'w', encoding='utf-8') as f:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
         json.dump(report, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """
+    Lê os argumentos de linha de comando
+    """
+    parser = argparse.ArgumentParser(description="Avaliação de acurácia e latência da rota /classify")
+    parser.add_argument("--api-url", default=API_URL, help="URL da rota de classificação")
+    parser.add_argument("--cases", default=CASES_FILE, help="CSV com os casos de teste")
+    parser.add_argument("--concurrency", type=int, default=8, help="Número de requisições simultâneas")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Timeout por requisição (segundos)")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_FILE, help="Arquivo JSONL de checkpoint")
+    parser.add_argument("--report", default=REPORT_FILE, help="Arquivo de saída do relatório")
+    parser.add_argument("--previous", default=None, help="Relatório anterior para comparação (padrão: --report existente)")
+    parser.add_argument("--fresh", action="store_true", help="Ignora o checkpoint e executa todos os casos")
+    return parser.parse_args(argv)
 
 if __name__ == "__main__":
-    run_tests()
+    run_tests(parse_args())